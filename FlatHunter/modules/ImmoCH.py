@@ -1,26 +1,125 @@
-import re
+import heapq
 from FlatHunter.utils.abstract_base import FlatHunterBase
+from FlatHunter.utils.change_tracker import ChangeTracker
+from FlatHunter.utils.crawl_budget import CrawlBudget, CrawlResult, getPriority
+from FlatHunter.utils.embedded_data import scanAttribute, scanImages, scanJsonLD
+from FlatHunter.utils.extraction import ExtractionPlan, cleanText
+from FlatHunter.utils.geo_index import matchesArea, parseLatLng
+from FlatHunter.utils.image_store import fetchImages
+from FlatHunter.utils.lazy_ad import LazyAd, prefetchDetails
 from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.misc_utils import canonicalURL
+from FlatHunter.utils.parse_pool import ParsePool
+from FlatHunter.utils.ranking import TopK
+
+# Sources of fields available on search page's cards (no item's page needed)
+CARD_SOURCES = ("ad-item-soup", "ad-content-soup", "ad-character-soup")
 
 
 class ImmoCH(FlatHunterBase):
-    def __init__(self, itemCategory):
+    # Version of extraction code, bump it when fields or their extraction change (labels re-extracted runs)
+    extractorVersion = "3"
+
+    def __init__(self, itemCategory, fastPath=False, parseWorkers=None, fetchWorkers=4, streaming=False, region="geneve", **kwargs):
+        """
+        Params
+        ------
+        itemCategory : str
+            Either "flat", "industrial" or "commercial".
+        fastPath : bool
+            If True, item's page data is decoded from embedded payloads (ld+json, data attributes) with a byte-level scan,
+            page's soup is only built when those payloads are absent.
+        parseWorkers : int
+            If set, pages are fetched by `fetchWorkers` threads and parsed in a pool of `parseWorkers` processes by `getItems()`
+            (only compact records come back from the pool). If left empty, pages are fetched and parsed one by one.
+        fetchWorkers : int
+            Number of fetching threads used along with `parseWorkers`.
+        streaming : bool
+            If True, `searchPages()` and item's pages parse responses while they're downloaded, keeping only needed regions
+            (see `self.regions`) and closing connection once they're all read.
+        region : str
+            Region slug used by website in search URLs (e.g. "geneve", "vaud", "valais", "fribourg", "neuchatel").
+        kwargs :
+            Optional components of FlatHunterBase (archive, changeTracker...). With a change tracker, item's pages are fetched
+            conditionally and only parsed when they changed (takes precedence over streaming for item's pages). With an
+            image store, images of matching ads are fetched by `fetchWorkers` threads (see `fetchImages()`).
+        """
+        self.region = region
+        self.fastPath = fastPath
+        self.parseWorkers = parseWorkers
+        self.fetchWorkers = fetchWorkers
+        self.streaming = streaming
         self.URLs = {
             "website": "https://www.immobilier.ch",
             "flats": {
-                "mainURL": "https://www.immobilier.ch/fr/carte/louer/appartement-maison/geneve/",
+                "mainURL": f"https://www.immobilier.ch/fr/carte/louer/appartement-maison/{region}/",
                 "params": "?t=rent&c=1;2&p=s40&nb=false&gr=1",
             },
             "industrial": {
-                "mainURL": "https://www.immobilier.ch/fr/carte/louer/industriel/geneve/",
+                "mainURL": f"https://www.immobilier.ch/fr/carte/louer/industriel/{region}/",
                 "params": "?t=rent&c=7&p=s40&nb=false&gr=2",
             },
             "commercial": {
-                "mainURL": "https://www.immobilier.ch/fr/carte/louer/commercial/geneve/",
+                "mainURL": f"https://www.immobilier.ch/fr/carte/louer/commercial/{region}/",
                 "params": "?t=rent&c=4&p=s40&nb=false",
             },
         }
-        super().__init__(itemCategory)
+        # Fields extracted from each ad (see ExtractionPlan for spec keys)
+        self.fields = {
+            "rent": {
+                "source": "ad-content-soup",
+                "selector": "title",
+                "strip": "'",
+                "regex": r"\d+",
+                "type": int,
+                "default": 0,
+            },
+            "rooms": {
+                "source": "ad-content-soup",
+                "selector": "object-type",
+                "regex": r"\d+\.?\d?",
+                "type": float,
+                "default": 0,
+            },
+            "size": {
+                "source": "ad-character-soup",
+                "selector": "space",
+                "regex": r"\d+",
+                "type": int,
+                "default": 0,
+            },
+            "address": {
+                "source": "ad-content-soup",
+                "tag": "p",
+                "nth": 1,
+                "type": cleanText,
+                "default": "",
+            },
+            "latlng": {
+                "source": "ad-item-soup",
+                "selector": None,
+                "attr": "data-latlng",
+                "type": parseLatLng,
+                "default": None,
+            },
+            "images": {
+                "source": "ad-page-soup",
+                "selector": "im__banner__slider",
+                "collect": ("img", "alt", "data-lazy"),
+                "default": {},
+            },
+        }
+        self.extractionPlan = ExtractionPlan(self.fields)
+        self.pageSources = [source for source in self.extractionPlan.sources if source not in CARD_SOURCES]
+        # Regions of pages needed in streaming mode (see RegionCollector for keys)
+        self.regions = {
+            "search": [
+                {"name": "ad", "class": "filter-item"},
+                {"name": "pagination", "tag": "ul", "class": "pages", "last": True},
+            ],
+            "item": [{"name": "main", "id": "main", "last": True}],
+        }
+        super().__init__(itemCategory, **kwargs)
 
     def getNumberOfPages(self, _soup):
         """
@@ -34,7 +133,7 @@ class ImmoCH(FlatHunterBase):
         Return
         ------
         lastPageNumber : int
-            Number representing last page of search.
+            Number representing last page of search, None if search has no pagination (single page of results).
         """
         # Find pagination list
         try:
@@ -42,13 +141,16 @@ class ImmoCH(FlatHunterBase):
         except Exception as e:
             print(f"ERROR : Pagination not found on page ! Error message : {e}")
         else:
+            if paginationList is None:
+                logger.warning("No pagination on search page, search has a single page")
+                return None
             # Get list items
             liList = paginationList.find_all("li")
             # Get last list item (last page number)
             lastPageNumber = int(liList[-1].get_text())
             return lastPageNumber
 
-    def getAds(self, _soup):
+    def getAds(self, _soup, withPages=True):
         """
         Extract ad main elements, basically it'll extract ad `data-id` and `link` along with its three main elements
         `filter-content`, `filter-item-characteristic` and item `container` div soup that contains all important data concerning
@@ -58,6 +160,9 @@ class ImmoCH(FlatHunterBase):
         ------
         _soup : <class bs4>
             Page soup containing all the ads
+        withPages : bool
+            If False, item's pages are not visited (no `ad-page-soup` nor `ad-page-data` key). If True, ads already extracted
+            during current run (same `data-id`) are skipped.
 
         Returns
         -------
@@ -65,9 +170,11 @@ class ImmoCH(FlatHunterBase):
             List containing dictionnaries (representing each ads) with keys :
                 <data-id> int : ID of ad
                 <link> str : Link of ad
+                <ad-item-soup> class : Soup of `filter-item` tag itself (coordinates in `data-latlng`)
                 <ad-content-soup> class : Soup of `filter-content` tag (name, price, address, etc...)
                 <ad-character-soup> class : Soup of `filter-item-characteristic` tag (Size, rooms, etc...)
                 <ad-page-soup> class : Soup of item's page `container` tag
+                <ad-page-data> dict : Decoded item's page data, replaces `ad-page-soup` in fast path mode (see `getDetailData()`)
         """
         adsDictList = []
         # Get all individual ads in a list
@@ -79,11 +186,20 @@ class ImmoCH(FlatHunterBase):
             try:
                 dataID = item["data-id"]
             except KeyError:
+                dataID = None
                 itemDict["data-id"] = None
                 logger.warning(f"No data-id for item (KeyError) : {item}")
             else:
                 itemDict["data-id"] = int(dataID)
+                if withPages and itemDict["data-id"] in self.seenIDs:
+                    # Ad already extracted during this run (listings shifted between pages), skip its item's page
+                    self.stats["duplicateAds"] += 1
+                    logger.debug(f"Skipped duplicate item with data-id {dataID}")
+                    continue
+                if withPages:
+                    self.seenIDs.add(itemDict["data-id"])
                 logger.debug(f"Extracting item with data-id {dataID}")
+            itemDict["ad-item-soup"] = item
             # Get ad container (item link and all infos about link)
             adContainer = item.find(class_="filter-item-container")
             # == Extract item link from container == #
@@ -102,47 +218,139 @@ class ImmoCH(FlatHunterBase):
             adCharacter = adContainer.find(class_="filter-item-characteristic")
             itemDict["ad-character-soup"] = adCharacter
             # == Go to page and scrap item full page == #
-            if link != None:
-                logger.debug(
-                    f"Trying connection to item's page at URL : {itemDict['link']}"
-                )
-                pageItemSoup = self.getPageSoup(itemDict["link"])
-                try:
-                    itemContainer = pageItemSoup.find(id="main")
-                except Exception as e:
-                    logger.warning(
-                        f"Couldn't find item's container in item's page (item {dataID})"
-                    )
-                else:
-                    itemDict["ad-page-soup"] = itemContainer
-                    logger.info(
-                        f"Item page's soup successfully extracted for item with id {dataID}"
-                    )
-            else:
+            if link == None:
                 logger.warning(
                     f"Couldn't reach item's page, no link extracted for item with id {dataID}"
                 )
+            elif withPages:
+                self.getItemPage(itemDict)
             # Push dictionnary in list
             adsDictList.append(itemDict)
             logger.debug(f"Added new dictionnary in list : {itemDict}")
         # Return all ads
         return adsDictList
 
-    def searchPages(self, pagesToSearch=None):
+    def getItemPage(self, itemDict):
         """
-        Method that loop through pages and extract all ads.
+        Go to item's page and add its data to ad dictionnary, either as `ad-page-data` (fast path) or as `ad-page-soup`.
 
         Params
         ------
-        pagesToSearch : int
-            How many pages should be searched. If left empty, it'll search all available pages.
+        itemDict : dict
+            Ad dictionnary with `data-id` and `link` keys.
+        """
+        dataID = itemDict["data-id"]
+        logger.debug(f"Trying connection to item's page at URL : {itemDict['link']}")
+        if self.changeTracker is not None:
+            self._getItemPageTracked(itemDict)
+            return
+        if self.streaming and not self.fastPath:
+            # Only `#main` region is downloaded and parsed
+            for name, fragment in self.streamPageRegions(itemDict["link"], self.regions["item"]):
+                itemDict["ad-page-soup"] = self.parsePage(fragment).find(id="main")
+                logger.info(f"Item page's soup successfully streamed for item with id {dataID}")
+            if "ad-page-soup" not in itemDict:
+                logger.warning(f"Couldn't find item's container in item's page (item {dataID})")
+            return
+        pageContent = self.getPageContent(itemDict["link"])
+        if pageContent is None:
+            logger.warning(f"Couldn't get item's page (item {dataID})")
+            return
+        self.decodeItemPage(itemDict, pageContent)
+
+    def decodeItemPage(self, itemDict, pageContent):
+        """
+        Add item's page data to ad dictionnary from raw page content, either as `ad-page-data` (fast path) or as `ad-page-soup`.
+        """
+        dataID = itemDict.get("data-id")
+        if self.fastPath:
+            pageData = self.getDetailData(pageContent)
+            if pageData is not None:
+                itemDict["ad-page-data"] = pageData
+                logger.info(f"Item page's data successfully decoded for item with id {dataID}")
+                return
+            logger.debug(f"No embedded data in item's page (item {dataID}), falling back to soup")
+        itemContainer = self.parsePage(pageContent).find(id="main")
+        if itemContainer is None:
+            logger.warning(f"Couldn't find item's container in item's page (item {dataID})")
+        else:
+            itemDict["ad-page-soup"] = itemContainer
+            logger.info(f"Item page's soup successfully extracted for item with id {dataID}")
+
+    def getCardRecords(self, _soup):
+        """
+        Extract compact records of all ads in a search page soup, without visiting item's pages.
 
         Returns
         -------
-        pagesList : list
-            List of lists containing dictionnaries representing ads. Each nested list is a page and dictionnaries inside are individual ad.
+        records : list
+            List of dictionnaries with `data-id`, `link` keys and all fields available on cards (rent, rooms, size...).
+            Adverts (items without `data-id`) are skipped.
+        """
+        records = []
+        for ad in self.getAds(_soup, withPages=False):
+            # Skip adverts inserted in ads list (no data-id)
+            if ad["data-id"] == None:
+                continue
+            record = {"data-id": ad["data-id"], "link": ad.get("link")}
+            record.update(self.extractionPlan.run(ad, sources=CARD_SOURCES))
+            records.append(record)
+        return records
+
+    def getItemRecord(self, pageContent):
+        """
+        Extract compact record (item's page fields only, e.g. images) from raw content of item's page.
+        """
+        itemDict = {"data-id": None}
+        self.decodeItemPage(itemDict, pageContent)
+        return self.extractionPlan.run(itemDict, sources=self.pageSources)
+
+    @staticmethod
+    def getDetailData(pageContent):
+        """
+        Decode item's page data from embedded payloads without building page's DOM.
+
+        Params
+        ------
+        pageContent : bytes
+            Raw content of item's page.
+
+        Returns
+        -------
+        pageData : dict
+            Dictionnary with keys :
+                <images> dict : Images of `im__banner__slider` (alt as key, `data-lazy` URL as value)
+                <price> float : Offer price from ld+json `Product` (None if absent)
+                <address> dict : `PostalAddress` from ld+json `Residence` (None if absent)
+                <latlng> str : Value of `data-latlng` attribute (None if absent)
+            None if images slider was not found (caller should fall back to soup).
+        """
+        images = scanImages(pageContent, "im__banner__slider", "alt", "data-lazy")
+        if images is None:
+            return None
+        pageData = {"images": images, "price": None, "address": None, "latlng": scanAttribute(pageContent, "data-latlng")}
+        for obj in scanJsonLD(pageContent):
+            if not isinstance(obj, dict):
+                continue
+            if obj.get("@type") == "Product":
+                try:
+                    pageData["price"] = float(obj["Offers"]["Price"])
+                except (KeyError, TypeError, ValueError):
+                    pass
+            elif obj.get("@type") == "Residence":
+                pageData["address"] = obj.get("Address")
+        return pageData
+
+    def getPageKind(self, _url):
+        """
+        Return "search" for search pages URLs (map search) and "item" for item's pages.
+        """
+        return "search" if "/carte/" in _url else "item"
+
+    def getSearchURL(self):
+        """
+        Return base URL and params of search for object's item category.
         """
-        # == Define type of search and create associated URL == #
         if self.itemCategory == "flat":
             baseURL = self.URLs["flats"]["mainURL"]
             params = self.URLs["flats"]["params"]
@@ -156,12 +364,32 @@ class ImmoCH(FlatHunterBase):
             raise AttributeError(
                 "Wrong attribute ! Attribute can be either 'flat', 'industrial' and 'commercial'"
             )
+        return baseURL, params
+
+    def searchPages(self, pagesToSearch=None):
+        """
+        Method that loop through pages and extract all ads.
+
+        Params
+        ------
+        pagesToSearch : int
+            How many pages should be searched. If left empty, it'll search all available pages.
+
+        Returns
+        -------
+        pagesList : list
+            List of lists containing dictionnaries representing ads. Each nested list is a page and dictionnaries inside are individual ad.
+        """
+        # == Define type of search and create associated URL == #
+        baseURL, params = self.getSearchURL()
+        if self.streaming:
+            return self._searchPagesStreamed(baseURL, params, pagesToSearch)
         # Get total number of pages for given search (go to first page of search)
         # URL should look like this : "https://www.immobilier.ch/fr/carte/louer/appartement-maison/geneve/page-1?t=rent&c=1;2&p=s40&nb=false&gr=1"
         firstPageURL = f"{baseURL}page-1{params}"
         logger.info(f"Extract number of pages from following URL : '{firstPageURL}'")
         soup = self.getPageSoup(firstPageURL)
-        numberOfPages = self.getNumberOfPages(soup)
+        numberOfPages = self.getNumberOfPages(soup) or 1
         logger.info(f"Total number of pages for search is {numberOfPages}")
         # == Establish connexion with all individual pages (loop) == #
         if pagesToSearch != None:
@@ -171,7 +399,8 @@ class ImmoCH(FlatHunterBase):
         for pageNb in range(1, numberOfPages + 1):
             pageURL = f"{baseURL}page-{pageNb}{params}"
             logger.info(f"Get soup from URL : '{pageURL}'")
-            pageSoup = self.getPageSoup(pageURL)
+            # First page soup is already known
+            pageSoup = soup if pageNb == 1 else self.getPageSoup(pageURL)
             # Extract individual ad infos
             adsList = self.getAds(pageSoup)
             logger.info(f"<====== Extracted ads of page {pageNb} ======>")
@@ -181,7 +410,29 @@ class ImmoCH(FlatHunterBase):
         # ====== Return list ====== #
         return pagesList
 
-    def getItems(self, filter, pagesToSearch=None):
+    def streamSearchPage(self, pageURL, withPages=True):
+        """
+        Stream search page and extract each ad as soon as its card is downloaded (item's page is visited right away if
+        `withPages` is True), instead of waiting for whole page.
+
+        Returns
+        -------
+        adsList : list
+            Ads of page (see `getAds()`).
+        numberOfPages : int
+            Number of pages of search, None if pagination wasn't found.
+        """
+        adsList = []
+        numberOfPages = None
+        for name, fragment in self.streamPageRegions(pageURL, self.regions["search"]):
+            regionSoup = self.parsePage(fragment)
+            if name == "pagination":
+                numberOfPages = self.getNumberOfPages(regionSoup)
+            else:
+                adsList.extend(self.getAds(regionSoup, withPages))
+        return adsList, numberOfPages
+
+    def getItems(self, filter, pagesToSearch=None, deadline=None, maxRequests=None, priority="rentPerM2", lazyDetails=False, sinks=None):
         """
         This method is responsible for sorting the data according to user-defined filters and the total number of pages to be searched.
         Note : See abstract class docString for more infos.
@@ -193,11 +444,29 @@ class ImmoCH(FlatHunterBase):
             keys.
         pagesToSearch : int
             Total number of page to seach on website, if left empty it'll search all pages.
+        deadline : float
+            Wall-clock time (s) allowed for the call.
+        maxRequests : int
+            Number of requests allowed for the call.
+        priority : str or callable
+            Only used along with a budget : order in which item's pages of matching ads are fetched, either a name of
+            `DETAIL_PRIORITIES` (e.g. "rentPerM2", cheapest first) or a function of card record (lowest value first).
+        lazyDetails : bool
+            If True, only search pages are fetched and returned ads are LazyAd : item's page fields (images...) are
+            fetched on first access (see `prefetchDetails()` to load many ads at once).
+        sinks : list
+            Writers (objects with a `write(ad)` method, e.g. `output_writers.NDJSONWriter`) receiving each matching ad. In
+            default mode, ads are written as soon as they're matched (search pages are streamed one by one, see
+            `iterItems()`), otherwise once the crawl is done. Lazy ads are loaded (see `prefetchDetails()`) before being
+            written. Returned list still holds every ad : to keep memory constant, drive `iterItems()` into sinks instead.
+
+        Note : With an image store, ads get an `imageHashes` key (see `fetchImages()`), except lazy and budgeted ones.
         
         Returns
         -------
         filteredAdsList : list
-            List of dictionnaries containing all filtered ads.
+            List of dictionnaries containing all filtered ads. With a deadline or a request budget, it's a CrawlResult
+            flagged `partial` if budget ran out (see `_getItemsBudgeted()`).
         """
         # === CHECK filter dict keys : If flat is selected, must also have rooms indicated === #
         if self.itemCategory == "flat":
@@ -211,6 +480,36 @@ class ImmoCH(FlatHunterBase):
                     "User didn't indicate 'minRooms' and 'maxRooms' for an appartement search in filter dict. Stopped script."
                 )
 
+        self.resetRun()
+        if lazyDetails:
+            filteredAdsList = []
+            for record in self.iterCards(pagesToSearch):
+                if record["link"] != None and self._isMatch(record, filter):
+                    filteredAdsList.append(self._lazyAd(record))
+            if sinks:
+                # Sinks get whole ads (images...), not only card fields
+                self.prefetchDetails(filteredAdsList)
+                self._writeToSinks(filteredAdsList, sinks)
+            self.reportStats()
+            return filteredAdsList
+        if deadline is not None or maxRequests is not None:
+            filteredAdsList = self._getItemsBudgeted(filter, pagesToSearch, CrawlBudget(deadline, maxRequests), priority)
+            self._writeToSinks(filteredAdsList, sinks)
+            self.reportStats()
+            return filteredAdsList
+        if self.parseWorkers:
+            filteredAdsList = self._getItemsPooled(filter, pagesToSearch)
+            self.fetchImages(filteredAdsList)
+            self._writeToSinks(filteredAdsList, sinks)
+            self.reportStats()
+            return filteredAdsList
+        if sinks:
+            filteredAdsList = []
+            for ad in self.iterItems(filter, pagesToSearch):
+                self._writeToSinks([ad], sinks)
+                filteredAdsList.append(ad)
+            return filteredAdsList
+
         # Get list of ads (Nested list, each list is a page)
         allAdsList = self.searchPages(pagesToSearch)
 
@@ -220,141 +519,495 @@ class ImmoCH(FlatHunterBase):
         # === Main loop === #
         for page in allAdsList:
             for ad in page:
-                formatedDict = {}
-                # == Get rent == #
-                rent = self._getRentHelper(self.itemCategory, ad)
-                # == Get rooms == #
-                rooms = self._getRoomsHelper(self.itemCategory, ad)
-                # == Get size == #
-                size = self._getSizeHelper(self.itemCategory, ad)
-                images = self._getImagesHelper(self.itemCategory, ad)
+                # == Get rent, rooms, size and images in a single pass == #
+                fields = self.extractionPlan.run(ad)
+                fields["data-id"] = ad["data-id"]
+                fields["link"] = ad.get("link")
                 # Check if ad is a match with filter dict keys (rent, room, size) and add it to filteredAdsList if it is
-                if rent >= filter["minRent"] and rent <= filter["maxRent"]:
-                    if rooms >= filter["minRooms"] and rooms <= filter["maxRooms"]:
-                        if size >= filter["minSize"] and size <= filter["maxSize"]:
-                            logger.info(
-                                f"Ad {ad['data-id']} is a match => {rooms} rooms, rent {rent} CHF and size {size} m2."
-                            )
-                            
-                            formatedDict["data-id"] = ad["data-id"]
-                            formatedDict["link"] = ad["link"]
-                            formatedDict["images"] = images
-                            formatedDict["rent"] = rent
-                            formatedDict["rooms"] = rooms
-                            formatedDict["size"] = size
-                            # Add formated dict to filteredAdsList
-                            filteredAdsList.append(formatedDict)
+                if self._isMatch(fields, filter):
+                    filteredAdsList.append(self._formatAd(fields))
 
+        self.fetchImages(filteredAdsList)
+        self.reportStats()
         # Return filtered ads list
         return filteredAdsList
 
-    # === HELPER FUNCTIONS === #
-    def _getRentHelper(self, category, adData):
+    def getSubscriberItems(self, filterIndex, pagesToSearch=None):
         """
-        getItem's helper function to extract rent from ad.
+        getItems's version for many filters at once : search is crawled once, each card is matched against all filters of
+        index, and item's page is only fetched for ads matching at least one filter.
+
+        Params
+        ------
+        filterIndex : FilterIndex
+            Registered filters of subscribers.
+        pagesToSearch : int
+            Total number of page to seach on website, if left empty it'll search all pages.
+
+        Returns
+        -------
+        results : dict
+            Subscriber ID as key and list of its matching ads (formatted as `getItems()` ones) as value.
         """
-        rent = None
-        if category == "flat":
-            try:
-                contentDiv = adData["ad-content-soup"].find(class_="title")
-            except AttributeError:
-                logger.warning(
-                    f"ad['ad-content-soup'] is equal to None ! Couldn't extract rent from item ID {adData['data-id']}"
-                )
-            else:
-                if contentDiv != None:
-                    rawRent = re.sub("'", "", contentDiv.get_text())
-                    try:
-                        rent = int(re.search(r"\d+", rawRent).group())
-                    except AttributeError:
-                        logger.warning(
-                            f"Couldn't extract rent from item ID {adData['data-id']}"
-                        )
-                    else:
-                        logger.debug(
-                            f"Extracted rent for item with ID {adData['data-id']}. Item rent : {rent} CHF"
-                        )
-
-            return rent if rent != None else 0
-
-    def _getRoomsHelper(self, category, adData):
-        """
-        getItem's helper function to extract rooms from ad.
-        """
-        rooms = None
-        if category == "flat":
-            try:
-                contentDiv = adData["ad-content-soup"].find(class_="object-type")
-            except AttributeError:
-                logger.warning(
-                    f"ad['ad-content-soup'] is equal to None ! Couldn't extract rent from item ID {adData['data-id']}"
-                )
-            else:
-                if contentDiv != None:
-                    rawRooms = contentDiv.get_text()
-                    try:
-                        rooms = float(re.search(r"\d+\.?\d?", rawRooms).group())
-                    except AttributeError:
-                        logger.warning(
-                            f"Couldn't extract rooms from item ID {adData['data-id']}"
-                        )
-                    else:
-                        logger.debug(
-                            f"Extracted rent for item with ID {adData['data-id']}. Item rooms : {rooms}"
-                        )
-
-            return rooms if rooms != None else 0
-
-    def _getSizeHelper(self, category, adData):
-        """
-        getItem's helper function to extract size from ad.
-        """
-        size = None
-        if category == "flat":
-            try:
-                contentDiv = adData["ad-character-soup"].find(class_="space")    
-            except AttributeError:
-                logger.warning(
-                    f"ad['ad-character-soup'] is equal to None ! Couldn't extract rent from item ID {adData['data-id']}"
-                )
+        self.resetRun()
+        results = {subscriberID: [] for subscriberID in filterIndex.filters}
+        for record in self.iterCards(pagesToSearch):
+            subscribers = filterIndex.match(record)
+            if not subscribers or record["link"] == None:
+                continue
+            ad = self._formatAd(self._addItemFields(record, self._fetchItemRecord(record)))
+            for subscriberID in subscribers:
+                results[subscriberID].append(ad)
+        self.reportStats()
+        return results
+
+    def getTopItems(self, filter, k=20, score="rentPerM2", pagesToSearch=None, deadline=None, maxRequests=None, lowerBound=None):
+        """
+        getItems's ranking version : the k best matching ads according to score, best first. Cards are ranked while
+        search pages stream past (bounded heap, see TopK), then item's pages are only fetched for the k ranked ads.
+
+        Params
+        ------
+        filter : dict
+            Filter of `getItems()`.
+        k : int
+            Number of ads returned.
+        score : str or callable
+            Name of `DETAIL_PRIORITIES` (rentPerM2, rentPerRoom, rent, size, recency) or function of card record
+            (lowest is best).
+        pagesToSearch : int
+            Total number of page to seach on website, if left empty it'll search all pages.
+        deadline : float
+            Wall-clock time (s) allowed for the call.
+        maxRequests : int
+            Number of requests allowed for the call.
+        lowerBound : callable
+            If search is sorted (e.g. by ascending rent), function of card record giving lowest score any later card can
+            have (e.g. `lambda record: record["rent"] / filter["maxSize"]` for rentPerM2 score on rent sorted search).
+            Crawl stops as soon as ranking can't change anymore.
+
+        Returns
+        -------
+        topAds : CrawlResult
+            Ranked ads (formatted as `getItems()` ones, with their `score`), flagged `partial` if budget ran out (see
+            `_getItemsBudgeted()`).
+        """
+        self.resetRun()
+        budget = CrawlBudget(deadline, maxRequests)
+        ranking = TopK(k, score)
+        partial = False
+        cards = self.iterCards(pagesToSearch)
+        while True:
+            if budget.exhausted(self.stats["requests"]):
+                partial = True
+                break
+            self.requestTimeout = budget.remaining()
+            record = next(cards, None)
+            if record is None:
+                break
+            if record["link"] == None or not self._isMatch(record, filter):
+                continue
+            ranking.push(record)
+            if lowerBound is not None and ranking.full and not ranking.canChange(lowerBound(record)):
+                self.stats["rankingStoppedEarly"] += 1
+                logger.info(f"Ranking can't change anymore, crawl stopped after {ranking.seen} matching ads")
+                break
+        cards.close()
+        missingDetails = []
+        topAds = []
+        for value, record in ranking.scored():
+            if not partial and budget.exhausted(self.stats["requests"]):
+                partial = True
+            if partial:
+                missingDetails.append(record["data-id"])
+                itemRecord = None
             else:
-                if contentDiv != None:
-                    rawSize = contentDiv.get_text()
-                    
-                    try:
-                        size = int(re.search(r"\d+\.?\d?", rawSize).group())
-                    except AttributeError:
-                        logger.warning(
-                            f"Couldn't extract size from item ID {adData['data-id']}"
-                        )
-                    else:
-                        logger.debug(
-                            f"Extracted rent for item with ID {adData['data-id']}. Item size : {size} m2"
-                        )
-            
-            return size if size != None else 0
-        
-    def _getImagesHelper(self, category, adData):
+                self.requestTimeout = budget.remaining()
+                itemRecord = self._fetchItemRecord(record)
+            ad = self._formatAd(self._addItemFields(record, itemRecord))
+            ad["score"] = value
+            topAds.append(ad)
+        if not partial:
+            self.fetchImages(topAds)
+        self.requestTimeout = None
+        self.reportStats()
+        return CrawlResult(topAds, partial, budget.reason, missingDetails)
+
+    def iterCards(self, pagesToSearch=None):
         """
-        getItem's helper function to extract images from ad.
+        Yield card records of search pages (see `getCardRecords()`), one request per search page and no item's page.
+        Ads already seen during current run are skipped.
+
+        Params
+        ------
+        pagesToSearch : int
+            Total number of page to seach on website, if left empty it'll search all pages.
         """
-        try:
-            imgBS4List = FlatHunterBase.getElementsByClass(adData["ad-page-soup"], get="all", _class="im__banner__slider")
-        except KeyError:
+        baseURL, params = self.getSearchURL()
+        soup = self.getPageSoup(f"{baseURL}page-1{params}")
+        if soup is None:
+            return
+        numberOfPages = pagesToSearch if pagesToSearch != None else (self.getNumberOfPages(soup) or 1)
+        for pageNb in range(1, numberOfPages + 1):
+            pageSoup = soup if pageNb == 1 else self.getPageSoup(f"{baseURL}page-{pageNb}{params}")
+            if pageSoup is None:
+                continue
+            for record in self.getCardRecords(pageSoup):
+                if record["data-id"] in self.seenIDs:
+                    self.stats["duplicateAds"] += 1
+                    continue
+                self.seenIDs.add(record["data-id"])
+                yield record
+
+    def iterItems(self, filter, pagesToSearch=None, cards=None):
+        """
+        getItems's generator version : matching ads (formatted as `getItems()` ones) are yielded as soon as their item's
+        page is fetched (and their images, with an image store), and only one search page is held in memory at a time, so
+        memory doesn't grow with crawl size.
+
+        Params
+        ------
+        filter : dict
+            Filter of `getItems()`.
+        pagesToSearch : int
+            Total number of page to seach on website, if left empty it'll search all pages.
+        cards : list
+            If set, every card record of search (matching or not, see `getCardRecords()`) is appended to it, e.g. to
+            record whole search in a `HistoryStore`.
+        """
+        self.resetRun()
+        for ad in self._iterMatches(filter, pagesToSearch, cards):
+            self.fetchImages([ad])
+            yield ad
+        self.reportStats()
+
+    def fetchImages(self, ads):
+        """
+        Image stage : fetch images of ads with `fetchWorkers` threads (under rate limiter) into image store and add their
+        content hashes to ads (`imageHashes` key, see `image_store.fetchImages()`). Does nothing without an image store.
+        """
+        if self.imageStore is not None and ads:
+            return fetchImages(self, ads, self.imageStore, self.fetchWorkers)
+
+    def prefetchDetails(self, ads):
+        """
+        Load item's pages of lazy ads returned by `getItems(..., lazyDetails=True)` with `fetchWorkers` threads.
+        """
+        return prefetchDetails(ads, self.fetchWorkers)
+
+    # === HELPER FUNCTIONS === #
+    def _lazyAd(self, record):
+        """
+        Build LazyAd of matching card record, its item's page fields are loaded on first access.
+        """
+        keyOrder = list(self._formatAd(dict.fromkeys(("data-id", "link", *self.extractionPlan.defaults()))))
+        detailKeys = [key for key in keyOrder if key not in record]
+        return LazyAd(
+            {key: record[key] for key in keyOrder if key in record},
+            lambda: self._addItemFields(dict(record), self._fetchItemRecord(record)),
+            detailKeys,
+            keyOrder,
+        )
+
+    def _iterMatches(self, filter, pagesToSearch, cards=None):
+        """
+        Yield formatted matching ads of search, item's page is only fetched for cards matching filter.
+        """
+        for record in self.iterCards(pagesToSearch):
+            if cards is not None:
+                cards.append(dict(record))
+            if record["link"] != None and self._isMatch(record, filter):
+                yield self._formatAd(self._addItemFields(record, self._fetchItemRecord(record)))
+
+    @staticmethod
+    def _writeToSinks(ads, sinks):
+        """
+        getItem's helper function to write ads to every sink.
+        """
+        for sink in sinks or ():
+            for ad in ads:
+                sink.write(ad)
+
+    def _fetchItemRecord(self, record):
+        """
+        Fetch item's page of card record and return its compact record (see `getItemRecord()`), None if page couldn't be
+        fetched. With a change tracker, page is fetched conditionally and only parsed if it changed (see
+        `_getItemPageTracked()`). Records are memoized for current run (see `resetRun()`).
+        """
+        itemRecord, sharedFrom = self.itemRecords.do(canonicalURL(record["link"]), lambda: self._requestItemRecord(record))
+        if sharedFrom == "memo":
+            self.stats["itemPagesReused"] += 1
+        # Callers update ads with record, memoized one stays untouched
+        return dict(itemRecord) if itemRecord is not None else None
+
+    def _requestItemRecord(self, record):
+        """
+        _fetchItemRecord's helper : fetch and extract item's page, without memo.
+        """
+        if self.changeTracker is None:
+            pageContent = self.getPageContent(record["link"])
+            return self.getItemRecord(pageContent) if pageContent is not None else None
+        itemDict = {"data-id": record["data-id"], "link": record["link"]}
+        self._getItemPageTracked(itemDict)
+        if "ad-page-data" not in itemDict:
+            return None
+        return self.extractionPlan.run(itemDict, sources=self.pageSources)
+
+    def _addItemFields(self, record, itemRecord):
+        """
+        Add item's page fields (see `_fetchItemRecord()`) to card record, defaults are used if item's page couldn't be fetched.
+        """
+        record.update({key: value for key, value in self.extractionPlan.defaults().items() if key not in record})
+        if itemRecord is not None:
+            record.update(itemRecord)
+        return record
+
+    def _getItemsBudgeted(self, filter, pagesToSearch, budget, priority):
+        """
+        getItem's budgeted version : search pages are crawled first (cards only), then item's pages of matching ads are
+        fetched from a priority queue, while budget allows another request. Each request is also bounded by time left.
+        When budget runs out, matching ads found so far are returned (item's page fields of ads not fetched yet are
+        defaults) in a CrawlResult flagged `partial`.
+        """
+        priorityKey = getPriority(priority)
+        baseURL, params = self.getSearchURL()
+        matches = []
+        partial = False
+        numberOfPages = pagesToSearch
+        pageNb = 1
+        while numberOfPages == None or pageNb <= numberOfPages:
+            if budget.exhausted(self.stats["requests"]):
+                partial = True
+                break
+            self.requestTimeout = budget.remaining()
+            soup = self.getPageSoup(f"{baseURL}page-{pageNb}{params}")
+            if soup is None:
+                if numberOfPages == None:
+                    # First page gives number of pages
+                    break
+                pageNb += 1
+                continue
+            if numberOfPages == None:
+                numberOfPages = self.getNumberOfPages(soup) or 1
+            for record in self.getCardRecords(soup):
+                if record["data-id"] in self.seenIDs:
+                    self.stats["duplicateAds"] += 1
+                    continue
+                self.seenIDs.add(record["data-id"])
+                if record["link"] != None and self._isMatch(record, filter):
+                    matches.append(record)
+            pageNb += 1
+        # Position breaks ties, records themselves are never compared
+        queue = [(priorityKey(record), position, record) for position, record in enumerate(matches)]
+        heapq.heapify(queue)
+        while queue:
+            if budget.exhausted(self.stats["requests"]):
+                partial = True
+                break
+            _, _, record = heapq.heappop(queue)
+            self.requestTimeout = budget.remaining()
+            itemRecord = self._fetchItemRecord(record)
+            if itemRecord is not None:
+                record.update(itemRecord)
+                record["detailed"] = True
+        self.requestTimeout = None
+        missingDetails = []
+        filteredAdsList = []
+        for record in matches:
+            if not record.pop("detailed", False):
+                missingDetails.append(record["data-id"])
+            record.update({key: value for key, value in self.extractionPlan.defaults().items() if key not in record})
+            filteredAdsList.append(self._formatAd(record))
+        if partial:
             logger.warning(
-                f"ad['ad-page-soup'] is equal to None ! Couldn't extract images from item ID {adData['data-id']}"
+                f"Crawl budget exhausted ({budget.reason}) : {len(filteredAdsList)} ads returned, {len(missingDetails)} without item's page"
             )
+        return CrawlResult(filteredAdsList, partial, budget.reason, missingDetails)
+
+    def _getItemPageTracked(self, itemDict):
+        """
+        getItemPage's version with change detection : conditional request first, then content hash, both checked against
+        last seen version of page. If page didn't change, previous record is reused as `ad-page-data` without parsing.
+        """
+        dataID = itemDict["data-id"]
+        state = self.changeTracker.get(dataID)
+        if state is not None and state["extractorVersion"] != self.extractorVersion:
+            # Record was extracted by another extractor version, it can't be reused
+            state = None
+        response = self.fetchPage(itemDict["link"], self.changeTracker.conditionalHeaders(state))
+        if response is None:
+            logger.warning(f"Couldn't get item's page (item {dataID})")
+            return
+        etag = response.headers.get("ETag")
+        lastModified = response.headers.get("Last-Modified")
+        if state is not None and response.status_code == 304:
+            self.stats["notModified"] += 1
+        elif state is not None and ChangeTracker.contentHash(response.content) == state["contentHash"]:
+            self.stats["unchangedContent"] += 1
         else:
-            imgDict = {}
-            if imgBS4List != None:
-                imagesBS4List = imgBS4List[0].find_all("img")
-                for image in imagesBS4List:
-                    imgAlt = image["alt"]
-                    images = image["data-lazy"]
-                    imgDict[imgAlt] = images
+            self.decodeItemPage(itemDict, response.content)
+            record = {**itemDict.get("ad-page-data", {}), **self.extractionPlan.run(itemDict, sources=self.pageSources)}
+            itemDict["ad-page-data"] = record
+            self.changeTracker.update(
+                dataID,
+                itemDict["link"],
+                etag,
+                lastModified,
+                ChangeTracker.contentHash(response.content),
+                self.extractorVersion,
+                record,
+            )
+            self.stats["parses"] += 1
+            return
+        itemDict["ad-page-data"] = state["record"]
+        self.changeTracker.touch(dataID, etag, lastModified)
+        self.stats["parsesAvoided"] += 1
+        logger.info(f"Item's page of item with id {dataID} didn't change, previous record reused")
+
+    def _searchPagesStreamed(self, baseURL, params, pagesToSearch):
+        """
+        searchPages's streaming version, first page is streamed once (ads and number of pages).
+        """
+        firstPageURL = f"{baseURL}page-1{params}"
+        logger.info(f"Stream first page of search from URL : '{firstPageURL}'")
+        adsList, numberOfPages = self.streamSearchPage(firstPageURL)
+        logger.info(f"Total number of pages for search is {numberOfPages}")
+        if pagesToSearch != None:
+            numberOfPages = pagesToSearch
+        pagesList = [adsList]
+        for pageNb in range(2, (numberOfPages or 1) + 1):
+            pageURL = f"{baseURL}page-{pageNb}{params}"
+            logger.info(f"Stream page from URL : '{pageURL}'")
+            adsList, _ = self.streamSearchPage(pageURL)
+            logger.info(f"<====== Extracted ads of page {pageNb} ======>")
+            logger.info(f"Total ads extracted : {len(adsList)}")
+            pagesList.append(adsList)
+        return pagesList
+
+    def _isMatch(self, fields, filter):
+        """
+        getItem's helper function to check if ad's fields match filter dict keys (rent, room, size and optional
+        geographic keys "radius", "bbox" and "polygon", see `matchesArea()`).
+        """
+        rent, rooms, size = fields["rent"], fields["rooms"], fields["size"]
+        if rent >= filter["minRent"] and rent <= filter["maxRent"]:
+            if rooms >= filter["minRooms"] and rooms <= filter["maxRooms"]:
+                if size >= filter["minSize"] and size <= filter["maxSize"] and matchesArea(fields.get("latlng"), filter):
+                    logger.info(
+                        f"Ad {fields['data-id']} is a match => {rooms} rooms, rent {rent} CHF and size {size} m2."
+                    )
+                    return True
+        return False
+
+    @staticmethod
+    def _formatAd(fields):
+        """
+        getItem's helper function to build returned ad dictionnary.
+        """
+        formatedDict = {}
+        formatedDict["data-id"] = fields["data-id"]
+        formatedDict["link"] = fields["link"]
+        formatedDict["images"] = fields["images"]
+        formatedDict["rent"] = fields["rent"]
+        formatedDict["rooms"] = fields["rooms"]
+        formatedDict["size"] = fields["size"]
+        formatedDict["latlng"] = fields["latlng"]
+        formatedDict["address"] = fields["address"]
+        return formatedDict
+
+    def _getItemsPooled(self, filter, pagesToSearch):
+        """
+        getItem's pooled version : search pages and item's pages are fetched by threads and parsed in a process pool.
+        Cards are filtered before item's pages are fetched, so only matching ads cost an extra request.
+        """
+        baseURL, params = self.getSearchURL()
+        with ParsePool(self.parseWorkers, self.fetchWorkers) as pool:
+            # First page gives number of pages and is kept as page 1 of search
+            firstPageURL = f"{baseURL}page-1{params}"
+            firstPage = pool.fetchAndParse(
+                self.getPageContent, [firstPageURL], extractSearchPage, itemCategory=self.itemCategory, countPages=True
+            )[0]
+            if firstPage is None:
+                logger.error(f"Couldn't get first page of search : '{firstPageURL}'")
+                return []
+            numberOfPages = (firstPage["numberOfPages"] or 1) if pagesToSearch == None else pagesToSearch
+            logger.info(f"Total number of pages for search is {numberOfPages}")
+            pageURLs = [f"{baseURL}page-{pageNb}{params}" for pageNb in range(2, numberOfPages + 1)]
+            pages = [firstPage] + pool.fetchAndParse(
+                self.getPageContent, pageURLs, extractSearchPage, itemCategory=self.itemCategory
+            )
+            # Filter cards, then get item's pages of matches only
+            matches = []
+            for page in pages:
+                if page is None:
+                    continue
+                for record in page["ads"]:
+                    # Same ad can be listed on several pages while listings shift during crawl
+                    if record["data-id"] in self.seenIDs:
+                        self.stats["duplicateAds"] += 1
+                        continue
+                    self.seenIDs.add(record["data-id"])
+                    if record["link"] != None and self._isMatch(record, filter):
+                        matches.append(record)
+            if self.changeTracker is not None:
+                # Unchanged pages aren't parsed at all, changed ones are parsed by fetching threads
+                itemRecords = list(pool.fetchers.map(self._fetchItemRecord, matches))
             else:
-                logger.warning(
-                    f"Couldn't extract images from item ID {adData['data-id']}, 'im__banner__slider' is equal to None !"
-                )  
-            # Return dictionnary of images or empty dictionnary
-            return imgDict
\ No newline at end of file
+                itemRecords = pool.fetchAndParse(
+                    self.getPageContent,
+                    [record["link"] for record in matches],
+                    extractItemPage,
+                    itemCategory=self.itemCategory,
+                    fastPath=self.fastPath,
+                )
+        filteredAdsList = []
+        for record, itemRecord in zip(matches, itemRecords):
+            if itemRecord is None:
+                # Item's page unreachable, only item's page fields fall back to defaults
+                itemRecord = {key: value for key, value in self.extractionPlan.defaults().items() if key not in record}
+            record.update(itemRecord)
+            filteredAdsList.append(self._formatAd(record))
+        return filteredAdsList
+
+
+# === PROCESS POOL WORKERS === #
+# Crawler instances are cached per worker process so that extraction plans are compiled once
+_workerSites = {}
+
+
+def _getWorkerSite(itemCategory, fastPath=False):
+    key = (itemCategory, fastPath)
+    if key not in _workerSites:
+        _workerSites[key] = ImmoCH(itemCategory, fastPath=fastPath)
+    return _workerSites[key]
+
+
+def extractSearchPage(pageContent, itemCategory, countPages=False):
+    """
+    Parse raw search page and return its compact card records (see `ImmoCH.getCardRecords()`).
+
+    Returns
+    -------
+    pageDict : dict
+        Dictionnary with keys :
+            <numberOfPages> int : Number of pages of search (None if `countPages` is False)
+            <ads> list : Card records of page
+    """
+    site = _getWorkerSite(itemCategory)
+    soup = site.parsePage(pageContent)
+    numberOfPages = site.getNumberOfPages(soup) if countPages else None
+    return {"numberOfPages": numberOfPages, "ads": site.getCardRecords(soup)}
+
+
+def fieldDefaults(itemCategory):
+    """
+    Return default value of every field (used for fields an archived or failed item's page can't give).
+    """
+    return _getWorkerSite(itemCategory).extractionPlan.defaults()
+
+
+def extractItemPage(pageContent, itemCategory, fastPath=False):
+    """
+    Parse raw item's page and return its compact record (see `ImmoCH.getItemRecord()`).
+    """
+    return _getWorkerSite(itemCategory, fastPath).getItemRecord(pageContent)
@@ -0,0 +1,63 @@
+"""
+Registry of site modules (FlatHunterBase children). Sites are registered by name with their import path and only imported
+when they're first requested, so listing sites (e.g. for `--help`) doesn't import bs4, requests or site code.
+"""
+
+import importlib
+
+# Site name -> "module:ClassName"
+SITES = {
+    "immoch": "FlatHunter.modules.ImmoCH:ImmoCH",
+}
+# Entry points group where installed packages can declare more sites (name = "package.module:ClassName")
+ENTRY_POINTS_GROUP = "flathunter.sites"
+
+_loadedSites = {}
+
+
+def registerSite(name, target):
+    """
+    Register a site class under name.
+
+    Params
+    ------
+    name : str
+        Site name (e.g. "immoch").
+    target : str or type
+        Import path "module:ClassName" (imported on first use) or site class itself.
+    """
+    _loadedSites.pop(name, None)
+    if isinstance(target, str):
+        SITES[name] = target
+    else:
+        SITES[name] = f"{target.__module__}:{target.__qualname__}"
+        _loadedSites[name] = target
+
+
+def availableSites():
+    """
+    Return names of registered sites (nothing is imported).
+    """
+    return sorted({**_entryPoints(), **SITES})
+
+
+def getSite(name):
+    """
+    Return site class registered under name, importing its module on first call.
+    """
+    if name not in _loadedSites:
+        target = SITES.get(name) or _entryPoints().get(name)
+        if target is None:
+            raise KeyError(f"Unknown site '{name}', expected one of {availableSites()}")
+        moduleName, className = target.split(":")
+        _loadedSites[name] = getattr(importlib.import_module(moduleName), className)
+    return _loadedSites[name]
+
+
+def _entryPoints():
+    """
+    Sites declared by installed packages (entry points are only read, not imported).
+    """
+    from importlib.metadata import entry_points
+
+    return {entryPoint.name: entryPoint.value for entryPoint in entry_points(group=ENTRY_POINTS_GROUP)}
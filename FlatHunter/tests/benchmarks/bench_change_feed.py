@@ -0,0 +1,91 @@
+"""
+Compare merge-join change feed over sorted snapshot files with nested loops over two lists of ads (previous approach,
+measured on a sample and extrapolated).
+Usage : python -m FlatHunter.tests.benchmarks.bench_change_feed [numberOfAds]
+"""
+
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from FlatHunter.utils.change_feed import changeFeed, readSnapshot, snapshotChanges, writeSnapshot
+
+numberOfAds = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+# Nested loops sample size
+SAMPLE = 2000
+rng = random.Random(0)
+
+
+def makeAd(dataID):
+    return {
+        "data-id": dataID,
+        "link": f"https://www.immobilier.ch/fr/louer/appartement/geneve/{dataID}",
+        "images": {f"Image {position}": f"https://photos.immobilier.ch/{dataID}/{position}.jpg" for position in range(3)},
+        "rent": rng.randrange(800, 6000, 10),
+        "rooms": 3.0,
+        "size": 70,
+    }
+
+
+previous = [makeAd(dataID) for dataID in rng.sample(range(10**7), numberOfAds)]
+current = []
+for ad in previous:
+    draw = rng.random()
+    if draw < 0.01:
+        continue  # Removed
+    ad = dict(ad)
+    if draw < 0.03:
+        ad["rent"] += 50
+    elif draw < 0.04:
+        ad["images"] = {}
+    current.append(ad)
+current += [makeAd(10**7 + position) for position in range(numberOfAds // 100)]
+rng.shuffle(current)
+
+
+def nestedLoops(previousAds, currentAds):
+    events = []
+    for ad in currentAds:
+        match = None
+        for old in previousAds:
+            if old["data-id"] == ad["data-id"]:
+                match = old
+                break
+        if match is None:
+            events.append("added")
+        else:
+            if match["rent"] != ad["rent"]:
+                events.append("rent_changed")
+            if match["images"] != ad["images"]:
+                events.append("images_changed")
+    for old in previousAds:
+        if not any(ad["data-id"] == old["data-id"] for ad in currentAds):
+            events.append("removed")
+    return events
+
+
+start = time.perf_counter()
+nestedLoops(previous[:SAMPLE], current[:SAMPLE])
+nestedTime = (time.perf_counter() - start) * (numberOfAds / SAMPLE) ** 2
+
+with tempfile.TemporaryDirectory() as folder:
+    start = time.perf_counter()
+    writeSnapshot(f"{folder}/previous.ndjson", previous, runSize=50000)
+    writeSnapshot(f"{folder}/current.ndjson", current, runSize=50000)
+    writeTime = (time.perf_counter() - start) / 2
+    del previous, current
+    start = time.perf_counter()
+    counts = Counter(change["event"] for change in snapshotChanges(f"{folder}/previous.ndjson", f"{folder}/current.ndjson"))
+    feedTime = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in changeFeed(readSnapshot(f"{folder}/previous.ndjson"), readSnapshot(f"{folder}/current.ndjson")):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+print(f"{numberOfAds} ads per crawl : {dict(counts)}")
+print(f"Nested loops : {nestedTime:.0f}s (extrapolated from {SAMPLE} ads)")
+print(f"Sorted snapshot written in {writeTime:.2f}s (external sort, 50000 ads per run)")
+print(f"Merge-join : {feedTime:.2f}s, peak memory {peak / 2**20:.2f} MB => speedup x{nestedTime / feedTime:.0f}")
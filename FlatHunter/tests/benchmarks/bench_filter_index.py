@@ -0,0 +1,60 @@
+"""
+Measure matching time of FilterIndex against checking every filter, for many filters and ads (random data).
+Usage : python -m FlatHunter.tests.benchmarks.bench_filter_index [numberOfFilters] [numberOfAds]
+"""
+
+import random
+import sys
+import time
+from FlatHunter.utils.filter_index import FilterIndex
+
+numberOfFilters = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+numberOfAds = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+rng = random.Random(0)
+
+
+def randomFilter():
+    minRent = rng.randrange(0, 5000, 50)
+    minRooms = rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 5.0])
+    minSize = rng.randrange(0, 150, 5)
+    return {
+        "minRent": minRent,
+        "maxRent": minRent + rng.randrange(100, 3000, 50),
+        "minRooms": minRooms,
+        "maxRooms": minRooms + rng.choice([0.5, 1.0, 1.5, 2.0, 3.0]),
+        "minSize": minSize,
+        "maxSize": minSize + rng.randrange(10, 150, 5),
+    }
+
+
+filters = [randomFilter() for _ in range(numberOfFilters)]
+ads = [
+    {"rent": rng.randrange(500, 9000), "rooms": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 6.0]), "size": rng.randrange(15, 250)}
+    for _ in range(numberOfAds)
+]
+
+start = time.perf_counter()
+index = FilterIndex()
+for subscriberID, filter in enumerate(filters):
+    index.add(subscriberID, filter)
+index.match(ads[0])
+print(f"Index build : {time.perf_counter() - start:.2f}s for {numberOfFilters} filters")
+
+start = time.perf_counter()
+matches = sum(len(index.match(ad)) for ad in ads)
+indexed = time.perf_counter() - start
+print(f"Indexed : {indexed:.2f}s for {numberOfAds} ads ({indexed / numberOfAds * 1e6:.0f} us/ad, {matches} matches)")
+
+# Checking every filter is slow : measured on a sample of ads and extrapolated
+sample = ads[:200]
+start = time.perf_counter()
+for ad in sample:
+    [
+        subscriberID
+        for subscriberID, filter in enumerate(filters)
+        if filter["minRent"] <= ad["rent"] <= filter["maxRent"]
+        and filter["minRooms"] <= ad["rooms"] <= filter["maxRooms"]
+        and filter["minSize"] <= ad["size"] <= filter["maxSize"]
+    ]
+naive = (time.perf_counter() - start) / len(sample) * numberOfAds
+print(f"Every filter : {naive:.2f}s for {numberOfAds} ads (extrapolated) => speedup x{naive / indexed:.1f}")
@@ -0,0 +1,63 @@
+"""
+Measure radius, bounding box and polygon queries of GeoIndex against a linear scan, over random listings in Switzerland.
+Usage : python -m FlatHunter.tests.benchmarks.bench_geo_index [numberOfListings] [numberOfQueries]
+"""
+
+import random
+import sys
+import time
+from FlatHunter.utils.geo_index import GeoIndex, haversine, inPolygon
+
+numberOfListings = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+numberOfQueries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+rng = random.Random(0)
+
+points = [(rng.uniform(45.8, 47.8), rng.uniform(5.9, 10.5)) for _ in range(numberOfListings)]
+centers = [points[rng.randrange(numberOfListings)] for _ in range(numberOfQueries)]
+
+start = time.perf_counter()
+index = GeoIndex()
+for dataID, (lat, lng) in enumerate(points):
+    index.add(dataID, lat, lng)
+print(f"Index build : {time.perf_counter() - start:.2f}s for {numberOfListings} listings")
+
+
+def measure(name, indexed, scanned, scanSample=20):
+    start = time.perf_counter()
+    found = sum(len(indexed(center)) for center in centers)
+    indexedTime = (time.perf_counter() - start) / numberOfQueries
+    start = time.perf_counter()
+    for center in centers[:scanSample]:
+        scanned(center)
+    scanTime = (time.perf_counter() - start) / scanSample
+    print(
+        f"{name} : {indexedTime * 1e3:.3f} ms/query indexed, {scanTime * 1e3:.1f} ms/query scanned => "
+        f"speedup x{scanTime / indexedTime:.0f} ({found / numberOfQueries:.1f} results/query)"
+    )
+
+
+measure(
+    "Radius 2 km",
+    lambda center: index.radius(center[0], center[1], 2),
+    lambda center: [dataID for dataID, point in enumerate(points) if haversine(*center, *point) <= 2],
+)
+measure(
+    "Bounding box",
+    lambda center: index.bbox(center[0], center[1], center[0] + 0.03, center[1] + 0.04),
+    lambda center: [
+        dataID
+        for dataID, (lat, lng) in enumerate(points)
+        if center[0] <= lat <= center[0] + 0.03 and center[1] <= lng <= center[1] + 0.04
+    ],
+)
+
+
+def triangle(center):
+    return [[center[0], center[1]], [center[0] + 0.04, center[1] + 0.02], [center[0], center[1] + 0.05]]
+
+
+measure(
+    "Polygon",
+    lambda center: index.polygon(triangle(center)),
+    lambda center: [dataID for dataID, point in enumerate(points) if inPolygon(*point, triangle(center))],
+)
@@ -0,0 +1,82 @@
+"""
+Compare history store with per-crawl pickles (`saveObject()` snapshots) : disk size, time to record a crawl and time to
+get rent history of one listing.
+Usage : python -m FlatHunter.tests.benchmarks.bench_history_store [numberOfListings] [numberOfCrawls]
+"""
+
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from FlatHunter.utils.history_store import HistoryStore
+
+numberOfListings = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+numberOfCrawls = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+# Share of listings whose rent changes, and of listings replaced by new ones, between two crawls
+RENT_CHANGES = 0.02
+CHURN = 0.01
+rng = random.Random(0)
+
+listings = {dataID: rng.randrange(800, 6000, 10) for dataID in range(900000, 900000 + numberOfListings)}
+nextID = 900000 + numberOfListings
+crawls = []
+for crawl in range(numberOfCrawls):
+    ads = [
+        {"data-id": dataID, "link": f"https://www.immobilier.ch/fr/louer/appartement/geneve/{dataID}", "rent": rent, "rooms": 3.0, "size": 70}
+        for dataID, rent in listings.items()
+    ]
+    crawls.append((1.7e9 + crawl * 3600, ads))
+    for dataID in rng.sample(list(listings), int(numberOfListings * RENT_CHANGES)):
+        listings[dataID] += rng.choice([-100, -50, 50, 100])
+    for dataID in rng.sample(list(listings), int(numberOfListings * CHURN)):
+        del listings[dataID]
+        listings[nextID] = rng.randrange(800, 6000, 10)
+        nextID += 1
+target = 900000 + numberOfListings // 2
+
+with tempfile.TemporaryDirectory() as folder:
+    # Pickled snapshots
+    start = time.perf_counter()
+    for crawledAt, ads in crawls:
+        with open(f"{folder}/flat_{crawledAt:.0f}.search", "wb") as f:
+            pickle.dump({"timeStamp": datetime.fromtimestamp(crawledAt), "object": ads}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    pickleWrite = (time.perf_counter() - start) / numberOfCrawls
+    pickleSize = sum(os.path.getsize(f"{folder}/{name}") for name in os.listdir(folder))
+    start = time.perf_counter()
+    rents = []
+    for name in sorted(os.listdir(folder)):
+        with open(f"{folder}/{name}", "rb") as f:
+            saved = pickle.load(f)
+        rents.extend((saved["timeStamp"], ad["rent"]) for ad in saved["object"] if ad["data-id"] == target)
+    pickleLookup = time.perf_counter() - start
+
+    # History store
+    store = HistoryStore(f"{folder}/history.bin")
+    start = time.perf_counter()
+    for crawledAt, ads in crawls:
+        store.update(ads, crawledAt)
+    storeWrite = (time.perf_counter() - start) / numberOfCrawls
+    store.close()
+    storeSize = os.path.getsize(f"{folder}/history.bin")
+    start = time.perf_counter()
+    store = HistoryStore(f"{folder}/history.bin")
+    storeLoad = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        history = store.history(target)
+    storeLookup = (time.perf_counter() - start) / 1000
+    start = time.perf_counter()
+    changed = sum(1 for _ in store.scan(since=crawls[-2][0], until=crawls[-1][0]))
+    scanTime = time.perf_counter() - start
+    store.close()
+
+print(f"{numberOfListings} listings, {numberOfCrawls} crawls")
+print(f"Pickles : {pickleSize / 2**20:7.1f} MB, {pickleWrite * 1000:6.1f} ms per crawl, rent history of one listing in {pickleLookup * 1000:.0f} ms")
+print(
+    f"History : {storeSize / 2**20:7.2f} MB, {storeWrite * 1000:6.1f} ms per crawl, opened in {storeLoad * 1000:.0f} ms, "
+    f"rent history of one listing in {storeLookup * 1e6:.1f} us ({len(history)} changes), "
+    f"listings changed by last crawl scanned in {scanTime * 1000:.0f} ms ({changed})"
+)
@@ -0,0 +1,75 @@
+"""
+Compare image stage (concurrent fetching into content-addressed store) with each consumer of pictures (dedup, previews)
+downloading them one by one. Requests are simulated with a fixed latency, some listings are re-posts showing the same
+photos under new URLs.
+Usage : python -m FlatHunter.tests.benchmarks.bench_image_store [numberOfAds] [latencyMs] [workers]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from FlatHunter.utils.image_store import ImageStore, fetchImages
+
+numberOfAds = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+workers = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+IMAGES_PER_AD = 5
+# Share of listings re-posted (same photos, new URLs) and number of consumers downloading pictures
+REPOSTS = 0.2
+CONSUMERS = 2
+rng = random.Random(0)
+
+photos = {}
+ads = []
+for dataID in range(numberOfAds):
+    original = ads[rng.randrange(len(ads))] if ads and rng.random() < REPOSTS else None
+    images = {}
+    for position in range(IMAGES_PER_AD):
+        url = f"https://photos.immobilier.ch/{dataID}/{position}.jpg"
+        photos[url] = photos[list(original["images"].values())[position]] if original else os.urandom(rng.randrange(50000, 150000))
+        images[f"Image {position}"] = url
+    ads.append({"data-id": dataID, "images": images})
+
+
+class SimulatedSite:
+    """
+    Site whose requests take `latency` seconds.
+    """
+    def __init__(self):
+        self.stats = Counter()
+
+    def fetchAsset(self, _url):
+        time.sleep(latency)
+        self.stats["requests"] += 1
+        return photos[_url]
+
+
+site = SimulatedSite()
+start = time.perf_counter()
+for ad in ads:
+    for url in ad["images"].values():
+        site.fetchAsset(url)
+oneByOne = (time.perf_counter() - start) * CONSUMERS
+downloaded = sum(len(photos[url]) for ad in ads for url in ad["images"].values())
+
+with tempfile.TemporaryDirectory() as folder:
+    store = ImageStore(folder)
+    site = SimulatedSite()
+    start = time.perf_counter()
+    counters = fetchImages(site, ads, store, workers)
+    firstCrawl = time.perf_counter() - start
+    start = time.perf_counter()
+    fetchImages(site, ads, store, workers)
+    nextCrawl = time.perf_counter() - start
+    stored = sum(path.stat().st_size for path in (store.folder / "objects").rglob("*") if path.is_file())
+    report = store.report()
+    store.close()
+
+print(f"{numberOfAds} ads x {IMAGES_PER_AD} images, {latency * 1000:.0f} ms per request, {REPOSTS:.0%} re-posts")
+print(f"One by one    : {oneByOne:6.2f}s ({CONSUMERS} consumers), {downloaded * CONSUMERS / 2**20:.0f} MB downloaded")
+print(f"Image stage   : {firstCrawl:6.2f}s ({workers} workers) => speedup x{oneByOne / firstCrawl:.0f}, {counters}")
+print(f"Stored        : {stored / 2**20:6.0f} MB for {downloaded / 2**20:.0f} MB of images (deduplication rate {report['deduplicationRate']})")
+print(f"Next crawl    : {nextCrawl:6.2f}s, {site.stats['requests'] - counters['downloads']} requests (URL hit rate {report['urlHitRate']})")
@@ -0,0 +1,76 @@
+"""
+Compare market statistics (median and p90 rent per category, region and rooms) computed from mergeable sketches with
+those computed by keeping every rent and sorting lists. Sketches are updated per worker, then merged.
+Usage : python -m FlatHunter.tests.benchmarks.bench_market_stats [numberOfAds] [workers]
+"""
+
+import json
+import random
+import sys
+import time
+from FlatHunter.utils.market_stats import MarketStats
+
+numberOfAds = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+rng = random.Random(0)
+
+REGIONS = ["geneve", "vaud", "valais", "fribourg", "neuchatel"]
+CATEGORIES = ["flat", "commercial"]
+ROOMS = [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 5.0]
+
+ads = []
+for dataID in range(numberOfAds):
+    rooms = rng.choice(ROOMS)
+    size = int(rng.gauss(25 * rooms, 8)) or 1
+    ads.append(
+        {
+            "data-id": dataID,
+            "category": rng.choice(CATEGORIES),
+            "region": rng.choice(REGIONS),
+            "rooms": rooms,
+            "size": size,
+            "rent": int(size * rng.lognormvariate(3.3, 0.25)),
+        }
+    )
+
+# Sorted lists (previous approach)
+start = time.perf_counter()
+rentsByGroup = {}
+for ad in ads:
+    rentsByGroup.setdefault((ad["category"], ad["region"], ad["rooms"]), []).append(ad["rent"])
+exact = {}
+for group, rents in rentsByGroup.items():
+    rents.sort()
+    exact[group] = (rents[(len(rents) + 1) // 2 - 1], rents[-(-9 * len(rents) // 10) - 1])
+listTime = time.perf_counter() - start
+
+# Sketches : one per worker, merged
+start = time.perf_counter()
+partials = [MarketStats() for _ in range(workers)]
+for position, ad in enumerate(ads):
+    partials[position % workers].add(ad)
+updateTime = time.perf_counter() - start
+start = time.perf_counter()
+market = MarketStats()
+for partial in partials:
+    market.merge(partial)
+mergeTime = time.perf_counter() - start
+start = time.perf_counter()
+rows = market.summary()
+summaryTime = time.perf_counter() - start
+
+errors = []
+for row in rows:
+    rents = rentsByGroup[(row["category"], row["region"], row["rooms"])]
+    for q, value in row["rent"].items():
+        # Rank error : distance between asked quantile and real rank of estimate
+        low = sum(1 for rent in rents if rent < value) / len(rents)
+        high = sum(1 for rent in rents if rent <= value) / len(rents)
+        errors.append(0 if low <= q <= high else min(abs(q - low), abs(q - high)))
+rawSize = len(json.dumps([ad["rent"] for ad in ads]))
+sketchSize = len(json.dumps(market.toDict()))
+
+print(f"{numberOfAds} ads, {len(rows)} groups, {len(market.buckets)} buckets (size bands included), {workers} workers")
+print(f"Sorted lists : {listTime:.2f}s (every rent kept, {rawSize / 2**20:.1f} MB as JSON)")
+print(f"Sketches : {updateTime:.2f}s updates + {mergeTime:.2f}s merge, summary in {summaryTime * 1000:.0f} ms ({sketchSize / 2**20:.1f} MB as JSON)")
+print(f"Rank error of median and p90 : mean {sum(errors) / len(errors):.4f}, max {max(errors):.4f}")
@@ -0,0 +1,76 @@
+"""
+Measure cross-site near-duplicate detection (MinHash/LSH) on synthetic listings : a share of first site's listings is
+relisted on second site with another address spelling and a slightly different rent. Compared with all pairs comparison
+(measured on a sample and extrapolated).
+Usage : python -m FlatHunter.tests.benchmarks.bench_near_duplicates [numberOfListings] [duplicateShare]
+"""
+
+import random
+import sys
+import time
+from FlatHunter.utils.near_duplicates import MinHasher, NearDuplicateIndex, adFeatures
+
+numberOfListings = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+duplicateShare = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+rng = random.Random(0)
+
+STREETS = ["rue", "avenue", "chemin", "route", "boulevard", "quai"]
+NAMES = ["Guillaume-Farel", "de Lausanne", "de Carouge", "du Rhône", "de Vermont", "de Miremont", "des Alpes", "de la Servette",
+         "de Frontenex", "de Champel", "du Lac", "de Chêne", "des Eaux-Vives", "de Malagnou", "de Florissant", "du Mont-Blanc"]
+CITIES = ["Genève", "Carouge", "Lancy", "Vernier", "Meyrin", "Onex", "Thônex", "Chêne-Bourg", "Lausanne", "Nyon", "Morges",
+          "Vevey", "Montreux", "Renens", "Pully", "Prilly"]
+
+
+def randomListing(dataID):
+    rooms = rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 6.0])
+    return {
+        "site": "first",
+        "data-id": dataID,
+        "address": f"{rng.choice(CITIES)}, {rng.randrange(1, 120)}, {rng.choice(STREETS)} {rng.choice(NAMES)}",
+        "rent": rng.randrange(800, 6000, 10),
+        "size": rng.randrange(20, 200),
+        "rooms": rooms,
+    }
+
+
+def relist(listing, dataID):
+    city, number, street = listing["address"].split(", ")
+    return {
+        **listing,
+        "site": "second",
+        "data-id": dataID,
+        "original": listing["data-id"],
+        "address": f"{street.capitalize()} {number}, {city}",
+        "rent": listing["rent"] + rng.choice([0, 10, 20, -10]),
+    }
+
+
+numberOfDuplicates = int(numberOfListings * duplicateShare)
+originals = [randomListing(dataID) for dataID in range(numberOfListings - numberOfDuplicates)]
+relisted = [relist(listing, 10**7 + position) for position, listing in enumerate(rng.sample(originals, numberOfDuplicates))]
+plantedPairs = [(("second", duplicate["data-id"]), ("first", duplicate["original"])) for duplicate in relisted]
+listings = originals + relisted
+rng.shuffle(listings)
+
+start = time.perf_counter()
+index = NearDuplicateIndex(groupOf=lambda key: key[0])
+for listing in listings:
+    index.add((listing["site"], listing["data-id"]), listing)
+clusters = index.clusters()
+elapsed = time.perf_counter() - start
+rootOf = {key: cluster[0] for cluster in clusters for key in cluster}
+found = sum(1 for duplicate, original in plantedPairs if duplicate in rootOf and rootOf[duplicate] == rootOf.get(original))
+falsePairs = sum(len(cluster) - 1 for cluster in clusters) - found
+print(f"LSH : {elapsed:.1f}s for {len(listings)} listings ({elapsed / len(listings) * 1e6:.0f} us/listing)")
+print(f"Recall : {found / len(plantedPairs):.1%} of {len(plantedPairs)} planted duplicates, {falsePairs} other pairs")
+
+# All pairs comparison of signatures, on a sample
+hasher = MinHasher()
+sample = [hasher.signature(adFeatures(listing)) for listing in listings[:2000]]
+start = time.perf_counter()
+for position, signature in enumerate(sample):
+    for other in sample[position + 1:]:
+        MinHasher.similarity(signature, other)
+pairTime = (time.perf_counter() - start) / (len(sample) * (len(sample) - 1) / 2)
+allPairs = pairTime * len(listings) * (len(listings) - 1) / 2
+print(f"All pairs : {allPairs:.0f}s for {len(listings)} listings (extrapolated) => speedup x{allPairs / elapsed:.0f}")
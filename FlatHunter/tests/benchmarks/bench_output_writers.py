@@ -0,0 +1,83 @@
+"""
+Measure throughput and peak memory of streaming output writers on synthetic ads, against previous output (each ad
+printed with `json.dumps(ad, indent=4)` once crawl is done).
+Usage : python -m FlatHunter.tests.benchmarks.bench_output_writers [numberOfAds]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from FlatHunter.utils import output_writers
+from FlatHunter.utils.output_writers import openWriter
+
+numberOfAds = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+rng = random.Random(0)
+
+
+def iterAds():
+    """
+    Yield synthetic ads shaped as getItems ones, one at a time (as a crawl feeds sinks).
+    """
+    for dataID in range(numberOfAds):
+        yield {
+            "data-id": dataID,
+            "link": f"https://www.immobilier.ch/fr/louer/appartement/geneve/geneve/{dataID}",
+            "images": {f"Image {position}": f"https://photos.immobilier.ch/{dataID}/{position}.jpg" for position in range(5)},
+            "rent": rng.randrange(800, 6000, 10),
+            "rooms": rng.choice([2.0, 2.5, 3.0, 3.5, 4.0]),
+            "size": rng.randrange(20, 200),
+            "latlng": [46.2 + rng.random() / 10, 6.1 + rng.random() / 10],
+            "address": f"Genève, {rng.randrange(1, 120)}, rue Guillaume-Farel",
+        }
+
+
+def printed(path):
+    # Previous output : whole crawl kept in a list, then every ad printed
+    ads = list(iterAds())
+    with open(path, "w", encoding="utf-8") as fp, redirect_stdout(fp):
+        for dic in ads:
+            print(json.dumps(dic, indent=4))
+            print("\n\n")
+
+
+def streamed(path, format):
+    with openWriter(path, format) as writer:
+        writer.writeMany(iterAds())
+
+
+def measure(name, function, path):
+    # Timed run first (tracemalloc slows allocations down), then memory run ; ads generation time is left out
+    rng.seed(0)
+    start = time.perf_counter()
+    function(path)
+    elapsed = time.perf_counter() - start - generationTime
+    size = os.path.getsize(path)
+    rng.seed(0)
+    tracemalloc.start()
+    function(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<18} {elapsed:6.2f}s {numberOfAds / elapsed:>9.0f} ads/s {size / elapsed / 2**20:6.1f} MB/s {size / 2**20:7.1f} MB  peak {peak / 2**20:6.1f} MB")
+
+
+start = time.perf_counter()
+for _ in iterAds():
+    pass
+generationTime = time.perf_counter() - start
+
+with tempfile.TemporaryDirectory() as folder:
+    measure("print (indent=4)", printed, f"{folder}/ads.txt")
+    orjson = output_writers.orjson
+    output_writers.orjson = None
+    measure("NDJSON (json)", lambda path: streamed(path, "ndjson"), f"{folder}/ads-json.ndjson")
+    output_writers.orjson = orjson
+    if orjson is not None:
+        measure("NDJSON (orjson)", lambda path: streamed(path, "ndjson"), f"{folder}/ads.ndjson")
+    measure("CSV", lambda path: streamed(path, "csv"), f"{folder}/ads.csv")
+    if output_writers.pyarrow is not None:
+        measure("Parquet", lambda path: streamed(path, "parquet"), f"{folder}/ads.parquet")
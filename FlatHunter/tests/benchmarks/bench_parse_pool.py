@@ -0,0 +1,28 @@
+"""
+Measure parsing throughput (pages/s) of ParsePool for different pool sizes, using local search page.
+Usage : python -m FlatHunter.tests.benchmarks.bench_parse_pool [numberOfPages]
+"""
+
+import os
+import sys
+import time
+from FlatHunter.modules.ImmoCH import extractSearchPage
+from FlatHunter.utils.misc_utils import getPath
+from FlatHunter.utils.parse_pool import ParsePool
+
+PROJECT_PATH = getPath("project")
+
+with open(f"{PROJECT_PATH}/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html", "rb") as fp:
+    PAGE_CONTENT = fp.read()
+
+numberOfPages = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+urls = [f"page-{pageNb}" for pageNb in range(numberOfPages)]
+
+poolSize = 1
+while poolSize <= os.cpu_count():
+    with ParsePool(parseWorkers=poolSize, fetchWorkers=poolSize * 2) as pool:
+        start = time.perf_counter()
+        pool.fetchAndParse(lambda url: PAGE_CONTENT, urls, extractSearchPage, itemCategory="flat")
+        elapsed = time.perf_counter() - start
+    print(f"{poolSize} process(es) : {numberOfPages / elapsed:.1f} pages/s")
+    poolSize *= 2
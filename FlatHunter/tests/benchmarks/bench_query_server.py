@@ -0,0 +1,108 @@
+"""
+Load test of query API : concurrent clients (keep-alive connections) sending filter queries to a local server over a
+result store, with and without result cache. Popular queries come back more often (Zipf-like draw) and part of requests
+revalidate a page already downloaded (If-None-Match).
+Usage : python -m FlatHunter.tests.benchmarks.bench_query_server [numberOfAds] [clients] [requestsPerClient]
+"""
+
+import http.client
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from FlatHunter.utils.query_server import makeServer
+from FlatHunter.utils.result_store import ResultStore
+
+numberOfAds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+requestsPerClient = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+# Distinct queries, and share of requests revalidating a page the client already has
+QUERIES = 200
+REVALIDATIONS = 0.3
+rng = random.Random(0)
+
+queries = []
+for _ in range(QUERIES):
+    minRent = rng.randrange(500, 3000, 100)
+    queries.append(
+        f"/ads?minRent={minRent}&maxRent={minRent + rng.randrange(500, 3000, 100)}&minRooms={rng.choice([1, 2, 3])}"
+        f"&minSize={rng.randrange(30, 90, 10)}&page={rng.choice([1, 1, 1, 2, 3])}"
+    )
+weights = [1 / (rank + 1) for rank in range(QUERIES)]
+
+
+def fillStore(path):
+    store = ResultStore(path)
+    runID = store.startRun("crawl")
+    store.putRecords(
+        runID,
+        (
+            {
+                "data-id": dataID,
+                "link": f"https://www.immobilier.ch/fr/louer/appartement/geneve/{dataID}",
+                "images": {f"Image {position}": f"https://photos.immobilier.ch/{dataID}/{position}.jpg" for position in range(3)},
+                "rent": rng.randrange(800, 6000, 10),
+                "rooms": rng.choice([1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0]),
+                "size": rng.randrange(20, 200),
+                "latlng": [46.2 + rng.random() / 10, 6.1 + rng.random() / 10],
+                "address": "Genève",
+            }
+            for dataID in range(900000, 900000 + numberOfAds)
+        ),
+    )
+    store.finishRun(runID)
+    return store
+
+
+def client(port, seed, latencies, statuses):
+    clientRNG = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    etags = {}
+    for _ in range(requestsPerClient):
+        query = clientRNG.choices(queries, weights)[0]
+        headers = {"If-None-Match": etags[query]} if query in etags and clientRNG.random() < REVALIDATIONS else {}
+        start = time.perf_counter()
+        connection.request("GET", query, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses.append(response.status)
+        etags[query] = response.getheader("ETag")
+    connection.close()
+
+
+def loadTest(store, cacheSize):
+    server = makeServer(store, port=0, cacheSize=cacheSize)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies, statuses = [], []
+    threads = [
+        threading.Thread(target=client, args=(server.server_address[1], seed, latencies, statuses)) for seed in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = server.api.cache.stats
+    server.shutdown()
+    server.server_close()
+    latencies.sort()
+    percentiles = statistics.quantiles(latencies, n=100)
+    hitRate = stats["hits"] / max(stats["hits"] + stats["misses"], 1)
+    print(
+        f"Cache {cacheSize:>5} : {len(latencies) / elapsed:7.0f} req/s, p50 {percentiles[49] * 1000:6.2f} ms, "
+        f"p99 {percentiles[98] * 1000:6.2f} ms, 304 {statuses.count(304) / len(statuses):.0%}, cache hit rate {hitRate:.0%}"
+    )
+
+
+with tempfile.TemporaryDirectory() as folder:
+    start = time.perf_counter()
+    resultStore = fillStore(os.path.join(folder, "results.sqlite"))
+    print(f"{numberOfAds} ads stored in {time.perf_counter() - start:.1f}s, {clients} clients x {requestsPerClient} requests")
+    loadTest(resultStore, 0)
+    loadTest(resultStore, 1024)
+    resultStore.close()
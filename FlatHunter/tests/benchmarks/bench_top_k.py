@@ -0,0 +1,71 @@
+"""
+Compare streaming top-K ranking (bounded heap) with sorting all matches, and measure early termination on a search
+sorted by ascending rent (rentPerM2 score, bound is rent / maxSize).
+Usage : python -m FlatHunter.tests.benchmarks.bench_top_k [numberOfAds] [k]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from FlatHunter.utils.crawl_budget import DETAIL_PRIORITIES
+from FlatHunter.utils.ranking import TopK
+
+numberOfAds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+k = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+# Cards per search page
+PAGE_SIZE = 40
+MAX_SIZE = 350
+rng = random.Random(0)
+
+
+def iterAds(seed=0):
+    rng.seed(seed)
+    for dataID in range(numberOfAds):
+        size = rng.randrange(20, 200)
+        yield {"data-id": dataID, "rent": int(size * rng.lognormvariate(3.3, 0.3)), "size": size, "rooms": rng.choice([2.0, 3.0, 4.0])}
+
+
+def sortAll():
+    return sorted(iterAds(), key=DETAIL_PRIORITIES["rentPerM2"])[:k]
+
+
+def streamTopK():
+    ranking = TopK(k, "rentPerM2")
+    for ad in iterAds():
+        ranking.push(ad)
+    return ranking.items()
+
+
+def measure(name, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12} {elapsed:6.2f}s  peak {peak / 2**20:8.2f} MB")
+    return result
+
+
+start = time.perf_counter()
+for _ in iterAds():
+    pass
+print(f"{numberOfAds} ads, top {k} by rent per m2 (generating ads alone : {time.perf_counter() - start:.2f}s)")
+expected = measure("Sort all", sortAll)
+ranked = measure("TopK", streamTopK)
+assert [ad["data-id"] for ad in ranked] == [ad["data-id"] for ad in expected]
+
+# Early termination : search pages sorted by ascending rent, a later card can't score below rent / MAX_SIZE
+ads = sorted(iterAds(), key=lambda ad: ad["rent"])
+ranking = TopK(k, "rentPerM2")
+cardsSeen = 0
+for ad in ads:
+    cardsSeen += 1
+    ranking.push(ad)
+    if ranking.full and not ranking.canChange(ad["rent"] / MAX_SIZE):
+        break
+assert [ad["data-id"] for ad in ranking.items()] == [ad["data-id"] for ad in expected]
+pages = -(-len(ads) // PAGE_SIZE)
+print(f"Early stop : {-(-cardsSeen // PAGE_SIZE)} of {pages} search pages fetched, then {k} item's pages (instead of one per match : {len(ads)})")
@@ -0,0 +1,37 @@
+"""
+Fake site and page fixtures shared by tests : ImmoCH serving local copies of a search page and of an item's page.
+"""
+
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.utils.misc_utils import getPath
+
+ROOT_PATH = getPath("root")
+
+SEARCH_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html"
+AD_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/ad_page.html"
+with open(SEARCH_PAGE_PATH, "rb") as fp:
+    SEARCH_PAGE_CONTENT = fp.read()
+with open(AD_PAGE_PATH, "rb") as fp:
+    AD_PAGE_CONTENT = fp.read()
+
+
+class LocalResponse:
+    def __init__(self, content, statusCode=200, headers=None):
+        self.content = content
+        self.status_code = statusCode
+        self.headers = headers or {}
+
+
+class LocalImmoCH(ImmoCH):
+    """
+    ImmoCH serving local pages instead of making requests : `searchPage` for search URLs, `adPage` for every other URL
+    (both can be changed, e.g. between polls). Requests still wait for rate limiter's budget and are counted, every
+    layer above `fetchPage()` (response cache, request coalescing...) is the real one. Used for testing purposes.
+    """
+    searchPage = SEARCH_PAGE_CONTENT
+    adPage = AD_PAGE_CONTENT
+
+    def fetchPage(self, _url, headers=None):
+        self._waitForBudget(_url)
+        self.stats["requests"] += 1
+        return LocalResponse(self.searchPage if "/carte/" in _url else self.adPage)
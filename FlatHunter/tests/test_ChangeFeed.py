@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.change_feed import (
+    ADDED,
+    IMAGES_CHANGED,
+    REMOVED,
+    RENT_CHANGED,
+    SortedSnapshotWriter,
+    changeFeed,
+    readSnapshot,
+    snapshotChanges,
+    writeSnapshot,
+)
+
+
+class TestChangeFeed(unittest.TestCase):
+    """
+    Test sorted snapshots and merge-join change feed.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_sortedSnapshot(self):
+        path = os.path.join(self.folder.name, "run1.ndjson")
+        writer = SortedSnapshotWriter(path, runSize=4)
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1, sinks=[writer])
+        writer.close()
+        self.assertGreater(len(writer.runs), 1) # Sorted in several spilled runs
+        self.assertEqual(list(readSnapshot(path)), sorted(items, key=lambda ad: ad["data-id"]))
+        self.assertEqual(os.listdir(self.folder.name), ["run1.ndjson"]) # Spilled runs are removed
+
+    def test_failedCrawl(self):
+        path = os.path.join(self.folder.name, "run1.ndjson")
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        writeSnapshot(path, items)
+        with self.assertRaises(RuntimeError):
+            with SortedSnapshotWriter(path, runSize=4) as writer:
+                writer.writeMany(items[:5])
+                raise RuntimeError("Crawl failed")
+        # Previous snapshot is kept and spilled runs are removed
+        self.assertEqual(len(list(readSnapshot(path))), len(items))
+        self.assertEqual(os.listdir(self.folder.name), ["run1.ndjson"])
+
+    def test_changeFeed(self):
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        previousPath = os.path.join(self.folder.name, "previous.ndjson")
+        currentPath = os.path.join(self.folder.name, "current.ndjson")
+        writeSnapshot(previousPath, items)
+        current = [dict(ad) for ad in items[1:]] + [{**items[0], "data-id": 1}]
+        current[0]["rent"] += 100
+        current[1]["images"] = {}
+        current[2]["rent"] += 50
+        current[2]["images"] = {}
+        random.Random(0).shuffle(current)
+        writeSnapshot(currentPath, current)
+        events = [(change["event"], change["data-id"]) for change in snapshotChanges(previousPath, currentPath)]
+        expected = [(ADDED, 1), (REMOVED, items[0]["data-id"]), (RENT_CHANGED, items[1]["data-id"])]
+        expected += [(IMAGES_CHANGED, items[2]["data-id"]), (RENT_CHANGED, items[3]["data-id"]), (IMAGES_CHANGED, items[3]["data-id"])]
+        self.assertEqual(sorted(events, key=lambda event: (event[1], event[0])), sorted(expected, key=lambda event: (event[1], event[0])))
+        change = next(change for change in snapshotChanges(previousPath, currentPath) if change["event"] == RENT_CHANGED)
+        self.assertEqual(change["after"] - change["before"], 100)
+
+    def test_streaming(self):
+        consumed = []
+
+        def ads(dataIDs):
+            for dataID in dataIDs:
+                consumed.append(dataID)
+                yield {"data-id": dataID, "rent": 1000, "images": {}}
+
+        feed = changeFeed(ads(range(0, 10**6, 2)), ads(range(1, 10**6, 2)))
+        self.assertEqual(next(feed)["event"], REMOVED)
+        self.assertLess(len(consumed), 5) # Crawls are read as events are consumed
+        with self.assertRaises(ValueError):
+            list(changeFeed([{"data-id": 2}, {"data-id": 1}], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
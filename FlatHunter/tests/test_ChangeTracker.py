@@ -0,0 +1,106 @@
+import pickle
+import tempfile
+import unittest
+from FlatHunter.tests.local_site import AD_PAGE_CONTENT, LocalImmoCH, LocalResponse, ROOT_PATH
+from FlatHunter.utils.change_tracker import ChangeTracker
+
+with open(f"{ROOT_PATH}/docs/pagesHTML/page.html", "rb") as fp:
+    AD_PAGES = [AD_PAGE_CONTENT, fp.read()]
+
+
+class ConditionalImmoCH(LocalImmoCH):
+    """
+    LocalImmoCH serving `self.page` as item's page (honouring If-None-Match with `self.etag`). Used for testing purposes.
+    """
+    page = AD_PAGES[0]
+    etag = None
+
+    def fetchPage(self, _url, headers=None):
+        if "/carte/" in _url:
+            return super().fetchPage(_url, headers)
+        self.lastHeaders = headers or {}
+        if self.etag is not None and self.lastHeaders.get("If-None-Match") == self.etag:
+            return LocalResponse(b"", 304, {"ETag": self.etag})
+        return LocalResponse(self.page, 200, {"ETag": self.etag} if self.etag else {})
+
+
+class TestChangeTracker(unittest.TestCase):
+    """
+    Test change detection of item's pages.
+    """
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.tracker = ChangeTracker(f"{self.tempDir.name}/pages.db")
+        self.test_object = ConditionalImmoCH("flat", changeTracker=self.tracker)
+
+    def tearDown(self):
+        self.tracker.close()
+        self.tempDir.cleanup()
+
+    def getImages(self):
+        itemDict = {"data-id": 898645, "link": "https://www.immobilier.ch/fr/louer/appartement/898645"}
+        self.test_object.getItemPage(itemDict)
+        return self.test_object.extractionPlan.run(itemDict, sources=self.test_object.pageSources)["images"]
+
+    def test_unchangedContent(self):
+        firstImages = self.getImages()
+        self.assertEqual(self.test_object.stats["parses"], 1)
+        self.assertEqual(self.getImages(), firstImages) # Is previous record reused ?
+        self.assertEqual(self.test_object.stats["parsesAvoided"], 1)
+        self.assertEqual(self.test_object.stats["unchangedContent"], 1)
+
+    def test_notModified(self):
+        self.test_object.etag = '"v1"'
+        firstImages = self.getImages()
+        self.assertEqual(self.getImages(), firstImages)
+        self.assertEqual(self.test_object.lastHeaders, {"If-None-Match": '"v1"'}) # Was request conditional ?
+        self.assertEqual(self.test_object.stats["notModified"], 1)
+
+    def test_changedContent(self):
+        firstImages = self.getImages()
+        self.test_object.page = AD_PAGES[1]
+        self.assertNotEqual(self.getImages(), firstImages)
+        self.assertEqual(self.test_object.stats["parses"], 2)
+        self.assertEqual(self.test_object.stats["parsesAvoided"], 0)
+
+    def test_extractorVersion(self):
+        self.getImages()
+        self.test_object.extractorVersion = "new"
+        self.getImages()
+        self.assertEqual(self.test_object.stats["parses"], 2) # Records of other extractor versions can't be reused
+
+    def test_pickle(self):
+        self.getImages()
+        copy = pickle.loads(pickle.dumps(self.tracker))
+        self.addCleanup(copy.close)
+        self.assertIsNone(copy.connection) # Copy opens its own connection
+        self.assertEqual(copy.get(898645)["record"], self.tracker.get(898645)["record"])
+
+    def test_everyItemPageTracked(self):
+        filterParams = {"minRent": 400, "maxRent": 5000, "minSize": 45, "maxSize": 350, "minRooms": 2.0, "maxRooms": 8.0}
+        pooledSite = ConditionalImmoCH("flat", parseWorkers=2, changeTracker=self.tracker)
+
+        def lazyCrawl(site):
+            ads = site.getItems(filterParams, 1, lazyDetails=True)
+            site.prefetchDetails(ads)
+            return ads
+
+        crawls = {
+            "iterItems": (self.test_object, lambda site: list(site.iterItems(filterParams, pagesToSearch=1))),
+            "lazyDetails": (self.test_object, lazyCrawl),
+            "budgeted": (self.test_object, lambda site: site.getItems(filterParams, 1, maxRequests=100)),
+            "topItems": (self.test_object, lambda site: site.getTopItems(filterParams, k=3, pagesToSearch=1)),
+            "pooled": (pooledSite, lambda site: site.getItems(filterParams, 1)),
+        }
+        list(self.test_object.iterItems(filterParams, pagesToSearch=1)) # Every matching item's page is seen once
+        for name, (site, crawl) in crawls.items():
+            with self.subTest(crawl=name):
+                site.stats.clear()
+                ads = crawl(site)
+                self.assertTrue(ads)
+                self.assertNotEqual(ads[0]["images"], {})
+                self.assertEqual(site.stats["parses"], 0) # Were item's pages fetched conditionally ?
+                self.assertEqual(site.stats["parsesAvoided"], len(ads))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.crawl_budget import DETAIL_PRIORITIES, CrawlBudget
+
+
+class TestCrawlBudget(unittest.TestCase):
+    """
+    Test budgeted getItems.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+
+    def test_completeCrawl(self):
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1, maxRequests=1000, deadline=60)
+        self.assertFalse(items.partial)
+        self.assertIsNone(items.reason)
+        self.assertEqual(items, self.expected)
+
+    def test_maxRequests(self):
+        test_object = LocalImmoCH("flat")
+        items = test_object.getItems(self.filterParams, pagesToSearch=1, maxRequests=5)
+        self.assertTrue(items.partial)
+        self.assertEqual(items.reason, "maxRequests")
+        self.assertEqual(test_object.stats["requests"], 5) # One search page and 4 item's pages
+        self.assertEqual(len(items), len(self.expected)) # Every matching card is still returned
+        self.assertEqual(len(items.missingDetails), len(self.expected) - 4)
+        # Item's pages of cheapest ads per m2 were fetched first
+        detailed = [ad for ad in items if ad["data-id"] not in items.missingDetails]
+        rentPerM2 = DETAIL_PRIORITIES["rentPerM2"]
+        self.assertLessEqual(max(map(rentPerM2, detailed)), min(rentPerM2(ad) for ad in items if ad not in detailed))
+        self.assertTrue(all(ad["images"] for ad in detailed))
+
+    def test_deadline(self):
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1, deadline=0)
+        self.assertTrue(items.partial)
+        self.assertEqual(items.reason, "deadline")
+        self.assertEqual(items, [])
+
+    def test_budget(self):
+        budget = CrawlBudget(maxRequests=2)
+        self.assertFalse(budget.exhausted(1))
+        self.assertTrue(budget.exhausted(2))
+        self.assertIsNone(budget.remaining())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from bs4 import BeautifulSoup
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.utils.embedded_data import scanAttribute, scanImages, scanJsonLD
+from FlatHunter.utils.misc_utils import getPath
+
+ROOT_PATH = getPath("root")
+
+# Local item pages (with images slider) and search page (without)
+AD_PAGES_PATHS = [
+    f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/ad_page.html",
+    f"{ROOT_PATH}/docs/pagesHTML/page.html",
+]
+SEARCH_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html"
+
+
+def readPage(path):
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+class TestEmbeddedData(unittest.TestCase):
+    """
+    Test byte-level scan of embedded payloads and its parity with soup extraction.
+    """
+    def setUp(self):
+        self.test_object = ImmoCH("flat", fastPath=True)
+
+    def test_imagesParity(self):
+        """
+        Images decoded with fast path should be the same as the ones extracted from soup.
+        """
+        for path in AD_PAGES_PATHS:
+            content = readPage(path)
+            soupAd = {"data-id": 1, "ad-page-soup": BeautifulSoup(content, "html.parser").find(id="main")}
+            fastAd = {"data-id": 1, "ad-page-data": self.test_object.getDetailData(content)}
+            soupImages = self.test_object.extractionPlan.run(soupAd)["images"]
+            fastImages = self.test_object.extractionPlan.run(fastAd)["images"]
+            self.assertGreater(len(soupImages), 0)
+            self.assertEqual(soupImages, fastImages)
+
+    def test_getDetailData(self):
+        pageData = self.test_object.getDetailData(readPage(AD_PAGES_PATHS[0]))
+        self.assertEqual(pageData["price"], 3400.0) # Is ld+json Product price decoded ?
+        self.assertEqual(pageData["address"]["addressLocality"], "Genève") # Are HTML entities unescaped ?
+        self.assertIsNone(pageData["latlng"])
+
+    def test_fallback(self):
+        """
+        Page without images slider should return None so that caller falls back to soup.
+        """
+        self.assertIsNone(self.test_object.getDetailData(readPage(SEARCH_PAGE_PATH)))
+
+    def test_scanners(self):
+        content = readPage(SEARCH_PAGE_PATH)
+        self.assertEqual(scanAttribute(content, "data-latlng"), "46.2007351,6.1489362")
+        self.assertIsNone(scanAttribute(content, "data-missing"))
+        self.assertIsNone(scanImages(content, "im__banner__slider", "alt", "data-lazy"))
+        self.assertIsInstance(scanJsonLD(content), list)
+        self.assertEqual(scanJsonLD(b'<script type="application/ld+json">{broken</script>'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from bs4 import BeautifulSoup
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.utils.extraction import ExtractionPlan
+from FlatHunter.utils.misc_utils import getPath
+
+ROOT_PATH = getPath("root")
+
+# Get local pages soup for testing purposes
+SEARCH_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html"
+AD_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/ad_page.html"
+with open(SEARCH_PAGE_PATH) as fp:
+    SEARCH_PAGE_SOUP = BeautifulSoup(fp, "html.parser")
+with open(AD_PAGE_PATH) as fp:
+    AD_PAGE_SOUP = BeautifulSoup(fp, "html.parser")
+
+
+class TestExtractionPlan(unittest.TestCase):
+    """
+    Test ExtractionPlan with ImmoCH fields spec and local pages.
+    """
+    def setUp(self):
+        self.plan = ImmoCH("flat").extractionPlan
+        # Build first ad dict the same way getAds() does
+        item = SEARCH_PAGE_SOUP.find(class_="filter-item")
+        container = item.find(class_="filter-item-container")
+        self.ad = {
+            "data-id": int(item["data-id"]),
+            "ad-content-soup": container.find(class_="filter-item-content"),
+            "ad-character-soup": container.find(class_="filter-item-characteristic"),
+            "ad-page-soup": AD_PAGE_SOUP.find(id="main"),
+        }
+
+    def test_run(self):
+        fields = self.plan.run(self.ad)
+        self.assertEqual(fields["rent"], 2500) # Is apostrophe stripped from rent ?
+        self.assertEqual(fields["rooms"], 3.0)
+        self.assertEqual(fields["size"], 47)
+        self.assertIsInstance(fields["images"], dict) # Is images a dict ?
+        self.assertEqual(len(fields["images"]), 3) # Are all slider images collected ?
+
+    def test_defaults(self):
+        """
+        Missing soups and unmatched regexes should fall back to defaults.
+        """
+        fields = self.plan.run({"data-id": 1, "ad-content-soup": None, "ad-character-soup": None})
+        self.assertEqual(fields, {"rent": 0, "rooms": 0, "size": 0, "address": "", "latlng": None, "images": {}})
+        # Default images dict must not be shared between ads
+        fields["images"]["test"] = "test"
+        self.assertEqual(self.plan.defaults()["images"], {})
+
+    def test_prefilled(self):
+        """
+        Already decoded values (`ad-page-data`) should be used instead of walking `ad-page-soup`.
+        """
+        self.ad["ad-page-data"] = {"images": {"alt": "url"}}
+        self.assertEqual(self.plan.run(self.ad)["images"], {"alt": "url"})
+
+    def test_rootAttribute(self):
+        """
+        Spec without selector should read source tag itself.
+        """
+        plan = ExtractionPlan({"id": {"source": "card-soup", "selector": None, "attr": "data-id", "type": int, "default": None}})
+        card = SEARCH_PAGE_SOUP.find(class_="filter-item")
+        self.assertEqual(plan.run({"card-soup": card})["id"], 899264)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import random
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.filter_index import FilterIndex, IntervalTree
+
+
+def randomFilter(rng):
+    minRent = rng.randrange(0, 5000, 100)
+    minRooms = rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 4.0])
+    minSize = rng.randrange(0, 150, 5)
+    return {
+        "minRent": minRent,
+        "maxRent": minRent + rng.randrange(100, 4000, 100),
+        "minRooms": minRooms,
+        "maxRooms": minRooms + rng.choice([0.5, 1.0, 2.0, 4.0]),
+        "minSize": minSize,
+        "maxSize": minSize + rng.randrange(10, 200, 5),
+    }
+
+
+def isMatch(ad, filter):
+    return (
+        filter["minRent"] <= ad["rent"] <= filter["maxRent"]
+        and filter["minRooms"] <= ad["rooms"] <= filter["maxRooms"]
+        and filter["minSize"] <= ad["size"] <= filter["maxSize"]
+    )
+
+
+class TestFilterIndex(unittest.TestCase):
+    """
+    Test many-subscriber filter matching.
+    """
+    def setUp(self):
+        rng = random.Random(7)
+        self.filters = {f"user-{i}": randomFilter(rng) for i in range(500)}
+        self.ads = [
+            {"rent": rng.randrange(300, 8000), "rooms": rng.choice([1.0, 2.0, 2.5, 3.5, 5.0]), "size": rng.randrange(15, 300)}
+            for _ in range(300)
+        ]
+        self.index = FilterIndex()
+        for subscriberID, filter in self.filters.items():
+            self.index.add(subscriberID, filter)
+
+    def test_intervalTree(self):
+        intervals = [(1, 5, "a"), (3, 3, "b"), (4, 10, "c"), (float("-inf"), 2, "d")]
+        tree = IntervalTree(intervals)
+        for x in range(-2, 12):
+            expected = sorted(key for low, high, key in intervals if low <= x <= high)
+            self.assertEqual(sorted(tree.stab(x)), expected)
+            self.assertEqual(tree.count(x), len(expected))
+
+    def test_match(self):
+        for ad in self.ads:
+            expected = sorted(subscriberID for subscriberID, filter in self.filters.items() if isMatch(ad, filter))
+            self.assertEqual(sorted(self.index.match(ad)), expected) # Same matches as checking every filter
+
+    def test_updates(self):
+        ad = self.ads[0]
+        self.index.add("everything", {})  # No bound : matches all ads
+        self.assertIn("everything", self.index.match(ad))
+        self.index.remove("everything")
+        self.assertNotIn("everything", self.index.match(ad))
+        results = self.index.matchAll(self.ads)
+        self.assertEqual(len(results), len(self.filters))
+
+    def test_getSubscriberItems(self):
+        filterParams = {"minRent": 400, "maxRent": 5000, "minSize": 45, "maxSize": 350, "minRooms": 2.0, "maxRooms": 8.0}
+        cheapParams = {**filterParams, "maxRent": 2500}
+        index = FilterIndex()
+        index.add("alice", filterParams)
+        index.add("bob", cheapParams)
+        index.add("nobody", {"minRent": 10**6})
+        results = LocalImmoCH("flat").getSubscriberItems(index, pagesToSearch=1)
+        self.assertEqual(results["alice"], LocalImmoCH("flat").getItems(filterParams, pagesToSearch=1))
+        self.assertEqual(results["bob"], LocalImmoCH("flat").getItems(cheapParams, pagesToSearch=1))
+        self.assertEqual(results["nobody"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
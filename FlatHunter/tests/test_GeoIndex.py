@@ -0,0 +1,95 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from FlatHunter.tests.local_site import LocalImmoCH, SEARCH_PAGE_CONTENT
+from FlatHunter.utils.filter_index import FilterIndex
+from FlatHunter.utils.geo_index import GeoIndex, haversine, inPolygon, loadGeoIndex, matchesArea
+from FlatHunter.utils.result_store import ResultStore
+
+CORNAVIN = [46.2100, 6.1423]
+
+
+class TestGeoIndex(unittest.TestCase):
+    """
+    Test coordinates extraction and spatial queries.
+    """
+    def setUp(self):
+        rng = random.Random(3)
+        self.points = {dataID: (rng.uniform(46.1, 46.3), rng.uniform(6.0, 6.3)) for dataID in range(2000)}
+        self.index = GeoIndex()
+        for dataID, (lat, lng) in self.points.items():
+            self.index.add(dataID, lat, lng)
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+
+    def test_cardCoordinates(self):
+        test_object = LocalImmoCH("flat")
+        records = test_object.getCardRecords(test_object.parsePage(SEARCH_PAGE_CONTENT))
+        self.assertEqual(records[0]["latlng"], [46.2007351, 6.1489362])
+        self.assertTrue(all(record["latlng"] for record in records))
+
+    def test_queries(self):
+        expected = [dataID for dataID, point in self.points.items() if haversine(*CORNAVIN, *point) <= 2]
+        found = self.index.radius(*CORNAVIN, 2)
+        self.assertEqual(sorted(found), sorted(expected))
+        distances = [haversine(*CORNAVIN, *self.points[dataID]) for dataID in found]
+        self.assertEqual(distances, sorted(distances)) # Closest first
+        box = [46.15, 6.1, 46.2, 6.2]
+        expected = [dataID for dataID, (lat, lng) in self.points.items() if 46.15 <= lat <= 46.2 and 6.1 <= lng <= 6.2]
+        self.assertEqual(sorted(self.index.bbox(*box)), sorted(expected))
+        triangle = [[46.1, 6.0], [46.3, 6.15], [46.1, 6.3]]
+        expected = [dataID for dataID, point in self.points.items() if inPolygon(*point, triangle)]
+        self.assertEqual(sorted(self.index.polygon(triangle)), sorted(expected))
+        self.assertGreater(len(expected), 0)
+
+    def test_updates(self):
+        self.index.add(0, *CORNAVIN)
+        self.assertEqual(self.index.radius(*CORNAVIN, 0.001), [0]) # Moved
+        self.index.remove(0)
+        self.assertNotIn(0, self.index)
+        self.assertEqual(len(self.index), len(self.points) - 1)
+
+    def test_areaFilters(self):
+        area = {"radius": {"center": CORNAVIN, "km": 1.5}}
+        everything = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        items = LocalImmoCH("flat").getItems({**self.filterParams, **area}, pagesToSearch=1)
+        expected = [ad for ad in everything if haversine(*CORNAVIN, *ad["latlng"]) <= 1.5]
+        self.assertEqual(items, expected)
+        self.assertTrue(0 < len(items) < len(everything))
+        self.assertFalse(matchesArea(None, area)) # No coordinates : no geographic match
+        # Same geographic keys in filter index
+        index = FilterIndex()
+        index.add("near", {**self.filterParams, **area})
+        index.add("anywhere", self.filterParams)
+        results = index.matchAll(everything)
+        self.assertEqual(results["near"], expected)
+        self.assertEqual(results["anywhere"], everything)
+
+    def test_resultStore(self):
+        with tempfile.TemporaryDirectory() as folder:
+            store = ResultStore(Path(folder) / "results.sqlite", geoIndex=GeoIndex())
+            runID = store.startRun("crawl")
+            store.putRecords(runID, ({"data-id": dataID, "latlng": list(point)} for dataID, point in self.points.items()))
+            self.assertEqual(len(store.geoIndex), len(self.points)) # Index follows records put in store
+            store.finishRun(runID)
+            self.assertEqual(sorted(loadGeoIndex(store).radius(*CORNAVIN, 2)), sorted(store.geoIndex.radius(*CORNAVIN, 2)))
+            # Next run no longer finds half of ads
+            runID = store.startRun("crawl")
+            store.putRecords(runID, ({"data-id": dataID, "latlng": list(point)} for dataID, point in self.points.items() if dataID % 2))
+            self.assertEqual(len(store.geoIndex), len(self.points)) # Until run is finished
+            store.finishRun(runID)
+            self.assertEqual(len(store.geoIndex), len(self.points) // 2)
+            self.assertTrue(all(dataID % 2 for dataID in store.geoIndex.radius(*CORNAVIN, 2)))
+            self.assertEqual(sorted(loadGeoIndex(store).radius(*CORNAVIN, 2)), sorted(store.geoIndex.radius(*CORNAVIN, 2)))
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
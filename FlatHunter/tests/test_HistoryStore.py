@@ -0,0 +1,127 @@
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.history_store import HistoryStore
+
+
+class TestHistoryStore(unittest.TestCase):
+    """
+    Test append-only history of listings.
+    """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = os.path.join(self.folder.name, "history.bin")
+        self.crawls = [
+            (1000.0, [{"data-id": 898645, "rent": 2500}, {"data-id": 899264, "rent": 1800}]),
+            (2000.0, [{"data-id": 898645, "rent": 2400}, {"data-id": 899264, "rent": 1800}, {"data-id": 1, "rent": 900}]),
+            (3000.0, [{"data-id": 898645, "rent": 2400}, {"data-id": 1, "rent": 900}]),
+            (4000.0, [{"data-id": 898645, "rent": 2400}, {"data-id": 899264, "rent": 1850}, {"data-id": 1, "rent": 900}]),
+        ]
+
+    def fill(self, path=None):
+        store = HistoryStore(path or self.path)
+        counts = [store.update(ads, crawledAt) for crawledAt, ads in self.crawls]
+        return store, counts
+
+    def test_update(self):
+        store, counts = self.fill()
+        self.addCleanup(store.close)
+        self.assertEqual(counts[1], {"added": 1, "rentChanged": 1, "disappeared": 0, "reappeared": 0})
+        self.assertEqual(counts[2], {"added": 0, "rentChanged": 0, "disappeared": 1, "reappeared": 0})
+        self.assertEqual(counts[3], {"added": 0, "rentChanged": 0, "disappeared": 0, "reappeared": 1})
+        self.assertEqual(
+            store.history(899264),
+            [
+                {"crawledAt": 1000.0, "rent": 1800, "seen": True},
+                {"crawledAt": 3000.0, "rent": 1800, "seen": False},
+                {"crawledAt": 4000.0, "rent": 1850, "seen": True},
+            ],
+        )
+        self.assertEqual(store.history(5), [])
+        self.assertEqual(store.stateAt(898645, 2500.0), {"crawledAt": 2000.0, "rent": 2400, "seen": True})
+        self.assertIsNone(store.stateAt(1, 1500.0))
+        with self.assertRaises(ValueError):
+            store.update([], 500.0)
+
+    def test_scan(self):
+        store, _ = self.fill()
+        self.addCleanup(store.close)
+        self.assertEqual([dataID for dataID, _ in store.scan()], [1, 898645, 899264])
+        self.assertEqual([dataID for dataID, _ in store.scan(minID=2, maxID=898645)], [898645])
+        # Changes between second and third crawls only
+        changes = dict(store.scan(since=2000.0, until=3000.0))
+        self.assertEqual(sorted(changes), [1, 898645, 899264])
+        self.assertEqual(changes[899264], [{"crawledAt": 3000.0, "rent": 1800, "seen": False}])
+
+    def test_persistence(self):
+        store, _ = self.fill()
+        store.close()
+        # Unchanged listings cost nothing : 4 crawls, 7 changes
+        self.assertLess(os.path.getsize(self.path), 4 * 24 + 7 * 8)
+        with open(self.path, "ab") as f:
+            f.write(b"HST1 torn block")
+        reopened = HistoryStore(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 3)
+        self.assertEqual(reopened.history(899264), store.history(899264))
+        # Torn block was dropped, next crawl is appended after last valid block
+        reopened.update([{"data-id": 1, "rent": 950}], 5000.0, complete=False)
+        self.assertEqual(HistoryStore(self.path).history(1)[-1], {"crawledAt": 5000.0, "rent": 950, "seen": True})
+        self.assertTrue(HistoryStore(self.path).history(898645)[-1]["seen"]) # Partial crawl doesn't mark disappearances
+
+    def test_corruption(self):
+        store, _ = self.fill()
+        store.close()
+        with open(self.path, "rb") as f:
+            data = bytearray(f.read())
+        # Payload byte of first block flipped : later blocks are valid, so file isn't truncated
+        data[24] ^= 0xFF
+        with open(self.path, "wb") as f:
+            f.write(data)
+        with self.assertRaises(ValueError):
+            HistoryStore(self.path)
+        self.assertEqual(os.path.getsize(self.path), len(data))
+
+    def test_scope(self):
+        store = HistoryStore(self.path, scope="immoch/flat/geneve")
+        store.update(self.crawls[0][1], 1000.0)
+        store.close()
+        reopened = HistoryStore(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.scope, "immoch/flat/geneve") # Scope is read from file
+        self.assertEqual(len(reopened), 2)
+        with self.assertRaises(ValueError):
+            HistoryStore(self.path, scope="immoch/flat/vaud")
+
+    def test_searchCards(self):
+        # Whole search is recorded, not only ads matching filter
+        filterParams = {"minRent": 400, "maxRent": 2000, "minSize": 45, "maxSize": 350, "minRooms": 2.0, "maxRooms": 8.0}
+        cards = []
+        ads = list(LocalImmoCH("flat").iterItems(filterParams, pagesToSearch=1, cards=cards))
+        self.assertGreater(len(cards), len(ads))
+        self.assertNotIn("images", cards[0]) # Cards aren't completed with item's page fields
+        store = HistoryStore(self.path)
+        self.addCleanup(store.close)
+        self.assertEqual(store.update(cards)["added"], len(cards))
+
+    def test_importSnapshots(self):
+        filenames = []
+        for position, (crawledAt, ads) in enumerate(reversed(self.crawls)):
+            filename = os.path.join(self.folder.name, f"flat_{position}.search")
+            with open(filename, "wb") as f:
+                pickle.dump({"timeStamp": datetime.fromtimestamp(crawledAt), "object": ads}, f)
+            filenames.append(filename)
+        store = HistoryStore(self.path)
+        self.addCleanup(store.close)
+        self.assertEqual(store.importSnapshots(filenames), 4)
+        expected, _ = self.fill(os.path.join(self.folder.name, "other.bin"))
+        self.addCleanup(expected.close)
+        self.assertEqual(store.history(899264), expected.history(899264))
+
+
+if __name__ == "__main__":
+    unittest.main()
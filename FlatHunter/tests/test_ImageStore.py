@@ -0,0 +1,159 @@
+import io
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.image_store import Image, ImageStore, fetchImages
+
+IMAGE_URL = "https://www.immobilier.ch/Medias/grange-cie-sa-34/898645/images/Detail/23391020.jpg"
+
+FILTER = {"minRent": 0, "maxRent": 100000, "minSize": 0, "maxSize": 100000, "minRooms": 0, "maxRooms": 100}
+
+
+def putImage(store, content):
+    """
+    Store image from a worker process (module level, so picklable).
+    """
+    return store.put(content, f"https://photos.example/{content.decode()}.jpg")
+
+
+class ImagesImmoCH(LocalImmoCH):
+    """
+    LocalImmoCH serving fake image content too, recording image URLs fetched. Used for testing purposes.
+    """
+    def __init__(self, *args, images=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # URL -> content of images, unknown URLs fail
+        self.images = images if images is not None else {IMAGE_URL: b"fake jpeg content"}
+        self.assetsFetched = []
+        self.assetsLock = threading.Lock()
+
+    def fetchAsset(self, _url):
+        with self.assetsLock:
+            self.assetsFetched.append(_url)
+        return self.images.get(_url)
+
+
+class TestImageStore(unittest.TestCase):
+    """
+    Test content-addressed image store and image stage of crawls.
+    """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.store = ImageStore(self.folder.name)
+        self.addCleanup(self.store.close)
+
+    def test_put(self):
+        first = self.store.put(b"same photo", "https://photos.example/1.jpg")
+        # Same photo reused by another listing is stored once
+        second = self.store.put(b"same photo", "https://photos.example/2.jpg")
+        other = self.store.put(b"other photo")
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.store.get(first), b"same photo")
+        self.assertIsNone(self.store.get("0" * 32))
+        self.assertEqual(self.store.lookup("https://photos.example/2.jpg"), first)
+        self.assertIsNone(self.store.lookup("https://photos.example/3.jpg"))
+        self.assertEqual(self.store.stats["stored"], 2)
+        self.assertEqual(self.store.stats["deduplicated"], 1)
+        self.assertEqual(self.store.stats["bytesDeduplicated"], len(b"same photo"))
+        self.assertEqual(len([path for path in (self.store.folder / "objects").rglob("*") if path.is_file()]), 2)
+
+    def test_adImages(self):
+        hashes = [self.store.put(b"living room"), self.store.put(b"kitchen")]
+        self.store.setAdImages(898645, hashes)
+        self.store.setAdImages(1, hashes[1:])
+        self.assertEqual(self.store.hashesOf(898645), hashes)
+        self.assertEqual(self.store.adsWith(hashes[1]), [1, 898645])
+        self.store.setAdImages(898645, hashes[:1])
+        self.assertEqual(self.store.hashesOf(898645), hashes[:1])
+        self.assertEqual(self.store.hashesOf(5), [])
+
+    def test_persistence(self):
+        imageHash = self.store.put(b"photo", "https://photos.example/1.jpg")
+        self.store.setAdImages(898645, [imageHash])
+        self.store.close()
+        store = ImageStore(self.folder.name)
+        self.addCleanup(store.close)
+        self.assertEqual(store.lookup("https://photos.example/1.jpg"), imageHash)
+        self.assertEqual(store.hashesOf(898645), [imageHash])
+        store.put(b"photo")
+        self.assertEqual(store.stats["deduplicated"], 1)
+
+    def test_workerProcesses(self):
+        self.store.lookup("https://photos.example/0.jpg") # Parent's connection is open before workers start
+        contents = [f"photo {number}".encode() for number in range(8)]
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            hashes = list(pool.map(putImage, [self.store] * len(contents), contents))
+        self.assertEqual([self.store.lookup(f"https://photos.example/{content.decode()}.jpg") for content in contents], hashes)
+
+    def test_fetchImages(self):
+        site = ImagesImmoCH("flat", imageStore=self.store)
+        ads = [
+            {"data-id": 1, "images": {"Salon": "https://photos.example/1.jpg", "Cuisine": "https://photos.example/2.jpg"}},
+            # Re-post : same URL and same photo under a new URL
+            {"data-id": 2, "images": {"Salon": "https://photos.example/1.jpg", "Cuisine": "https://photos.example/3.jpg"}},
+            {"data-id": 3, "images": {"Salon": "https://photos.example/missing.jpg"}},
+        ]
+        site.images = {
+            "https://photos.example/1.jpg": b"living room",
+            "https://photos.example/2.jpg": b"kitchen",
+            "https://photos.example/3.jpg": b"kitchen",
+        }
+        counters = fetchImages(site, ads, self.store, workers=4)
+        # Each URL is downloaded once, even if shared by several ads
+        self.assertEqual(sorted(site.assetsFetched), sorted(set(site.assetsFetched)))
+        self.assertEqual(counters, {"urlHits": 0, "downloads": 3, "deduplicated": 1, "failures": 1})
+        self.assertEqual(ads[0]["imageHashes"][1], ads[1]["imageHashes"][1])
+        self.assertEqual(ads[2]["imageHashes"], [])
+        self.assertEqual(self.store.hashesOf(2), ads[1]["imageHashes"])
+        self.assertEqual(site.stats["imageDownloads"], 3)
+        # Known URLs aren't downloaded again
+        site.assetsFetched.clear()
+        counters = fetchImages(site, ads[:2], self.store)
+        self.assertEqual(site.assetsFetched, [])
+        self.assertEqual(counters["urlHits"], 3)
+        report = self.store.report()
+        self.assertEqual(report["urlHitRate"], 0.5)
+        self.assertEqual(report["deduplicationRate"], round(1 / 3, 3))
+
+    def test_getItems(self):
+        site = ImagesImmoCH("flat", imageStore=self.store)
+        ads = site.getItems(FILTER, pagesToSearch=1)
+        # All fixture ads show the same image : fetched once for the whole crawl
+        self.assertEqual(site.assetsFetched, [IMAGE_URL])
+        imageHash = self.store.contentHash(b"fake jpeg content")
+        self.assertTrue(all(ad["imageHashes"] == [imageHash] * len(ad["images"]) for ad in ads))
+        self.assertEqual(self.store.hashesOf(ads[0]["data-id"]), [imageHash] * 3)
+        self.assertEqual(self.store.adsWith(imageHash), sorted({ad["data-id"] for ad in ads if ad["images"]}))
+        # Next crawl finds image in store
+        site.getItems(FILTER, pagesToSearch=1)
+        self.assertEqual(site.assetsFetched, [IMAGE_URL])
+        self.assertEqual(site.stats["imageUrlHits"], 1)
+
+    def test_withoutStore(self):
+        site = ImagesImmoCH("flat")
+        ads = site.getItems(FILTER, pagesToSearch=1)
+        self.assertEqual(site.assetsFetched, [])
+        self.assertNotIn("imageHashes", ads[0])
+
+    @unittest.skipIf(Image is None, "'Pillow' isn't installed")
+    def test_thumbnails(self):
+        content = io.BytesIO()
+        Image.new("RGB", (800, 600)).save(content, "PNG")
+        store = ImageStore(f"{self.folder.name}/thumbnails", thumbnailSize=128)
+        self.addCleanup(store.close)
+        imageHash = store.put(content.getvalue())
+        with Image.open(store.thumbnailPath(imageHash)) as thumbnail:
+            self.assertEqual(thumbnail.size, (128, 96))
+
+    @unittest.skipIf(Image is not None, "'Pillow' is installed")
+    def test_thumbnailsWithoutPillow(self):
+        with self.assertRaises(ImportError):
+            ImageStore(f"{self.folder.name}/thumbnails", thumbnailSize=128)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import pickle
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.lazy_ad import LazyAd
+
+
+class TestLazyAd(unittest.TestCase):
+    """
+    Test lazy loading of item's page fields.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        self.test_object = LocalImmoCH("flat")
+        self.items = self.test_object.getItems(self.filterParams, pagesToSearch=1, lazyDetails=True)
+
+    def test_cardOnly(self):
+        self.assertEqual(self.test_object.stats["requests"], 1) # Only search page was fetched
+        self.assertEqual(len(self.items), len(self.expected))
+        ad = self.items[0]
+        self.assertEqual((ad["data-id"], ad["rent"], ad["rooms"], ad["size"]), (899264, 2500, 3.0, 47))
+        self.assertFalse(ad.loaded)
+        self.assertNotIn("images", json.loads(json.dumps(ad))) # Iterating doesn't load item's page
+
+    def test_loadOnAccess(self):
+        ad = self.items[0]
+        self.assertEqual(ad["images"], self.expected[0]["images"])
+        self.assertTrue(ad.loaded)
+        self.assertEqual(self.test_object.stats["requests"], 2)
+        ad["images"]
+        self.assertEqual(self.test_object.stats["requests"], 2) # Memoised
+        self.assertEqual(list(ad), list(self.expected[0])) # Same keys order as eager ads
+
+    def test_prefetchDetails(self):
+        self.assertEqual(self.test_object.prefetchDetails(self.items), len(self.items))
+        self.assertTrue(all(ad.loaded for ad in self.items))
+        self.assertEqual(self.items, self.expected)
+        self.assertEqual(self.test_object.prefetchDetails(self.items), 0)
+
+    def test_pickle(self):
+        ad = pickle.loads(pickle.dumps(self.items[1]))
+        self.assertNotIsInstance(ad, LazyAd)
+        self.assertEqual(ad, self.expected[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import bisect
+import os
+import random
+import tempfile
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.market_stats import KLLSketch, MarketStats
+from FlatHunter.utils.result_store import ResultStore
+
+
+class TestMarketStats(unittest.TestCase):
+    """
+    Test quantile sketches and market statistics.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_sketchAccuracy(self):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(7.5, 0.4) for _ in range(50000)]
+        first = KLLSketch()
+        second = KLLSketch(seed=2)
+        for value in values[:30000]:
+            first.update(value)
+        for value in values[30000:]:
+            second.update(value)
+        merged = KLLSketch.fromDict(first.toDict()).merge(second)
+        self.assertEqual(len(merged), len(values))
+        self.assertLess(merged.size, 1000) # Memory doesn't grow with stream
+        values.sort()
+        for q in (0.1, 0.5, 0.9, 0.99):
+            rank = bisect.bisect_right(values, merged.quantile(q)) / len(values)
+            self.assertAlmostEqual(rank, q, delta=0.02)
+        self.assertEqual(merged.quantiles([0, 1]), [values[0], values[-1]])
+
+    def test_exactWhenSmall(self):
+        sketch = KLLSketch()
+        for value in [5, 1, 4, 2, 3]:
+            sketch.update(value)
+        self.assertEqual(sketch.quantiles([0.2, 0.5, 0.9]), [1, 3, 5])
+        self.assertEqual(sketch.rank(2), 0.4)
+        self.assertIsNone(KLLSketch().quantile(0.5))
+
+    def test_sink(self):
+        stats = MarketStats("flat", "geneve")
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1, sinks=[stats])
+        self.assertEqual(len(stats), len(items))
+        rows = stats.summary(groupBy=("rooms",))
+        self.assertEqual([row["rooms"] for row in rows], sorted({item["rooms"] for item in items}))
+        for row in rows:
+            rents = sorted(item["rent"] for item in items if item["rooms"] == row["rooms"])
+            self.assertEqual(row["count"], len(rents))
+            self.assertEqual(row["meanRent"], sum(rents) / len(rents))
+            self.assertEqual(row["rent"][0.5], rents[(len(rents) + 1) // 2 - 1]) # Exact median (nearest rank) on few ads
+        self.assertEqual(stats.summary(region="vaud"), [])
+        with self.assertRaises(ValueError):
+            stats.summary(groupBy=("city",))
+
+    def test_persistence(self):
+        items = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        geneve = MarketStats("flat", "geneve")
+        vaud = MarketStats("flat", "vaud")
+        for item in items:
+            geneve.add(item)
+            vaud.add(item)
+        path = os.path.join(self.folder.name, "stats.json")
+        geneve.save(path)
+        self.assertEqual(MarketStats.load(path).summary(), geneve.summary())
+        store = ResultStore(os.path.join(self.folder.name, "results.sqlite"))
+        self.addCleanup(store.close)
+        firstRun = store.startRun("crawl")
+        secondRun = store.startRun("crawl")
+        store.putMarketStats(firstRun, geneve)
+        store.putMarketStats(secondRun, geneve)
+        store.putMarketStats(secondRun, vaud)
+        self.assertEqual(len(store.getMarketStats([firstRun])), len(items))
+        # Runs (and workers of a run) are merged
+        rows = store.getMarketStats().summary(groupBy=("region",))
+        self.assertEqual([(row["region"], row["count"]) for row in rows], [("geneve", 2 * len(items)), ("vaud", len(items))])
+        self.assertEqual(rows[0]["rent"], geneve.summary(groupBy=("region",))[0]["rent"])
+
+
+if __name__ == "__main__":
+    unittest.main()
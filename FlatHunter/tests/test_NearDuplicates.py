@@ -0,0 +1,80 @@
+import unittest
+from FlatHunter.modules import SITES, registerSite
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.multi_site import runSites
+from FlatHunter.utils.near_duplicates import NearDuplicateIndex, collapseDuplicates, normaliseAddress
+
+
+class TestNearDuplicates(unittest.TestCase):
+    """
+    Test near-duplicate detection and multi-site runner.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.ad = {"site": "a", "data-id": 1, "address": "Genève, 8, rue Guillaume- Farel", "rent": 2500, "size": 47, "rooms": 3.0}
+
+    def test_normaliseAddress(self):
+        self.assertEqual(normaliseAddress("Genève, 8, rue Guillaume- Farel"), "geneve 8 guillaume farel")
+        self.assertEqual(normaliseAddress(None), "")
+
+    def test_nearDuplicates(self):
+        index = NearDuplicateIndex()
+        index.add(("a", 1), self.ad)
+        # Same flat on another portal : address written differently, rent slightly different
+        relisted = {**self.ad, "site": "b", "data-id": 7, "address": "Rue Guillaume-Farel 8, Genève", "rent": 2520}
+        self.assertEqual(index.add(("b", 7), relisted), [("a", 1)])
+        other = {**self.ad, "site": "b", "data-id": 8, "address": "Genève, Avenue de Miremont", "rent": 3100, "size": 80}
+        self.assertEqual(index.add(("b", 8), other), [])
+        self.assertEqual(index.clusters(), [[("a", 1), ("b", 7)]])
+
+    def test_crossSiteOnly(self):
+        sameSite = {**self.ad, "data-id": 2}
+        self.assertEqual(len(collapseDuplicates([self.ad, sameSite])), 2) # Two ads of a site stay distinct
+        self.assertEqual(len(collapseDuplicates([self.ad, sameSite], crossSiteOnly=False)), 1)
+
+    def test_emptyAds(self):
+        # Ads without address, rent nor size (e.g. failed extraction) aren't duplicates of each other
+        empty = [{"site": "a", "data-id": 3, "address": ""}, {"site": "b", "data-id": 4, "rent": 0}]
+        index = NearDuplicateIndex()
+        self.assertEqual([index.add((ad["site"], ad["data-id"]), ad) for ad in empty], [[], []])
+        self.assertEqual(index.clusters(), [])
+        self.assertEqual(len(collapseDuplicates(empty)), 2)
+
+    def test_weakEvidence(self):
+        # Same rent, size and rooms without address nor images isn't evidence of a duplicate
+        numbersOnly = [{**self.ad, "site": site, "address": ""} for site in ("a", "b")]
+        self.assertEqual(len(collapseDuplicates(numbersOnly)), 2)
+        # Same building, other flat : numbers don't confirm match
+        otherFlat = {**self.ad, "site": "b", "data-id": 9, "rent": 3900, "size": 90, "rooms": 5.0}
+        self.assertEqual(len(collapseDuplicates([self.ad, otherFlat])), 2)
+        # Same images, no address
+        images = {"imageHashes": ["h1", "h2", "h3"], "address": ""}
+        self.assertEqual(len(collapseDuplicates([{**self.ad, **images}, {**self.ad, **images, "site": "b"}])), 1)
+
+    def test_runSites(self):
+        registerSite("local", LocalImmoCH)
+        registerSite("mirror", LocalImmoCH)
+        try:
+            result = runSites(self.filterParams, sites=["local", "mirror"], pagesToSearch=1)
+        finally:
+            del SITES["local"], SITES["mirror"]
+        expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        self.assertEqual([report["items"] for report in result["sites"]], [len(expected)] * 2)
+        # Every ad of mirror site is the same listing as one of first site
+        self.assertEqual(len(result["items"]), len(expected))
+        self.assertTrue(all(ad["site"] == "local" for ad in result["items"]))
+        self.assertEqual(
+            [ad["duplicates"] for ad in result["items"]],
+            [[{"site": "mirror", "data-id": ad["data-id"], "link": ad["link"]}] for ad in expected],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
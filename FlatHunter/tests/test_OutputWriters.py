@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.output_writers import AdWriter, CSVWriter, JSONWriter, NDJSONWriter, openWriter, pyarrow
+
+
+class RecordingSink:
+    """
+    Sink keeping written ads along with number of cards crawled when each one was written.
+    """
+    def __init__(self, site):
+        self.site = site
+        self.ads = []
+        self.cardsCrawled = []
+
+    def write(self, ad):
+        self.ads.append(ad)
+        self.cardsCrawled.append(len(self.site.seenIDs))
+
+
+class TestOutputWriters(unittest.TestCase):
+    """
+    Test streaming writers of ads and getItems sinks.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_sinks(self):
+        site = LocalImmoCH("flat")
+        sink = RecordingSink(site)
+        items = site.getItems(self.filterParams, pagesToSearch=1, sinks=[sink])
+        self.assertEqual(items, self.expected)
+        self.assertEqual(sink.ads, self.expected)
+        self.assertLess(sink.cardsCrawled[0], len(site.seenIDs)) # First ad was written while crawling
+        self.assertEqual(list(LocalImmoCH("flat").iterItems(self.filterParams, pagesToSearch=1)), self.expected)
+
+    def test_lazySinks(self):
+        site = LocalImmoCH("flat")
+        sink = RecordingSink(site)
+        site.getItems(self.filterParams, pagesToSearch=1, lazyDetails=True, sinks=[sink])
+        # Sinks get item's page fields too
+        self.assertTrue(all(ad.loaded for ad in sink.ads))
+        self.assertEqual([dict(ad) for ad in sink.ads], self.expected)
+
+    def test_ndjson(self):
+        path = os.path.join(self.folder.name, "ads.ndjson")
+        with openWriter(path, flushEvery=5) as writer:
+            self.assertIsInstance(writer, NDJSONWriter)
+            writer.writeMany(self.expected)
+        with open(path, encoding="utf-8") as fp:
+            lines = fp.read().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected)
+        self.assertNotIn("\n", lines[0].strip()) # One compact ad per line
+
+    def test_json(self):
+        path = os.path.join(self.folder.name, "ads.json")
+        with openWriter(path, flushEvery=5) as writer:
+            self.assertIsInstance(writer, JSONWriter)
+            writer.writeMany(self.expected)
+        with open(path, encoding="utf-8") as fp:
+            self.assertEqual(json.load(fp), self.expected) # A .json file is one JSON document
+        with openWriter(path) as writer:
+            pass
+        with open(path, encoding="utf-8") as fp:
+            self.assertEqual(json.load(fp), [])
+
+    def test_csv(self):
+        path = os.path.join(self.folder.name, "ads.csv")
+        with openWriter(path, fsync=True) as writer:
+            self.assertIsInstance(writer, CSVWriter)
+            writer.writeMany(self.expected)
+        with open(path, newline="", encoding="utf-8") as fp:
+            rows = list(csv.DictReader(fp))
+        self.assertEqual(len(rows), len(self.expected))
+        self.assertEqual(list(rows[0]), list(self.expected[0]))
+        self.assertEqual(int(rows[0]["rent"]), self.expected[0]["rent"])
+        self.assertEqual(json.loads(rows[0]["images"]), self.expected[0]["images"])
+        self.assertEqual(json.loads(rows[0]["latlng"]), list(self.expected[0]["latlng"]))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow isn't installed")
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        path = os.path.join(self.folder.name, "ads.parquet")
+        with openWriter(path, rowGroupSize=4) as writer:
+            writer.writeMany(self.expected)
+        parquetFile = pyarrow.parquet.ParquetFile(path)
+        self.assertEqual(parquetFile.metadata.num_row_groups, -(-len(self.expected) // 4))
+        self.assertEqual(parquetFile.read().column("data-id").to_pylist(), [ad["data-id"] for ad in self.expected])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow isn't installed")
+    def test_parquetSchema(self):
+        import pyarrow.parquet
+
+        # Columns empty in whole first row group (latlng) or unknown (score) keep their declared type
+        ads = [{**ad, "latlng": None} for ad in self.expected[:4]] + [{**ad, "rooms": 3} for ad in self.expected[4:]]
+        path = os.path.join(self.folder.name, "ads.parquet")
+        with openWriter(path, rowGroupSize=4, columns=[*ads[0], "score"]) as writer:
+            writer.writeMany(ads)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(str(table.schema.field("data-id").type), "int64")
+        self.assertEqual(str(table.schema.field("rooms").type), "double")
+        self.assertEqual(str(table.schema.field("latlng").type), "string")
+        self.assertEqual(str(table.schema.field("score").type), "string")
+        self.assertEqual(table.column("latlng").to_pylist()[4], json.dumps(list(self.expected[4]["latlng"]), separators=(",", ":")))
+
+    def test_abstractWriter(self):
+        with self.assertRaises(TypeError):
+            AdWriter(os.path.join(self.folder.name, "ads.bin"))
+
+    def test_unknownFormat(self):
+        with self.assertRaises(ValueError):
+            openWriter(os.path.join(self.folder.name, "ads.xml"), "xml")
+
+
+if __name__ == "__main__":
+    unittest.main()
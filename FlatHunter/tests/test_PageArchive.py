@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from FlatHunter.utils.misc_utils import getPath
+from FlatHunter.utils.page_archive import PageArchive
+
+ROOT_PATH = getPath("root")
+
+PAGES_PATHS = [
+    f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html",
+    f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/ad_page.html",
+    f"{ROOT_PATH}/docs/pagesHTML/page.html",
+]
+PAGES = []
+for path in PAGES_PATHS:
+    with open(path, "rb") as fp:
+        PAGES.append(fp.read())
+
+
+def archivePages(folder, writer):
+    """
+    Archive every page 10 times from a worker process (module level, so picklable).
+    """
+    archive = PageArchive(folder, segmentSize=50000)
+    for copy in range(10):
+        for pageNb, content in enumerate(PAGES):
+            archive.put(f"url-{writer}-{copy}-{pageNb}", content)
+    archive.close()
+
+
+class TestPageArchive(unittest.TestCase):
+    """
+    Test compressed pages archive.
+    """
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.archive = PageArchive(self.tempDir.name, segmentSize=50000)
+
+    def tearDown(self):
+        self.archive.close()
+        self.tempDir.cleanup()
+
+    def test_putGet(self):
+        for pageNb, content in enumerate(PAGES):
+            self.archive.put(f"url-{pageNb}", content, kind="item", fetchTime=100.0 + pageNb)
+        for pageNb, content in enumerate(PAGES):
+            self.assertEqual(self.archive.get(f"url-{pageNb}"), content)
+        self.assertIsNone(self.archive.get("missing"))
+        self.assertGreater(self.archive.segment, 0) # Were segments rolled over ?
+
+    def test_versions(self):
+        self.archive.put("url", PAGES[1], fetchTime=200.0)
+        self.archive.put("url", PAGES[2], fetchTime=100.0)
+        self.assertEqual(self.archive.get("url"), PAGES[1]) # Latest version by default
+        self.assertEqual(self.archive.get("url", fetchTime=150.0), PAGES[2])
+        self.assertIsNone(self.archive.get("url", fetchTime=50.0))
+        self.assertEqual([entry.fetchTime for entry in self.archive.entries()], [100.0, 200.0])
+
+    def test_concurrentWriters(self):
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            list(pool.map(archivePages, [self.tempDir.name] * 4, range(4)))
+        reopened = PageArchive(self.tempDir.name)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 4 * 10 * len(PAGES))
+        # Appends of processes didn't overlap, each page reads back whole
+        for writer in range(4):
+            for copy in range(10):
+                for pageNb, content in enumerate(PAGES):
+                    self.assertEqual(reopened.get(f"url-{writer}-{copy}-{pageNb}"), content)
+
+    def test_concurrentReads(self):
+        # Readers keep reading while segment grows (and gets remapped)
+        self.archive = PageArchive(self.tempDir.name, segmentSize=10**9)
+        first = self.archive.put("first", PAGES[0])
+
+        def readWhileWriting(pageNb):
+            self.archive.put(f"url-{pageNb}", PAGES[pageNb % len(PAGES)])
+            return self.archive.read(first)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertTrue(all(content == PAGES[0] for content in pool.map(readWhileWriting, range(200))))
+
+    def test_dictionary(self):
+        """
+        Shared dictionary should improve compression of item's pages and survive archive reopening.
+        """
+        plain = self.archive.put("plain", PAGES[2])
+        self.archive.train(PAGES[:2])
+        withDictionary = self.archive.put("dict", PAGES[2])
+        self.assertLess(withDictionary.length, plain.length)
+        reopened = PageArchive(self.tempDir.name)
+        self.assertEqual(reopened.get("dict"), PAGES[2])
+        self.assertEqual(reopened.get("plain"), PAGES[2])
+        self.assertEqual(len(reopened), 2)
+        reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
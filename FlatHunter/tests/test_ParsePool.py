@@ -0,0 +1,69 @@
+import time
+import unittest
+from FlatHunter.modules.ImmoCH import extractSearchPage
+from FlatHunter.tests.local_site import LocalImmoCH, SEARCH_PAGE_CONTENT
+from FlatHunter.utils.parse_pool import ParsePool
+
+
+def slowParse(content, seconds):
+    """
+    Parser taking `seconds` (run in pool, so module level), fails on empty content.
+    """
+    time.sleep(seconds)
+    if not content:
+        raise ValueError("Empty page")
+    return len(content)
+
+
+class TestParsePool(unittest.TestCase):
+    """
+    Test process pool parsing stage.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+
+    def test_fetchAndParse(self):
+        with ParsePool(parseWorkers=2, fetchWorkers=2) as pool:
+            results = pool.fetchAndParse(lambda url: SEARCH_PAGE_CONTENT if url else None, ["page", ""], extractSearchPage, itemCategory="flat", countPages=True)
+        self.assertEqual(results[0]["numberOfPages"], 21)
+        self.assertEqual(len(results[0]["ads"]), 21) # Are all ads (without advert) extracted ?
+        self.assertNotIn("ad-content-soup", results[0]["ads"][0]) # Are only compact records returned ?
+        self.assertIsNone(results[1]) # Failed fetch should give None
+
+    def test_parseConcurrency(self):
+        # One fetching thread still keeps every parsing process busy
+        with ParsePool(parseWorkers=4, fetchWorkers=1) as pool:
+            pool.fetchAndParse(lambda url: b"", [""], slowParse, seconds=0) # Start processes
+            start = time.perf_counter()
+            results = pool.fetchAndParse(lambda url: url.encode(), ["a", "bb", "", "dddd"], slowParse, seconds=0.5)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(results, [1, 2, None, 4]) # Failed parse should give None, order is kept
+        self.assertLess(elapsed, 1.5)
+
+    def test_getItemsParity(self):
+        """
+        Pooled getItems should return the same ads as in-process getItems.
+        """
+        expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=2)
+        pooled = LocalImmoCH("flat", parseWorkers=2).getItems(self.filterParams, pagesToSearch=2)
+        self.assertGreater(len(expected), 5)
+        self.assertEqual(expected, pooled)
+
+    def test_singlePageSearch(self):
+        # Search without pagination (a single page of results) is crawled as one page
+        site = LocalImmoCH("flat", parseWorkers=2)
+        site.searchPage = SEARCH_PAGE_CONTENT.replace(b'<ul class="pages">', b'<ul class="no-pages">')
+        ads = site.getItems(self.filterParams)
+        self.assertGreater(len(ads), 5)
+        self.assertEqual(ads, LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
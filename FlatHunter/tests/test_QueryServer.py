@@ -0,0 +1,154 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+from FlatHunter.utils.query_server import QueryAPI, QueryCache, makeServer
+from FlatHunter.utils.result_store import ResultStore
+from FlatHunter.utils.scheduler import CrawlScheduler, storeResults
+
+
+def makeAds(numberOfAds, rentOffset=0):
+    return [
+        {
+            "data-id": 900000 + position,
+            "link": f"https://www.immobilier.ch/fr/louer/appartement/geneve/{900000 + position}",
+            "rent": 1000 + (position * 137) % 3000 + rentOffset,
+            "rooms": 2.0 + position % 4,
+            "size": 40 + (position * 13) % 120,
+        }
+        for position in range(numberOfAds)
+    ]
+
+
+class TestQueryServer(unittest.TestCase):
+    """
+    Test query API over result store.
+    """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.store = ResultStore(os.path.join(self.folder.name, "results.sqlite"))
+        self.addCleanup(self.store.close)
+        self.ads = makeAds(60)
+        self.runID = self.commitRun(self.ads)
+        self.api = QueryAPI(self.store, cacheSize=16)
+
+    def commitRun(self, ads):
+        runID = self.store.startRun("crawl")
+        self.store.putRecords(runID, ads, crawledAt=1000.0)
+        self.store.finishRun(runID)
+        return runID
+
+    def get(self, target, ifNoneMatch=None):
+        status, headers, body = self.api.handle(target, ifNoneMatch)
+        return status, headers, json.loads(body) if body else None
+
+    def test_filter(self):
+        status, _, response = self.get("/ads?minRent=1500&maxRent=3000&minRooms=3&maxSize=120&pageSize=10")
+        expected = [
+            ad for ad in self.ads if 1500 <= ad["rent"] <= 3000 and ad["rooms"] >= 3 and ad["size"] <= 120
+        ]
+        self.assertEqual(status, 200)
+        self.assertEqual(response["runID"], self.runID)
+        self.assertEqual(response["total"], len(expected))
+        # Pages cover all matching ads, ordered by data-id
+        items = response["items"]
+        for page in range(2, -(-len(expected) // 10) + 1):
+            items += self.get(f"/ads?minRent=1500&maxRent=3000&minRooms=3&maxSize=120&pageSize=10&page={page}")[2]["items"]
+        self.assertEqual(items, expected)
+        self.assertEqual(self.get("/ads")[2]["total"], len(self.ads))
+
+    def test_cache(self):
+        self.get("/ads?maxRent=2000")
+        self.get("/ads?maxRent=2000")
+        self.get("/ads?maxRent=2000&page=2")
+        # Second request is a hit, second page reuses count of filter
+        self.assertEqual(self.api.cache.stats["hits"], 2)
+        # Unfinished run isn't served
+        runID = self.store.startRun("crawl")
+        self.store.putRecords(runID, makeAds(60, rentOffset=-500))
+        self.assertEqual(self.get("/ads?maxRent=2000")[2]["runID"], self.runID)
+        # New finished run drops cached results
+        self.store.finishRun(runID)
+        _, _, response = self.get("/ads?maxRent=2000")
+        self.assertEqual(response["runID"], runID)
+        self.assertEqual(response["total"], sum(1 for ad in self.ads if ad["rent"] - 500 <= 2000))
+        self.assertEqual(self.api.cache.stats["invalidations"], 1)
+        # Older run can still be queried
+        self.assertEqual(self.get(f"/ads?maxRent=2000&runID={self.runID}")[2]["runID"], self.runID)
+
+    def test_etag(self):
+        status, headers, _ = self.get("/ads?maxRent=2000")
+        etag = headers["ETag"]
+        self.assertEqual(self.get("/ads?maxRent=2000", etag)[0], 304)
+        self.assertEqual(self.get("/ads?maxRent=2000", f'"other", {etag}')[0], 304)
+        self.assertEqual(self.get("/ads?maxRent=2000&page=2", etag)[0], 200)
+        self.assertEqual(self.api.cache.stats["notModified"], 2)
+        # Same query of a new run is a new page
+        self.commitRun(makeAds(60, rentOffset=100))
+        status, headers, _ = self.get("/ads?maxRent=2000", etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], etag)
+
+    def test_errors(self):
+        self.assertEqual(self.get("/ads?maxRent=cheap")[0], 400)
+        self.assertEqual(self.get("/ads?page=0")[0], 400)
+        self.assertEqual(self.get("/ads?color=blue")[0], 400)
+        self.assertEqual(self.get("/flats")[0], 404)
+        self.assertEqual(self.get("/ads?runID=99")[0], 404)
+        self.assertEqual(self.get("/ads?pageSize=100000")[2]["pageSize"], 500)
+        store = ResultStore(os.path.join(self.folder.name, "empty.sqlite"))
+        self.addCleanup(store.close)
+        self.assertEqual(QueryAPI(store).handle("/ads")[0], 404)
+
+    def test_queryCache(self):
+        cache = QueryCache(maxSize=2)
+        cache.setGeneration(1)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        # Least recently used entry is evicted
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats["evictions"], 1)
+        cache.setGeneration(2)
+        self.assertEqual(len(cache), 0)
+
+    def test_server(self):
+        server = makeServer(self.store, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        # Connection is kept alive between requests
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        self.addCleanup(connection.close)
+        connection.request("GET", "/ads?maxRent=2000&pageSize=5")
+        response = connection.getresponse()
+        body = json.loads(response.read())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "application/json")
+        self.assertEqual(len(body["items"]), 5)
+        connection.request("GET", "/ads?maxRent=2000&pageSize=5", headers={"If-None-Match": response.getheader("ETag")})
+        response = connection.getresponse()
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.read(), b"")
+        connection.request("GET", "/runs")
+        self.assertEqual(json.loads(connection.getresponse().read())[0]["runID"], self.runID)
+
+    def test_storeResults(self):
+        merged = CrawlScheduler.mergeResults(
+            [{"region": "geneve", "category": "flat", "filter": {}}],
+            [{"items": makeAds(5), "seconds": 0.1, "stats": {}, "error": None}],
+        )
+        runID = storeResults(self.store, merged, "3")
+        self.assertEqual(self.store.getLatestRun()["runID"], runID)
+        self.assertEqual(self.store.getRun(runID)["extractorVersion"], "3")
+        self.assertEqual(self.get("/ads")[2]["items"][0]["region"], "geneve")
+
+
+if __name__ == "__main__":
+    unittest.main()
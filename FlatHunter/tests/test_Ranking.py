@@ -0,0 +1,64 @@
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.crawl_budget import DETAIL_PRIORITIES
+from FlatHunter.utils.ranking import TopK
+
+
+class TestRanking(unittest.TestCase):
+    """
+    Test streaming top-K ranking of ads.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.matches = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+
+    def test_topK(self):
+        ranking = TopK(3, "rent")
+        for dataID, rent in enumerate([900, 500, 700, 500, 300, 1200]):
+            ranking.push({"data-id": dataID, "rent": rent})
+        self.assertEqual(len(ranking), 3)
+        # Ties are won by earliest ad
+        self.assertEqual([ad["data-id"] for ad in ranking.items()], [4, 1, 3])
+        self.assertEqual(ranking.threshold(), 500)
+        self.assertFalse(ranking.push({"data-id": 6, "rent": 500}))
+        self.assertFalse(ranking.canChange(500))
+        with self.assertRaises(ValueError):
+            TopK(0)
+
+    def test_getTopItems(self):
+        for score in ("rentPerM2", "rentPerRoom", "recency"):
+            site = LocalImmoCH("flat")
+            top = site.getTopItems(self.filterParams, k=5, score=score, pagesToSearch=1)
+            expected = sorted(self.matches, key=DETAIL_PRIORITIES[score])[:5]
+            self.assertEqual([{key: ad[key] for key in expected[0]} for ad in top], expected)
+            self.assertEqual([ad["score"] for ad in top], [DETAIL_PRIORITIES[score](ad) for ad in expected])
+            self.assertFalse(top.partial)
+            # One search page, then item's pages of ranked ads only
+            self.assertEqual(site.stats["requests"], 1 + 5)
+
+    def test_earlyStop(self):
+        site = LocalImmoCH("flat")
+        # Bound saying no later card can do better : crawl stops as soon as ranking is full
+        top = site.getTopItems(self.filterParams, k=2, pagesToSearch=1, lowerBound=lambda record: float("inf"))
+        self.assertEqual([ad["data-id"] for ad in top], [ad["data-id"] for ad in sorted(self.matches[:2], key=DETAIL_PRIORITIES["rentPerM2"])])
+        self.assertEqual(site.stats["rankingStoppedEarly"], 1)
+
+    def test_budget(self):
+        site = LocalImmoCH("flat")
+        top = site.getTopItems(self.filterParams, k=5, pagesToSearch=1, maxRequests=3)
+        self.assertTrue(top.partial)
+        self.assertEqual(top.reason, "maxRequests")
+        # Best ads get their item's page first
+        self.assertEqual(top.missingDetails, [ad["data-id"] for ad in top[2:]])
+        self.assertEqual(top[4]["images"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from bs4 import BeautifulSoup
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.utils.misc_utils import getPath
+from FlatHunter.utils.page_archive import PageArchive
+from FlatHunter.utils.reextract import ITEM_PAGE_WINDOW, reextractArchive
+from FlatHunter.utils.result_store import ResultStore
+
+ROOT_PATH = getPath("root")
+
+SEARCH_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html"
+AD_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/ad_page.html"
+with open(SEARCH_PAGE_PATH, "rb") as fp:
+    SEARCH_PAGE_CONTENT = fp.read()
+with open(AD_PAGE_PATH, "rb") as fp:
+    AD_PAGE_CONTENT = fp.read()
+
+
+class TestReextract(unittest.TestCase):
+    """
+    Test offline re-extraction over archived pages.
+    """
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        site = ImmoCH("flat")
+        baseURL, params = site.getSearchURL()
+        archive = PageArchive(f"{self.tempDir.name}/archive")
+        archive.put(f"{baseURL}page-1{params}", SEARCH_PAGE_CONTENT, kind="search", fetchTime=1000.0)
+        # Archive item's page of first ad only
+        firstLink = BeautifulSoup(SEARCH_PAGE_CONTENT, "html.parser").find(id="link-result-item-899264")["href"]
+        self.firstLink = site.URLs["website"] + firstLink
+        archive.put(self.firstLink, AD_PAGE_CONTENT, kind="item", fetchTime=1010.0)
+        # Item's page of second ad is too old to belong to this search
+        secondLink = BeautifulSoup(SEARCH_PAGE_CONTENT, "html.parser").find(id="link-result-item-900096")["href"]
+        archive.put(site.URLs["website"] + secondLink, AD_PAGE_CONTENT, kind="item", fetchTime=999.0 - ITEM_PAGE_WINDOW)
+        archive.close()
+        self.store = ResultStore(f"{self.tempDir.name}/results.db")
+
+    def tearDown(self):
+        self.store.close()
+        self.tempDir.cleanup()
+
+    def test_reextractArchive(self):
+        stats = reextractArchive(f"{self.tempDir.name}/archive", self.store, workers=2)
+        self.assertEqual(stats["pages"], 2) # Search page and one item's page
+        self.assertEqual(stats["records"], 21)
+        records = {record["data-id"]: record for record in self.store.getRecords(stats["runID"])}
+        self.assertEqual(records[899264]["rent"], 2500)
+        self.assertEqual(len(records[899264]["images"]), 3) # Was archived item's page joined ?
+        otherRecord = next(record for dataID, record in records.items() if dataID != 899264)
+        self.assertEqual(otherRecord["images"], {}) # Item's page not archived : default value, as in a crawl
+        self.assertEqual(records[900096]["images"], {}) # Item's page archived long before search page
+        self.assertEqual(set(otherRecord) - {"crawledAt"}, set(records[899264]) - {"crawledAt"}) # Same fields for every record
+        self.assertEqual(records[899264]["crawledAt"], 1000.0)
+        self.assertEqual(self.store.getRuns()[0]["source"], "reextract")
+
+
+if __name__ == "__main__":
+    unittest.main()
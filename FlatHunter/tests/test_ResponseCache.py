@@ -0,0 +1,83 @@
+import multiprocessing
+import tempfile
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.misc_utils import canonicalURL
+from FlatHunter.utils.response_cache import ResponseCache
+
+URL = "https://www.immobilier.ch/fr/carte/louer/appartement-maison/geneve/page-1?t=rent&c=1;2&p=s40&nb=false&gr=1"
+
+
+def putFromOtherProcess(cache):
+    cache.put("https://example.com/other", b"other process", "item")
+
+
+class SamePageImmoCH(LocalImmoCH):
+    """
+    LocalImmoCH answering every request with the same content. Used for testing purposes.
+    """
+    searchPage = adPage = b"<html>page</html>"
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Test on-disk response cache.
+    """
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(f"{self.tempDir.name}/cache.db", maxBytes=25)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tempDir.cleanup()
+
+    def test_canonicalURL(self):
+        self.assertEqual(canonicalURL(URL), canonicalURL("HTTPS://WWW.immobilier.ch:443/fr/carte/louer/appartement-maison/geneve/page-1?gr=1&t=rent&nb=false&p=s40&c=1;2#top"))
+        self.assertNotEqual(canonicalURL(URL), canonicalURL(URL.replace("page-1", "page-2")))
+
+    def test_getPut(self):
+        self.cache.put(URL, b"0123456789", "search")
+        self.assertEqual(self.cache.get(URL.replace("?t=rent&c=1;2", "?c=1;2&t=rent"), "search"), b"0123456789")
+        self.assertIsNone(self.cache.get("https://example.com/missing"))
+
+    def test_ttl(self):
+        cache = ResponseCache(f"{self.tempDir.name}/ttl.db", ttls={"search": -1})
+        cache.put(URL, b"content", "search")
+        self.assertIsNone(cache.get(URL, "search")) # Expired for search pages
+        cache.put(URL, b"content", "item")
+        self.assertEqual(cache.get(URL, "item"), b"content") # Still valid for item's pages
+        cache.close()
+
+    def test_lruEviction(self):
+        self.cache.put("https://example.com/a", b"0123456789")
+        self.cache.put("https://example.com/b", b"0123456789")
+        self.cache.get("https://example.com/a") # a is now more recently used than b
+        self.cache.put("https://example.com/c", b"0123456789")
+        self.assertLessEqual(self.cache.totalBytes(), 25)
+        self.assertIsNone(self.cache.get("https://example.com/b"))
+        self.assertIsNotNone(self.cache.get("https://example.com/a"))
+
+    def test_sharedBetweenProcesses(self):
+        process = multiprocessing.Process(target=putFromOtherProcess, args=(self.cache,))
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get("https://example.com/other", "item"), b"other process")
+
+    def test_getPageContent(self):
+        """
+        Second run (another crawler sharing cache) should get page from cache without request.
+        """
+        cache = ResponseCache(f"{self.tempDir.name}/crawler.db")
+        SamePageImmoCH("flat", responseCache=cache).getPageContent(URL)
+        test_object = SamePageImmoCH("flat", responseCache=cache)
+        test_object.getPageContent(URL)
+        report = test_object.reportStats()
+        self.assertNotIn("requests", report) # No request made
+        self.assertEqual(report["cacheHits"], 1)
+        self.assertEqual(report["bytesSaved"], len(b"<html>page</html>"))
+        self.assertEqual(report["cacheHitRate"], 1.0)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import time
+import unittest
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.rate_limiter import RateLimiter
+from FlatHunter.utils.scheduler import CrawlScheduler
+
+REQUESTS_PER_SECOND = 100.0
+
+
+class TestScheduler(unittest.TestCase):
+    """
+    Test multi-region, multi-category scheduler.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+
+    def test_regionURLs(self):
+        baseURL, _ = ImmoCH("flat", region="vaud").getSearchURL()
+        self.assertTrue(baseURL.endswith("/appartement-maison/vaud/"))
+        baseURL, _ = ImmoCH("commercial").getSearchURL()
+        self.assertTrue(baseURL.endswith("/commercial/geneve/")) # Is Geneva still the default region ?
+        site = ImmoCH("flat", True)
+        self.assertTrue(site.fastPath) # Are existing positional parameters unchanged ?
+        self.assertEqual(site.region, "geneve")
+
+    def test_rateLimiter(self):
+        limiter = RateLimiter(requestsPerSecond=20.0)
+        start = time.perf_counter()
+        for _ in range(5):
+            limiter.wait("https://www.immobilier.ch/fr/")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.19)
+        self.assertEqual(limiter.wait("https://other.example.com/"), 0.0) # Budget is per host
+
+    def test_run(self):
+        jobs = [
+            {"region": "geneve", "category": "flat", "filter": self.filterParams, "pagesToSearch": 1},
+            {"region": "vaud", "category": "flat", "filter": self.filterParams, "pagesToSearch": 1},
+        ]
+        expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        result = CrawlScheduler(jobs, workers=2, requestsPerSecond=REQUESTS_PER_SECOND, siteClass=LocalImmoCH).run()
+        # Both local jobs see the same ads : they're merged, with both jobs listed
+        self.assertEqual(len(result["items"]), len(expected))
+        self.assertEqual(result["items"][0]["jobs"], [0, 1])
+        self.assertEqual(result["items"][0]["region"], "geneve")
+        self.assertEqual(len(result["jobs"]), 2)
+        self.assertTrue(all(report["error"] is None and report["seconds"] > 0 for report in result["jobs"]))
+        # Market statistics of workers are merged
+        self.assertEqual(
+            [(row["region"], row["count"]) for row in result["market"].summary(groupBy=("region",))],
+            [("geneve", len(expected)), ("vaud", len(expected))],
+        )
+        # Workers share one budget : all requests together can't go faster than it
+        requests = sum(report["stats"]["requests"] for report in result["jobs"])
+        self.assertGreaterEqual(result["seconds"], 0.9 * (requests - 1) / REQUESTS_PER_SECOND)
+
+    def test_failedJob(self):
+        result = CrawlScheduler.mergeResults(
+            [{"region": "geneve", "category": "office", "filter": {}}],
+            [{"items": [], "seconds": 0.1, "stats": {}, "error": "AttributeError()"}],
+        )
+        self.assertEqual(result["items"], [])
+        self.assertEqual(result["jobs"][0]["error"], "AttributeError()")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.utils.misc_utils import getPath
+from FlatHunter.utils.single_flight import SingleFlight
+
+ROOT_PATH = getPath("root")
+
+SEARCH_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/immo_searchPage.html"
+AD_PAGE_PATH = f"{ROOT_PATH}/FlatHunter/tests/LocalQueryTests/PagesToQuery/ad_page.html"
+with open(SEARCH_PAGE_PATH, "rb") as fp:
+    SEARCH_PAGE_CONTENT = fp.read()
+with open(AD_PAGE_PATH, "rb") as fp:
+    AD_PAGE_CONTENT = fp.read()
+
+
+class CountingImmoCH(ImmoCH):
+    """
+    ImmoCH serving local pages and counting fetched URLs. Used for testing purposes.
+    """
+    def _fetchPageContent(self, _url):
+        self.stats["requests"] += 1
+        return SEARCH_PAGE_CONTENT if "/carte/" in _url else AD_PAGE_CONTENT
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Test request coalescing and duplicates elimination.
+    """
+    def test_coalescing(self):
+        singleFlight = SingleFlight(memoize=True)
+        calls = []
+
+        def slowFunction():
+            calls.append(1)
+            time.sleep(0.1)
+            return b"content"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(singleFlight.do("key", slowFunction))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1) # Was function run only once ?
+        self.assertEqual(sorted(sharedFrom or "" for _, sharedFrom in results), ["", "inFlight", "inFlight", "inFlight", "inFlight"])
+        self.assertEqual(singleFlight.do("key", slowFunction), (b"content", "memo"))
+        singleFlight.reset()
+        self.assertEqual(singleFlight.do("key", slowFunction), (b"content", None))
+
+    def test_notMemoizedByDefault(self):
+        singleFlight = SingleFlight()
+        singleFlight.do("key", lambda: b"content")
+        self.assertEqual(singleFlight.results, {})
+        self.assertEqual(singleFlight.do("key", lambda: b"fresh"), (b"fresh", None))
+
+    def test_noneNotMemoized(self):
+        singleFlight = SingleFlight(memoize=True)
+        singleFlight.do("key", lambda: None)
+        self.assertEqual(singleFlight.do("key", lambda: b"retry"), (b"retry", None)) # Failed fetch should be retried
+
+    def test_crawlDuplicates(self):
+        """
+        Crawling same page twice should fetch first page once and item's pages once per data-id.
+        """
+        filterParams = {"minRent": 400, "maxRent": 5000, "minSize": 45, "maxSize": 350, "minRooms": 2.0, "maxRooms": 8.0}
+        test_object = CountingImmoCH("flat")
+        test_object.getItems(filterParams, pagesToSearch=2)
+        # 2 search pages (identical content) + 21 item's pages
+        self.assertEqual(test_object.stats["requests"], 2 + 21)
+        self.assertEqual(test_object.stats["duplicateAds"], 21)
+        # Pages of run aren't kept once fetched
+        self.assertEqual(test_object.fetches.results, {})
+
+    def test_itemRecordsMemoized(self):
+        """
+        Item's page needed twice in a run (e.g. ranked then listed) should be fetched once, and again in next run.
+        """
+        filterParams = {"minRent": 400, "maxRent": 5000, "minSize": 45, "maxSize": 350, "minRooms": 2.0, "maxRooms": 8.0}
+        test_object = CountingImmoCH("flat")
+        ads = test_object.getItems(filterParams, pagesToSearch=1, lazyDetails=True)
+        requests = test_object.stats["requests"]
+        first = ads[0]["images"]
+        test_object.prefetchDetails(ads) # Loads other ads, first one is already loaded
+        self.assertEqual(test_object.stats["requests"], requests + len(ads))
+        record = {"link": ads[0]["link"]}
+        self.assertEqual(test_object._fetchItemRecord(record)["images"], first)
+        self.assertEqual(test_object.stats["requests"], requests + len(ads)) # Memoized
+        self.assertEqual(test_object.stats["itemPagesReused"], 1)
+        test_object.resetRun()
+        test_object._fetchItemRecord(record)
+        self.assertEqual(test_object.stats["requests"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import unittest
+from FlatHunter.modules import SITES, getSite, registerSite
+from FlatHunter.utils.misc_utils import getPath
+
+ROOT_PATH = getPath("root")
+LOG_PATH = ROOT_PATH / "logs" / "FlatHunter.log"
+
+# Import time budget (ms) of main.py, site modules excluded
+STARTUP_BUDGET_MS = 100
+
+
+def importTimes(statement):
+    """
+    Run statement in a fresh interpreter with `-X importtime` and return {module: cumulative time (us)} of top-level imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT_PATH, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Test lazy site registry and import time of command line entry point.
+    """
+    def test_importBudget(self):
+        times = importTimes("import main")
+        self.assertNotIn("bs4", times) # Heavy dependencies are only imported along with a site
+        self.assertNotIn("requests", times)
+        self.assertNotIn("FlatHunter.modules.ImmoCH", times)
+        self.assertLess(times["main"] / 1000, STARTUP_BUDGET_MS)
+
+    def test_noImportIO(self):
+        before = os.stat(LOG_PATH) if LOG_PATH.exists() else None
+        subprocess.run([sys.executable, "-c", "import FlatHunter.utils.logging_utils"], cwd=ROOT_PATH, check=True)
+        after = os.stat(LOG_PATH) if LOG_PATH.exists() else None
+        if before is None:
+            self.assertIsNone(after) # Log file isn't created at import
+        else:
+            self.assertEqual((before.st_size, before.st_mtime_ns), (after.st_size, after.st_mtime_ns)) # Nor truncated
+
+    def test_registry(self):
+        from FlatHunter.modules.ImmoCH import ImmoCH
+
+        self.assertIs(getSite("immoch"), ImmoCH)
+        registerSite("local", ImmoCH)
+        self.assertIs(getSite("local"), ImmoCH)
+        self.assertEqual(SITES["local"], "FlatHunter.modules.ImmoCH:ImmoCH")
+        del SITES["local"]
+        with self.assertRaises(KeyError):
+            getSite("unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
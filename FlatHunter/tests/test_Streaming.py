@@ -0,0 +1,79 @@
+import unittest
+from bs4 import BeautifulSoup
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.tests.local_site import AD_PAGE_CONTENT, LocalImmoCH, SEARCH_PAGE_CONTENT
+from FlatHunter.utils.streaming import RegionCollector, streamRegions
+
+
+class FakeResponse:
+    """
+    Streamed response serving content by chunks. Used for testing purposes.
+    """
+    def __init__(self, content):
+        self.content = content
+        self.headers = {"Content-Type": "text/html"}
+        self.encoding = "ISO-8859-1"
+        self.bytesRead = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            self.bytesRead += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class StreamingImmoCH(LocalImmoCH):
+    """
+    LocalImmoCH streaming local pages by chunks. Used for testing purposes.
+    """
+    def streamPageRegions(self, _url, regions):
+        return streamRegions(FakeResponse(self.searchPage if "/carte/" in _url else self.adPage), regions)
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Test incremental region parsing.
+    """
+    def test_regionsParity(self):
+        """
+        Ads collected by chunks should be the same as the ones of whole page soup.
+        """
+        regions = ImmoCH("flat").regions["search"]
+        collector = RegionCollector(regions)
+        for start in range(0, len(SEARCH_PAGE_CONTENT), 1000):
+            collector.feed(SEARCH_PAGE_CONTENT[start:start + 1000].decode("utf-8", errors="ignore"))
+        closed = collector.popClosed()
+        fullSoup = BeautifulSoup(SEARCH_PAGE_CONTENT, "html.parser")
+        expectedIDs = [item.get("data-id") for item in fullSoup.find_all(class_="filter-item")]
+        streamedIDs = [BeautifulSoup(html, "html.parser").find(class_="filter-item").get("data-id") for name, html in closed if name == "ad"]
+        self.assertEqual(expectedIDs, streamedIDs)
+        self.assertEqual(closed[-1][0], "pagination")
+        self.assertTrue(collector.done)
+
+    def test_earlyStop(self):
+        """
+        Reading should stop once `#main` is closed, and response should be closed.
+        """
+        response = FakeResponse(AD_PAGE_CONTENT)
+        regions = list(streamRegions(response, ImmoCH("flat").regions["item"], chunkSize=4096))
+        self.assertEqual(len(regions), 1)
+        self.assertLess(response.bytesRead, len(AD_PAGE_CONTENT)) # Was download stopped early ?
+        self.assertTrue(response.closed)
+        streamedMain = BeautifulSoup(regions[0][1], "html.parser").find(id="main")
+        fullMain = BeautifulSoup(AD_PAGE_CONTENT, "html.parser").find(id="main")
+        self.assertEqual(streamedMain, fullMain)
+
+    def test_getItemsParity(self):
+        filterParams = {"minRent": 400, "maxRent": 5000, "minSize": 45, "maxSize": 350, "minRooms": 2.0, "maxRooms": 8.0}
+        expected = LocalImmoCH("flat").getItems(filterParams, pagesToSearch=1)
+        streamed = StreamingImmoCH("flat", streaming=True).getItems(filterParams, pagesToSearch=1)
+        self.assertGreater(len(expected), 5)
+        self.assertEqual(expected, streamed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from FlatHunter.tests.local_site import LocalImmoCH, SEARCH_PAGE_CONTENT
+from FlatHunter.utils.watcher import Watcher
+
+
+class TestWatcher(unittest.TestCase):
+    """
+    Test watch mode.
+    """
+    def setUp(self):
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+        self.site = LocalImmoCH("flat")
+        self.watcher = Watcher(self.site, self.filterParams, minInterval=10, maxInterval=100, initialInterval=40)
+
+    def test_poll(self):
+        expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)
+        self.assertEqual(self.watcher.poll(), expected) # First poll emits current matches
+        self.assertEqual(self.watcher.interval, 40)
+        self.assertEqual(self.watcher.poll(), []) # Nothing new
+        self.assertEqual(self.site.stats["requests"], 1) # Only search page was requested
+        self.assertEqual(self.watcher.interval, 60) # Backed off
+        # Ad 899264 is relisted with a new data-id
+        self.site.searchPage = SEARCH_PAGE_CONTENT.replace(b"899264", b"1")
+        emitted = self.watcher.poll()
+        self.assertEqual([ad["data-id"] for ad in emitted], [1])
+        self.assertEqual(self.watcher.interval, 30) # New ads : polls faster
+
+    def test_changedAd(self):
+        self.watcher.poll()
+        # Rent of ad 899264 changes from 2500 to 2400 CHF
+        self.site.searchPage = SEARCH_PAGE_CONTENT.replace(b"2'500", b"2'400", 1)
+        emitted = self.watcher.poll()
+        self.assertEqual([(ad["data-id"], ad["rent"]) for ad in emitted], [(899264, 2400)])
+        self.assertEqual(self.site.stats["changedAds"], 1)
+
+    def test_noInitialEmit(self):
+        watcher = Watcher(self.site, self.filterParams, emitInitial=False)
+        self.assertEqual(watcher.poll(), [])
+        self.assertGreater(len(watcher.known), 0)
+
+    def test_run(self):
+        emitted = []
+        watcher = Watcher(self.site, self.filterParams, minInterval=0, initialInterval=0, maxInterval=0)
+        watcher.run(emitted.append, maxPolls=2)
+        self.assertEqual(watcher.polls, 2)
+        self.assertEqual(len(emitted), len(LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
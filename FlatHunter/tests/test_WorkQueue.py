@@ -0,0 +1,159 @@
+import os
+import pickle
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from FlatHunter.tests.local_site import LocalImmoCH
+from FlatHunter.utils.distributed import enqueueJobs, openQueue, openRateLimiter, runWorkers, waitForResults
+from FlatHunter.utils.redis_utils import redis
+from FlatHunter.utils.work_queue import RedisWorkQueue
+
+# URL of a disposable Redis database (flushed by tests), Redis backend tests are skipped if it's not set
+REDIS_URL = os.environ.get("FLATHUNTER_TEST_REDIS_URL")
+
+
+class QueueTests:
+    """
+    Tests of work queue interface and distributed crawl, run on each backend (see `queueLocation()`).
+    """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.queue = openQueue(self.queueLocation(), leaseSeconds=0.2, maxAttempts=2)
+        self.filterParams = {
+            "minRent": 400,
+            "maxRent": 5000,
+            "minSize": 45,
+            "maxSize": 350,
+            "minRooms": 2.0,
+            "maxRooms": 8.0,
+        }
+
+    def tearDown(self):
+        self.queue.close()
+        self.folder.cleanup()
+
+    def queueLocation(self):
+        raise NotImplementedError
+
+    def test_leaseAndComplete(self):
+        self.assertTrue(self.queue.put("search", "https://example.com/1", {"page": 1}))
+        self.assertFalse(self.queue.put("search", "https://example.com/1")) # Same task is enqueued once
+        task = self.queue.lease("w1")
+        self.assertEqual(task["payload"], {"page": 1})
+        self.assertIsNone(self.queue.lease("w2")) # Leased task isn't given to another worker
+        self.assertFalse(self.queue.isDrained())
+        self.assertTrue(self.queue.complete(task["taskID"], "w1"))
+        self.assertTrue(self.queue.isDrained())
+
+    def test_expiredLeaseAndRetries(self):
+        self.queue.put("item", "https://example.com/ad")
+        task = self.queue.lease("w1")
+        time.sleep(0.3)
+        retry = self.queue.lease("w2") # Crashed worker's lease expired
+        self.assertEqual((retry["taskID"], retry["attempts"]), (task["taskID"], 2))
+        self.assertFalse(self.queue.complete(task["taskID"], "w1")) # First worker lost its lease
+        self.assertFalse(self.queue.fail(retry["taskID"], "w2", "timeout")) # Last attempt : no retry
+        self.assertEqual(self.queue.counts(), {"failed": 1})
+
+    def test_idempotentResults(self):
+        self.queue.putResult(1, {"data-id": 1, "rent": 1000})
+        self.queue.putResult(1, {"data-id": 1, "rent": 1000})
+        self.assertEqual(self.queue.getResults(), [{"data-id": 1, "rent": 1000}])
+
+    def test_distributedCrawl(self):
+        expected = LocalImmoCH("flat").getItems(self.filterParams, pagesToSearch=2)
+        queueLocation = self.queueLocation()
+        queue = openQueue(queueLocation)
+        jobs = [{"region": "geneve", "category": "flat", "filter": self.filterParams, "pagesToSearch": 2}]
+        crawlID = enqueueJobs(queue, jobs)
+        self.assertEqual(queue.counts(crawlID), {"pending": 1})
+        runWorkers(queueLocation, workers=2, requestsPerSecond=1000.0, idleTimeout=1.0, siteClass=LocalImmoCH)
+        results = waitForResults(queue, crawlID, timeout=5)
+        self.assertEqual(queue.counts(crawlID), {"done": 2 + len(expected)}) # 2 search pages and one task per matching ad
+        self.assertEqual(len(results), len(expected))
+        for result in results:
+            self.assertEqual(result.pop("region"), "geneve")
+            self.assertEqual(result.pop("category"), "flat")
+        self.assertEqual(sorted(results, key=lambda ad: ad["data-id"]), sorted(expected, key=lambda ad: ad["data-id"]))
+        queue.close()
+
+    def test_recrawl(self):
+        queueLocation = self.queueLocation()
+        queue = openQueue(queueLocation)
+        jobs = [{"region": "geneve", "category": "flat", "filter": self.filterParams, "pagesToSearch": 1}]
+        firstCrawl = enqueueJobs(queue, jobs)
+        runWorkers(queueLocation, workers=1, requestsPerSecond=1000.0, idleTimeout=0.5, siteClass=LocalImmoCH)
+        firstResults = waitForResults(queue, firstCrawl, timeout=5)
+        # Same jobs crawled again on the same queue : tasks are enqueued again, previous results aren't returned
+        secondCrawl = enqueueJobs(queue, jobs)
+        self.assertNotEqual(secondCrawl, firstCrawl)
+        self.assertEqual(queue.counts(secondCrawl), {"pending": 1})
+        self.assertEqual(waitForResults(queue, secondCrawl, pollInterval=0.05, timeout=0.1), [])
+        runWorkers(queueLocation, workers=1, requestsPerSecond=1000.0, idleTimeout=0.5, siteClass=LocalImmoCH)
+        secondResults = waitForResults(queue, secondCrawl, timeout=5)
+        self.assertEqual(queue.counts(secondCrawl), {"done": 1 + len(firstResults)})
+        self.assertEqual(secondResults, firstResults)
+        self.assertEqual(queue.getResults(firstCrawl), firstResults)
+        queue.close()
+
+    def test_rateLimiter(self):
+        limiter = openRateLimiter(self.queueLocation(), requestsPerSecond=20.0)
+        self.addCleanup(limiter.close)
+        waits = [limiter.wait("https://www.immobilier.ch/page") for _ in range(5)]
+        copy = pickle.loads(pickle.dumps(limiter))
+        self.addCleanup(copy.close)
+        waits.append(copy.wait("https://www.immobilier.ch/other")) # Copy books slots of same budget
+        self.assertEqual(limiter.wait("https://example.com/"), 0.0) # Budget is per host
+        # Each request after first waits for its slot, 1 / 20 s after previous one
+        self.assertEqual(waits[0], 0.0)
+        self.assertAlmostEqual(sum(waits), 0.05 * 5, delta=0.05)
+
+
+class TestWorkQueue(QueueTests, unittest.TestCase):
+    """
+    Test SQLite work queue and distributed crawl on one machine.
+    """
+    def queueLocation(self):
+        return Path(self.folder.name) / "queue"
+
+    def test_pickle(self):
+        # Copy sent to another process opens its own connection
+        self.queue.put("search", "https://example.com/1")
+        copy = pickle.loads(pickle.dumps(self.queue))
+        self.addCleanup(copy.close)
+        self.assertIsNone(copy.connection)
+        self.assertEqual(copy.lease("w1")["url"], "https://example.com/1")
+        self.assertEqual(self.queue.counts(), {"leased": 1})
+
+
+@unittest.skipIf(redis is None or REDIS_URL is None, "redis isn't installed or FLATHUNTER_TEST_REDIS_URL isn't set")
+class TestRedisWorkQueue(QueueTests, unittest.TestCase):
+    """
+    Test Redis work queue and distributed crawl (workers of several machines).
+    """
+    def setUp(self):
+        redis.Redis.from_url(REDIS_URL).flushdb()
+        super().setUp()
+
+    def queueLocation(self):
+        return REDIS_URL
+
+    def test_pickle(self):
+        self.queue.put("search", "https://example.com/1")
+        copy = pickle.loads(pickle.dumps(self.queue))
+        self.addCleanup(copy.close)
+        self.assertIsNone(copy.client)
+        self.assertEqual(copy.lease("w1")["url"], "https://example.com/1")
+        self.assertEqual(self.queue.counts(), {"leased": 1})
+
+    def test_prefix(self):
+        other = RedisWorkQueue(REDIS_URL, prefix="other")
+        self.addCleanup(other.close)
+        self.queue.put("search", "https://example.com/1")
+        self.assertIsNone(other.lease("w1")) # Queues of different prefixes are independent
+        self.assertTrue(other.put("search", "https://example.com/1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
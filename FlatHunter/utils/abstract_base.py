@@ -3,20 +3,65 @@ import requests
 from pathlib import Path
 from requests.exceptions import HTTPError
 from FlatHunter.utils.logging_utils import logger
-from FlatHunter.utils.misc_utils import getPath
+from FlatHunter.utils.misc_utils import canonicalURL, getPath
+from FlatHunter.utils.single_flight import SingleFlight
+from FlatHunter.utils.streaming import streamRegions
 import pickle
+from collections import Counter
 from datetime import datetime
 from abc import ABC, abstractmethod
 
 ROOT_PATH = getPath("root")
 
+# User-Agent to avoid being rejected by website
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
+}
+
 class FlatHunterBase(ABC):
-    def __init__(self, itemCategory):
+    def __init__(self, itemCategory, archive=None, changeTracker=None, responseCache=None, rateLimiter=None, imageStore=None):
         """
         Item category can be either "flat", "industrial", "commercial" or "office". This constructor should be called by children classes
         and construct a dictionary containing all necessary URLs for each type of item category.
+
+        Optional components :
+            archive : PageArchive where every fetched page is stored (compressed) for later re-extraction.
+            changeTracker : ChangeTracker used to skip re-parsing item's pages that didn't change since last crawl.
+            responseCache : ResponseCache answering `getPageContent()` for recently fetched URLs.
+            rateLimiter : RateLimiter delaying requests to keep within a per-host budget (can be shared by processes).
+            imageStore : ImageStore where images of matching ads are fetched (concurrently) and stored once per content.
         """
         self.itemCategory = itemCategory
+        self.archive = archive
+        self.changeTracker = changeTracker
+        self.responseCache = responseCache
+        self.rateLimiter = rateLimiter
+        self.imageStore = imageStore
+        # Session keeps connections to website alive between requests
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        # Timeout (s) of requests, None waits indefinitely
+        self.requestTimeout = None
+        # Counters of current run (requests, parses avoided, cache hits...)
+        self.stats = Counter()
+        # Fetch layer of current run : concurrent requests for same URL share one response (pages aren't kept afterwards,
+        # so memory doesn't grow with crawl size)
+        self.fetches = SingleFlight()
+        # Compact records of item's pages of current run by canonical URL (memoized until `resetRun()`, records are small
+        # compared with pages), so an item's page is fetched once per run whatever number of ads or calls need it
+        self.itemRecords = SingleFlight(memoize=True)
+        # data-id of ads already extracted during current run
+        self.seenIDs = set()
+
+    def resetRun(self):
+        """
+        Start a new run : clear counters, fetched pages, item's page records and seen ads. Should be called at start of
+        `getItems()`.
+        """
+        self.stats.clear()
+        self.fetches.reset()
+        self.itemRecords.reset()
+        self.seenIDs = set()
 
     @abstractmethod
     def getItems(self):
@@ -29,6 +74,13 @@ class FlatHunterBase(ABC):
         """
         pass
 
+    def iterItems(self, filter, pagesToSearch=None):
+        """
+        Generator version of `getItems()`, used to stream matching ads into writers. Default one yields ads of `getItems()`
+        once crawl is done, children classes should override it to yield ads as soon as they're found.
+        """
+        yield from self.getItems(filter, pagesToSearch=pagesToSearch)
+
     @abstractmethod
     def searchPages(self):
         """
@@ -53,21 +105,26 @@ class FlatHunterBase(ABC):
         """
         pass
 
-    def getPageSoup(self, _url):
+    def fetchPage(self, _url, headers=None):
         """
-        Handle HTTP requests/response and get page's soup.
+        Handle HTTP requests/response.
 
         Params
         ------
         _url : string
             URL of page.
+        headers : dict
+            Extra request headers (e.g. conditional request headers).
+
+        Returns
+        -------
+        requests.Response
+            Successful response (including `304 Not Modified`), None if request failed.
         """
-        # User-Agent to avoid being rejected by website
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
-        }
+        self._waitForBudget(_url)
         try:
-            response = requests.get(_url, headers=headers)
+            response = self.session.get(_url, headers=headers, timeout=self.requestTimeout)
+            self.stats["requests"] += 1
             # If the response was successful, no Exception will be raised
             response.raise_for_status()
         except HTTPError as http_err:
@@ -76,8 +133,153 @@ class FlatHunterBase(ABC):
             logger.error(f"Other error occurred: {err}")  # Python 3.6
         else:
             logger.info(f"Succssfully connected to {_url}")
+            if self.archive is not None and response.status_code != 304:
+                self.archive.put(_url, response.content, kind=self.getPageKind(_url))
+            return response
+
+    def fetchAsset(self, _url):
+        """
+        Handle HTTP requests/response of an asset (e.g. image) : same session and rate limiter as pages, but content
+        isn't archived nor cached.
+
+        Params
+        ------
+        _url : string
+            URL of asset.
+
+        Returns
+        -------
+        bytes
+            Asset's content, None if request failed.
+        """
+        self._waitForBudget(_url)
+        try:
+            response = self.session.get(_url, timeout=self.requestTimeout)
+            self.stats["requests"] += 1
+            response.raise_for_status()
+        except HTTPError as http_err:
+            logger.error(f"HTTP error occurred: {http_err}")
+        except Exception as err:
+            logger.error(f"Other error occurred: {err}")
+        else:
+            self.stats["assetBytes"] += len(response.content)
+            return response.content
+
+    def getPageContent(self, _url):
+        """
+        Handle HTTP requests/response and get page's raw content.
+
+        Params
+        ------
+        _url : string
+            URL of page.
+
+        Returns
+        -------
+        bytes
+            Page's content, None if request failed.
+        """
+        content, sharedFrom = self.fetches.do(canonicalURL(_url), lambda: self._fetchPageContent(_url))
+        if sharedFrom is not None:
+            self.stats["fetchesReused"] += 1
+            logger.debug(f"Reused response of {_url} ({sharedFrom})")
+        return content
+
+    def _fetchPageContent(self, _url):
+        """
+        getPageContent's helper : get page's content from response cache or from website.
+        """
+        if self.responseCache is not None:
+            content = self.responseCache.get(_url, self.getPageKind(_url))
+            if content is not None:
+                self.stats["cacheHits"] += 1
+                self.stats["bytesSaved"] += len(content)
+                logger.debug(f"Got {_url} from response cache")
+                return content
+            self.stats["cacheMisses"] += 1
+        response = self.fetchPage(_url)
+        if response is not None:
+            if self.responseCache is not None:
+                self.responseCache.put(_url, response.content, self.getPageKind(_url))
+            return response.content
+
+    def _waitForBudget(self, _url):
+        """
+        Wait until a request to URL fits in rate limiter's budget (if any).
+        """
+        if self.rateLimiter is not None:
+            waited = self.rateLimiter.wait(_url)
+            if waited:
+                self.stats["rateLimitedSeconds"] += waited
+
+    def reportStats(self):
+        """
+        Log and return counters of current run, with cache hit rate when a response cache is used.
+        """
+        report = dict(self.stats)
+        lookups = self.stats["cacheHits"] + self.stats["cacheMisses"]
+        if lookups:
+            report["cacheHitRate"] = round(self.stats["cacheHits"] / lookups, 3)
+        logger.info(f"Run stats : {report}")
+        return report
+
+    def getPageKind(self, _url):
+        """
+        Kind of page behind URL (e.g. "search" or "item"), used to label stored pages. Should be overridden by children classes.
+        """
+        return "page"
+
+    def getPageSoup(self, _url):
+        """
+        Handle HTTP requests/response and get page's soup.
+
+        Params
+        ------
+        _url : string
+            URL of page.
+        """
+        content = self.getPageContent(_url)
+        if content is not None:
             # Return page's soup
-            return BeautifulSoup(response.content, "html.parser")
+            return self.parsePage(content)
+
+    def streamPageRegions(self, _url, regions):
+        """
+        Stream page and yield its regions as soon as they're downloaded and closed, without buffering whole page.
+        Download stops once all regions flagged `last` are closed.
+
+        Params
+        ------
+        _url : string
+            URL of page.
+        regions : list
+            Regions to collect (see `RegionCollector`).
+
+        Yields
+        ------
+        region : tuple
+            (name, html) of each region, in document order. Nothing is yielded if request failed.
+        """
+        self._waitForBudget(_url)
+        try:
+            response = self.session.get(_url, stream=True, timeout=self.requestTimeout)
+            self.stats["requests"] += 1
+            response.raise_for_status()
+        except HTTPError as http_err:
+            logger.error(f"HTTP error occurred: {http_err}")
+            return
+        except Exception as err:
+            logger.error(f"Other error occurred: {err}")
+            return
+        logger.info(f"Succssfully connected to {_url} (streaming)")
+        yield from streamRegions(response, regions)
+
+    @staticmethod
+    def parsePage(content):
+        """
+        Build soup of raw page content.
+        """
+        return BeautifulSoup(content, "html.parser")
 
     @staticmethod
     def getElementsByClass(soup, get="all", _class=""):
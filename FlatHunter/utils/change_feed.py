@@ -0,0 +1,213 @@
+"""
+Change feed between crawl snapshots : ads of each crawl are written sorted by data-id (see SortedSnapshotWriter), then
+two snapshots are merge-joined in a single streaming pass into typed events (added, removed, rent_changed,
+images_changed).
+Usage : python -m FlatHunter.utils.change_feed <previousSnapshot> <currentSnapshot>
+(events are printed as NDJSON)
+"""
+
+import argparse
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.output_writers import BUFFER_SIZE, AdWriter, decodeJSON, encodeJSON
+
+# Event types
+ADDED = "added"
+REMOVED = "removed"
+RENT_CHANGED = "rent_changed"
+IMAGES_CHANGED = "images_changed"
+
+
+class SortedSnapshotWriter(AdWriter):
+    def __init__(self, path, runSize=100000, **options):
+        """
+        Write ads of a crawl as NDJSON sorted by data-id, whatever order they come in (e.g. as a `getItems()` sink).
+        External sort : at most `runSize` ads are kept in memory, full buffers are sorted and spilled to temporary files
+        next to output, which are merged when writer is closed. Ads without data-id (adverts) are skipped.
+
+        Params
+        ------
+        path : str
+            Snapshot file, replaced on close (not when used as a context manager exited by an exception, see `discard()`).
+        runSize : int
+            Number of ads sorted in memory at once.
+        options :
+            See AdWriter (fsync applies to snapshot file).
+        """
+        super().__init__(path, **options)
+        self.runSize = runSize
+        self.buffer = []
+        self.runs = []
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.tempFolder = None
+
+    def __exit__(self, excType, *exc):
+        # Ads of a failed crawl must not replace previous snapshot
+        if excType is not None:
+            self.discard()
+        else:
+            self.close()
+
+    def close(self):
+        """
+        Merge runs into snapshot file. Snapshot is written to a temporary file which replaces previous snapshot only once
+        it's complete.
+        """
+        if self.closed:
+            return
+        self.buffer.sort(key=_dataID)
+        streams = [readSnapshot(run) for run in self.runs] + [iter(self.buffer)]
+        file = tempfile.NamedTemporaryFile("wb", buffering=BUFFER_SIZE, prefix=".snapshot-", dir=Path(self.path).parent, delete=False)
+        try:
+            with file:
+                for ad in heapq.merge(*streams, key=_dataID):
+                    file.write(encodeJSON(ad) + b"\n")
+                file.flush()
+                if self.fsync:
+                    os.fsync(file.fileno())
+            os.replace(file.name, self.path)
+        except BaseException:
+            os.remove(file.name)
+            raise
+        finally:
+            self._removeRuns()
+        self.closed = True
+        logger.info(f"Wrote snapshot of {self.count} ads to '{self.path}' ({len(self.runs)} runs spilled)")
+
+    def discard(self):
+        """
+        Drop ads written so far (e.g. crawl failed) : spilled runs are removed and previous snapshot file is kept.
+        """
+        if self.closed:
+            return
+        self._removeRuns()
+        self.closed = True
+        logger.warning(f"Discarded snapshot of {self.count} ads, '{self.path}' wasn't replaced")
+
+    # === HELPER FUNCTIONS === #
+    def _writeAd(self, ad):
+        if ad.get("data-id") is None:
+            return
+        self.buffer.append(ad)
+        if len(self.buffer) >= self.runSize:
+            self._spill()
+
+    def _removeRuns(self):
+        if self.tempFolder is not None:
+            shutil.rmtree(self.tempFolder, ignore_errors=True)
+            self.tempFolder = None
+        self.buffer = []
+
+    def _spill(self):
+        if self.tempFolder is None:
+            self.tempFolder = tempfile.mkdtemp(prefix=".snapshot-", dir=Path(self.path).parent)
+        self.buffer.sort(key=_dataID)
+        runPath = os.path.join(self.tempFolder, f"run-{len(self.runs):05d}.ndjson")
+        with open(runPath, "wb", buffering=BUFFER_SIZE) as file:
+            for ad in self.buffer:
+                file.write(encodeJSON(ad) + b"\n")
+        self.runs.append(runPath)
+        self.buffer = []
+
+
+def writeSnapshot(path, ads, **options):
+    """
+    Write ads as snapshot sorted by data-id (see SortedSnapshotWriter), return number of ads.
+    """
+    with SortedSnapshotWriter(path, **options) as writer:
+        return writer.writeMany(ads)
+
+
+def readSnapshot(path):
+    """
+    Yield ads of an NDJSON snapshot, one line at a time.
+    """
+    with open(path, "rb", buffering=BUFFER_SIZE) as file:
+        for line in file:
+            if line.strip():
+                yield decodeJSON(line)
+
+
+def changeFeed(previous, current):
+    """
+    Merge-join two crawls sorted by data-id and yield changes from previous to current one. Only one ad of each crawl is
+    held at a time, so crawls of any size are compared in constant memory.
+
+    Params
+    ------
+    previous : iterable
+        Ads of previous crawl, sorted by data-id (e.g. `readSnapshot(path)`).
+    current : iterable
+        Ads of current crawl, sorted by data-id.
+
+    Returns
+    -------
+    events : generator
+        Dictionnaries with following keys :
+            <event> str : ADDED, REMOVED, RENT_CHANGED or IMAGES_CHANGED (an ad can give both last ones).
+            <data-id> int : ID of ad.
+            <before> : Previous rent or images (changes only).
+            <after> : Current rent or images (changes only).
+            <ad> dict : Current ad (previous one for REMOVED).
+    """
+    previous = _ordered(previous, "previous")
+    current = _ordered(current, "current")
+    old = next(previous, None)
+    new = next(current, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old["data-id"] < new["data-id"]):
+            yield {"event": REMOVED, "data-id": old["data-id"], "ad": old}
+            old = next(previous, None)
+        elif old is None or new["data-id"] < old["data-id"]:
+            yield {"event": ADDED, "data-id": new["data-id"], "ad": new}
+            new = next(current, None)
+        else:
+            for event, key in ((RENT_CHANGED, "rent"), (IMAGES_CHANGED, "images")):
+                if old.get(key) != new.get(key):
+                    yield {"event": event, "data-id": new["data-id"], "before": old.get(key), "after": new.get(key), "ad": new}
+            old = next(previous, None)
+            new = next(current, None)
+
+
+def snapshotChanges(previousPath, currentPath):
+    """
+    Yield changes between two snapshot files (see `changeFeed()`).
+    """
+    return changeFeed(readSnapshot(previousPath), readSnapshot(currentPath))
+
+
+# === HELPER FUNCTIONS === #
+def _dataID(ad):
+    return ad["data-id"]
+
+
+def _ordered(ads, name):
+    """
+    Yield ads checking they're sorted by data-id, repeated data-id are skipped (first one is kept).
+    """
+    lastID = None
+    for ad in ads:
+        dataID = ad.get("data-id")
+        if dataID is None:
+            continue
+        if lastID is not None:
+            if dataID == lastID:
+                continue
+            if dataID < lastID:
+                raise ValueError(f"Ads of {name} crawl aren't sorted by data-id ({dataID} after {lastID})")
+        lastID = dataID
+        yield ad
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print changes between two crawl snapshots as NDJSON.")
+    parser.add_argument("previous", help="Snapshot of previous crawl")
+    parser.add_argument("current", help="Snapshot of current crawl")
+    args = parser.parse_args()
+    for change in snapshotChanges(args.previous, args.current):
+        sys.stdout.buffer.write(encodeJSON(change) + b"\n")
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import time
+from FlatHunter.utils.sqlite_utils import ProcessLocalSQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    dataID INTEGER PRIMARY KEY,
+    url TEXT,
+    etag TEXT,
+    lastModified TEXT,
+    contentHash TEXT,
+    extractorVersion TEXT,
+    record TEXT,
+    checkedAt REAL
+);
+"""
+
+
+class ChangeTracker(ProcessLocalSQLite):
+    def __init__(self, path):
+        """
+        SQLite store of last seen version of each item's page (validators, content hash and extracted record) by `data-id`,
+        used to send conditional requests and to skip parsing of pages that didn't change. Safe to use from several
+        threads and worker processes of one machine (see ProcessLocalSQLite).
+
+        Params
+        ------
+        path : str
+            Path of SQLite database, created if needed.
+        """
+        self.path = str(path)
+        self._initConnection()
+        with self.lock:
+            self._getConnection().executescript(SCHEMA)
+
+    @staticmethod
+    def contentHash(content):
+        """
+        Fast hash of raw page content.
+        """
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def get(self, dataID):
+        """
+        Return last seen version of item's page as a dictionnary (`url`, `etag`, `lastModified`, `contentHash`,
+        `extractorVersion`, `record` keys), None if item was never seen.
+        """
+        with self.lock:
+            row = self._getConnection().execute(
+                "SELECT url, etag, lastModified, contentHash, extractorVersion, record FROM pages WHERE dataID = ?", (dataID,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "url": row[0],
+            "etag": row[1],
+            "lastModified": row[2],
+            "contentHash": row[3],
+            "extractorVersion": row[4],
+            "record": json.loads(row[5]),
+        }
+
+    @staticmethod
+    def conditionalHeaders(state):
+        """
+        Return conditional request headers (If-None-Match / If-Modified-Since) for last seen version of a page.
+        """
+        headers = {}
+        if state is None:
+            return headers
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["lastModified"]:
+            headers["If-Modified-Since"] = state["lastModified"]
+        return headers
+
+    def update(self, dataID, url, etag, lastModified, contentHash, extractorVersion, record):
+        """
+        Save new version of item's page along with record extracted from it.
+        """
+        with self.lock, self._getConnection():
+            self._getConnection().execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (dataID, url, etag, lastModified, contentHash, extractorVersion, json.dumps(record, ensure_ascii=False), time.time()),
+            )
+
+    def touch(self, dataID, etag=None, lastModified=None):
+        """
+        Mark page as checked (unchanged), refreshing validators sent by server if any.
+        """
+        with self.lock, self._getConnection():
+            self._getConnection().execute(
+                "UPDATE pages SET etag = COALESCE(?, etag), lastModified = COALESCE(?, lastModified), checkedAt = ? WHERE dataID = ?",
+                (etag, lastModified, time.time(), dataID),
+            )
+
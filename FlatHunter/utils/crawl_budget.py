@@ -0,0 +1,79 @@
+import time
+
+# Priorities of item's pages fetching (and ranking scores), computed from card records : lowest value comes first
+DETAIL_PRIORITIES = {
+    "rentPerM2": lambda record: record["rent"] / record["size"] if record["size"] else float("inf"),
+    "rentPerRoom": lambda record: record["rent"] / record["rooms"] if record["rooms"] else float("inf"),
+    "rent": lambda record: record["rent"],
+    "size": lambda record: -record["size"],
+    # Website gives increasing data-id to new listings, so most recent listings come first
+    "recency": lambda record: -record["data-id"],
+}
+
+
+def getPriority(priority):
+    """
+    Return priority function of name (see `DETAIL_PRIORITIES`), callables are returned as is.
+    """
+    if callable(priority):
+        return priority
+    try:
+        return DETAIL_PRIORITIES[priority]
+    except KeyError:
+        raise ValueError(f"Unknown priority '{priority}', expected one of {list(DETAIL_PRIORITIES)} or a callable")
+
+
+class CrawlBudget:
+    def __init__(self, deadline=None, maxRequests=None):
+        """
+        Time and request budget of a crawl.
+
+        Params
+        ------
+        deadline : float
+            Wall-clock time (s) allowed from now, unlimited if None.
+        maxRequests : int
+            Number of requests allowed, unlimited if None.
+        """
+        self.deadline = None if deadline is None else time.monotonic() + deadline
+        self.maxRequests = maxRequests
+        # Why budget ran out ("deadline" or "maxRequests"), None while it's not exhausted
+        self.reason = None
+
+    def exhausted(self, requests):
+        """
+        True if budget doesn't allow another request, `requests` being number of requests already made.
+        """
+        if self.maxRequests is not None and requests >= self.maxRequests:
+            self.reason = "maxRequests"
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "deadline"
+        return self.reason is not None
+
+    def remaining(self):
+        """
+        Time (s) left before deadline, None if there's no deadline.
+        """
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+
+class CrawlResult(list):
+    def __init__(self, ads=(), partial=False, reason=None, missingDetails=None):
+        """
+        List of ads returned by a budgeted crawl, flagged when budget ran out before crawl was complete.
+
+        Params
+        ------
+        ads : iterable
+            Returned ads.
+        partial : bool
+            True if some search pages or item's pages were not fetched.
+        reason : str
+            Exhausted budget ("deadline" or "maxRequests"), None if crawl is complete.
+        missingDetails : list
+            data-id of returned ads whose item's page wasn't fetched (their item's page fields are defaults).
+        """
+        super().__init__(ads)
+        self.partial = partial
+        self.reason = reason
+        self.missingDetails = missingDetails or []
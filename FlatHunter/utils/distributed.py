@@ -0,0 +1,239 @@
+"""
+Distributed crawl : a coordinator enqueues searches of a new crawl in a shared work queue, then workers pull search pages
+and item's pages from it and write matching ads back as results of that crawl, keyed by data-id. Each coordinator run
+is a new crawl, so the same jobs can be crawled again (e.g. hourly) on the same queue. Queue and per-host rate budget
+live either :
+    - on a Redis server (queue given as a Redis URL) : coordinator and workers can run on any number of machines.
+    - in SQLite files in WAL mode (queue given as a folder) : coordinator and workers must run on one machine, with queue's
+      folder on a local filesystem (not a network mount).
+Usage :
+    python -m FlatHunter.utils.distributed coordinator <queue> <jobsFile> [--timeout S]
+    python -m FlatHunter.utils.distributed worker <queue> [--workers N] [--rate R] [--idle-timeout S]
+where queue is a folder or a Redis URL (e.g. redis://queue-host:6379/0) and jobsFile is a JSON list of jobs (see
+`FlatHunter.utils.scheduler.runJob()`).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import time
+from collections import Counter
+from pathlib import Path
+from FlatHunter.modules.ImmoCH import ImmoCH, extractItemPage, extractSearchPage
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.rate_limiter import RedisRateLimiter, SQLiteRateLimiter
+from FlatHunter.utils.redis_utils import isRedisURL
+from FlatHunter.utils.work_queue import RedisWorkQueue, WorkQueue
+
+QUEUE_FILENAME = "queue.sqlite"
+RATE_FILENAME = "rate.sqlite"
+
+
+def openQueue(queueLocation, **kwargs):
+    """
+    Open work queue of a Redis URL (RedisWorkQueue) or of a folder (WorkQueue, folder is created if needed), kwargs are
+    passed to queue.
+    """
+    if isRedisURL(queueLocation):
+        return RedisWorkQueue(queueLocation, **kwargs)
+    Path(queueLocation).mkdir(parents=True, exist_ok=True)
+    return WorkQueue(Path(queueLocation) / QUEUE_FILENAME, **kwargs)
+
+
+def openRateLimiter(queueLocation, requestsPerSecond=2.0):
+    """
+    Open per-host rate budget shared by workers of queue (on same Redis server or in same folder).
+    """
+    if isRedisURL(queueLocation):
+        return RedisRateLimiter(queueLocation, requestsPerSecond)
+    Path(queueLocation).mkdir(parents=True, exist_ok=True)
+    return SQLiteRateLimiter(Path(queueLocation) / RATE_FILENAME, requestsPerSecond)
+
+
+def enqueueJobs(queue, jobs, siteClass=ImmoCH):
+    """
+    Coordinator : start a new crawl and enqueue first search page of each job. Workers enqueue other pages and item's
+    pages of matching cards in the same crawl.
+
+    Returns
+    -------
+    crawlID : int
+        ID of crawl (see `waitForResults()`). Jobs with the same search are enqueued once.
+    """
+    crawlID = queue.startCrawl()
+    added = 0
+    for job in jobs:
+        baseURL, params = siteClass(job["category"], region=job["region"]).getSearchURL()
+        added += queue.put("search", f"{baseURL}page-1{params}", {"job": job, "page": 1}, crawlID)
+    logger.info(f"Enqueued {added} jobs in crawl {crawlID}")
+    return crawlID
+
+
+def waitForResults(queue, crawlID, pollInterval=1.0, timeout=None):
+    """
+    Coordinator : wait until crawl's tasks are all processed (or timeout is reached) and return ads it collected.
+    """
+    start = time.monotonic()
+    while not queue.isDrained(crawlID):
+        if timeout is not None and time.monotonic() - start > timeout:
+            logger.warning(f"Crawl {crawlID} not drained after {timeout}s : {queue.counts(crawlID)}")
+            break
+        time.sleep(pollInterval)
+    return queue.getResults(crawlID)
+
+
+class CrawlWorker:
+    def __init__(self, queue, name=None, rateLimiter=None, siteClass=ImmoCH, siteOptions=None):
+        """
+        Worker pulling tasks from a work queue :
+            "search" task : fetch search page, enqueue other pages (from first page) and item's pages of matching cards.
+            "item" task : fetch item's page and store complete ad as result.
+
+        Params
+        ------
+        queue : WorkQueue
+            Shared queue.
+        name : str
+            Worker name used for leases, defaults to "<host>-<pid>".
+        rateLimiter : RateLimiter, SQLiteRateLimiter or RedisRateLimiter
+            Per-host budget shared with other workers.
+        siteClass : type
+            Site class crawled.
+        siteOptions : dict
+            Extra keyword arguments of site class.
+        """
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.rateLimiter = rateLimiter
+        self.siteClass = siteClass
+        self.siteOptions = siteOptions or {}
+        self.sites = {}
+        self.stats = Counter()
+
+    def run(self, idleTimeout=None, pollInterval=0.2):
+        """
+        Process tasks until no task was available for `idleTimeout` seconds (forever if None).
+
+        Returns
+        -------
+        stats : dict
+            Counters of worker (tasks, failures and sites counters).
+        """
+        idleSince = time.monotonic()
+        while True:
+            task = self.queue.lease(self.name)
+            if task is None:
+                if idleTimeout is not None and time.monotonic() - idleSince > idleTimeout:
+                    break
+                time.sleep(pollInterval)
+                continue
+            try:
+                self.processTask(task)
+            except Exception as e:
+                self.stats["failures"] += 1
+                retried = self.queue.fail(task["taskID"], self.name, repr(e))
+                if not retried and task["kind"] == "item":
+                    # Item's page unreachable, ad is kept with item's page fields set to defaults
+                    self._putItem(task, {})
+            else:
+                self.queue.complete(task["taskID"], self.name)
+                self.stats[f"{task['kind']}Tasks"] += 1
+            idleSince = time.monotonic()
+        logger.info(f"Worker {self.name} stopped : {dict(self.stats)}")
+        return dict(self.stats)
+
+    def processTask(self, task):
+        """
+        Process a leased task, raise an exception if it failed.
+        """
+        site = self._getSite(task["payload"]["job"])
+        site.resetRun()
+        try:
+            content = site.getPageContent(task["url"])
+        finally:
+            self.stats.update(site.stats)
+        if content is None:
+            raise RuntimeError(f"Couldn't get page '{task['url']}'")
+        if task["kind"] == "search":
+            self._processSearchPage(task, site, content)
+        else:
+            self._putItem(task, extractItemPage(content, itemCategory=site.itemCategory, fastPath=site.fastPath))
+
+    # === HELPER FUNCTIONS === #
+    def _getSite(self, job):
+        key = (job["region"], job["category"])
+        if key not in self.sites:
+            self.sites[key] = self.siteClass(
+                job["category"], region=job["region"], rateLimiter=self.rateLimiter, **self.siteOptions
+            )
+        return self.sites[key]
+
+    def _processSearchPage(self, task, site, content):
+        job = task["payload"]["job"]
+        firstPage = task["payload"]["page"] == 1
+        page = extractSearchPage(content, itemCategory=site.itemCategory, countPages=firstPage)
+        if firstPage:
+            baseURL, params = site.getSearchURL()
+            numberOfPages = job.get("pagesToSearch") or page["numberOfPages"] or 1
+            for pageNb in range(2, numberOfPages + 1):
+                self.queue.put("search", f"{baseURL}page-{pageNb}{params}", {"job": job, "page": pageNb}, task["crawlID"])
+        # Item's pages are tasks keyed by URL : an ad listed on several pages (or by several jobs) is fetched once per crawl
+        for record in page["ads"]:
+            if record["link"] != None and site._isMatch(record, job["filter"]):
+                self.queue.put("item", record["link"], {"job": job, "record": record}, task["crawlID"])
+
+    def _putItem(self, task, itemRecord):
+        job = task["payload"]["job"]
+        site = self._getSite(job)
+        record = task["payload"]["record"]
+        record.update({key: value for key, value in site.extractionPlan.defaults().items() if key not in record})
+        record.update(itemRecord)
+        result = {**site._formatAd(record), "region": job["region"], "category": job["category"]}
+        self.queue.putResult(record["data-id"], result, task["taskID"], task["crawlID"])
+
+
+def _runWorker(queueLocation, requestsPerSecond, idleTimeout, siteClass, siteOptions):
+    queue = openQueue(queueLocation)
+    rateLimiter = openRateLimiter(queueLocation, requestsPerSecond)
+    return CrawlWorker(queue, rateLimiter=rateLimiter, siteClass=siteClass, siteOptions=siteOptions).run(idleTimeout)
+
+
+def runWorkers(queueLocation, workers=1, requestsPerSecond=2.0, idleTimeout=None, siteClass=ImmoCH, siteOptions=None):
+    """
+    Start `workers` worker processes on queue (folder or Redis URL) and wait for them. All workers of the same queue (on
+    this machine for a folder, on any machine for a Redis URL) share one per-host rate budget.
+    """
+    processes = [
+        multiprocessing.Process(
+            target=_runWorker, args=(str(queueLocation), requestsPerSecond, idleTimeout, siteClass, siteOptions or {})
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed crawl through a shared work queue.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    coordinatorParser = subparsers.add_parser("coordinator", help="Enqueue jobs and collect results")
+    coordinatorParser.add_argument("queue", help="Queue folder or Redis URL (shared by workers)")
+    coordinatorParser.add_argument("jobs", help="JSON file with list of jobs")
+    coordinatorParser.add_argument("--timeout", type=float, default=None, help="Stop waiting after this delay (s)")
+    workerParser = subparsers.add_parser("worker", help="Process tasks of queue")
+    workerParser.add_argument("queue", help="Queue folder or Redis URL (shared by coordinator)")
+    workerParser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    workerParser.add_argument("--rate", type=float, default=2.0, help="Requests per second per host, for all workers")
+    workerParser.add_argument("--idle-timeout", type=float, default=None, help="Stop after this delay (s) without task")
+    args = parser.parse_args()
+    if args.mode == "coordinator":
+        workQueue = openQueue(args.queue)
+        with open(args.jobs) as f:
+            crawlID = enqueueJobs(workQueue, json.load(f))
+        print(json.dumps(waitForResults(workQueue, crawlID, timeout=args.timeout), indent=4, ensure_ascii=False))
+    else:
+        runWorkers(args.queue, args.workers, args.rate, args.idle_timeout)
@@ -0,0 +1,110 @@
+import html
+import json
+import re
+from FlatHunter.utils.logging_utils import logger
+
+# Byte-level patterns, compiled once
+LD_JSON_PATTERN = re.compile(rb"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script\s*>", re.S | re.I)
+DIV_OR_IMG_PATTERN = re.compile(rb"<div\b|</div\s*>|<img\b[^>]*>", re.I)
+ATTRIBUTE_PATTERN = re.compile(rb"([\w:-]+)\s*=\s*(?:\"([^\"]*)\"|'([^']*)')")
+
+
+def scanJsonLD(content):
+    """
+    Find and decode all `application/ld+json` blocks of a page without building its DOM.
+
+    Params
+    ------
+    content : bytes
+        Raw page content.
+
+    Returns
+    -------
+    objects : list
+        Decoded JSON objects (HTML entities in strings are unescaped). Malformed blocks are skipped.
+    """
+    objects = []
+    for match in LD_JSON_PATTERN.finditer(content):
+        try:
+            obj = json.loads(match.group(1).decode("utf-8", errors="replace"))
+        except ValueError as e:
+            logger.debug(f"Skipped malformed ld+json block : {e}")
+            continue
+        objects.append(_unescape(obj))
+    return objects
+
+
+def scanAttribute(content, name):
+    """
+    Return value of first attribute `name` found in page, None if absent.
+    """
+    match = re.search(rb"\b" + re.escape(name.encode()) + rb"\s*=\s*\"([^\"]*)\"", content)
+    if match is None:
+        return None
+    return html.unescape(match.group(1).decode("utf-8", errors="replace"))
+
+
+def scanImages(content, className, keyAttr, valueAttr):
+    """
+    Collect `img` tags of first `div` having class `className` by scanning bytes (div nesting is tracked to find where it closes).
+
+    Params
+    ------
+    content : bytes
+        Raw page content.
+    className : str
+        Class of container `div` (e.g. `im__banner__slider`).
+    keyAttr : str
+        Image attribute used as dict key (e.g. `alt`).
+    valueAttr : str
+        Image attribute used as dict value (e.g. `data-lazy`).
+
+    Returns
+    -------
+    images : dict
+        Dictionnary of images, None if container was not found.
+    """
+    start = re.search(
+        rb"<div\b[^>]*\bclass=\"(?:[^\"]*\s)?" + re.escape(className.encode()) + rb"(?:\s[^\"]*)?\"[^>]*>", content
+    )
+    if start is None:
+        return None
+    images = {}
+    depth = 1
+    for match in DIV_OR_IMG_PATTERN.finditer(content, start.end()):
+        token = match.group()
+        if token[:4].lower() == b"<img":
+            attrs = parseAttributes(token)
+            if keyAttr in attrs and valueAttr in attrs:
+                images[attrs[keyAttr]] = attrs[valueAttr]
+        elif token[:2] == b"</":
+            depth -= 1
+            if depth == 0:
+                break
+        else:
+            depth += 1
+    return images
+
+
+def parseAttributes(tag):
+    """
+    Parse quoted attributes of a raw start tag into a dictionnary (values are unescaped like `html.parser` does).
+    """
+    attrs = {}
+    for match in ATTRIBUTE_PATTERN.finditer(tag):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        attrs[match.group(1).decode().lower()] = html.unescape(value.decode("utf-8", errors="replace"))
+    return attrs
+
+
+def _unescape(obj):
+    """
+    Recursively unescape HTML entities in strings of decoded JSON.
+    """
+    if isinstance(obj, str):
+        return html.unescape(obj)
+    if isinstance(obj, list):
+        return [_unescape(value) for value in obj]
+    if isinstance(obj, dict):
+        return {key: _unescape(value) for key, value in obj.items()}
+    return obj
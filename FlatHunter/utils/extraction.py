@@ -0,0 +1,183 @@
+import re
+from FlatHunter.utils.logging_utils import logger
+
+
+class ExtractionPlan:
+    def __init__(self, fieldSpecs):
+        """
+        Compile a declarative field specification into an extraction plan. Regexes and lookup tables are built once here,
+        then `run()` extracts every field of an ad in a single pass over each soup.
+
+        Params
+        ------
+        fieldSpecs : dict
+            Dictionnary with field names as keys and spec dictionnaries as values, with keys :
+                <source> str : Key of the ad dictionnary holding the soup to search in (e.g. `ad-content-soup`)
+                <selector> str : Class name of the element holding the value, None to read the source tag itself
+                <tag> str : Tag name of the element holding the value, used instead of `selector` (optional)
+                <nth> int : Position (from 0) of the element among descendants with same tag name (optional, 0 by default)
+                <attr> str : Attribute to read instead of element's text (optional)
+                <strip> str : Characters removed from raw text before matching (optional)
+                <regex> str : Pattern, the first match is passed to `type` (optional)
+                <type> callable : Cast applied to extracted text (e.g. int, float)
+                <collect> tuple : (tag, keyAttr, valueAttr) build a dict from child tags instead of a single value (optional)
+                <default> any : Value returned when extraction fails
+        """
+        self.fieldSpecs = fieldSpecs
+        # Compiled specs grouped by source soup, each with a class name -> field names index
+        self.sources = {}
+        for name, spec in fieldSpecs.items():
+            compiled = {
+                "name": name,
+                "selector": spec.get("selector"),
+                "tag": spec.get("tag"),
+                "nth": spec.get("nth", 0),
+                "attr": spec.get("attr"),
+                "strip": str.maketrans("", "", spec["strip"]) if spec.get("strip") else None,
+                "regex": re.compile(spec["regex"]) if spec.get("regex") else None,
+                "type": spec.get("type", str),
+                "collect": spec.get("collect"),
+                "default": spec.get("default"),
+            }
+            source = self.sources.setdefault(spec["source"], {"rootFields": [], "classIndex": {}, "tagIndex": {}, "fields": []})
+            source["fields"].append(compiled)
+            if compiled["tag"] is not None:
+                source["tagIndex"].setdefault(compiled["tag"], []).append(compiled)
+            elif compiled["selector"] is None:
+                source["rootFields"].append(compiled)
+            else:
+                source["classIndex"].setdefault(compiled["selector"], []).append(compiled)
+
+    @staticmethod
+    def dataKey(source):
+        """
+        Key of the already decoded values which can stand in for a source soup (`ad-page-soup` -> `ad-page-data`).
+        """
+        return source[:-5] + "-data" if source.endswith("-soup") else source + "-data"
+
+    def defaults(self):
+        """
+        Return a dictionnary with default value of every field.
+        """
+        return {name: self._default(spec) for name, spec in self.fieldSpecs.items()}
+
+    def run(self, adData, sources=None):
+        """
+        Extract all fields of an ad.
+
+        Params
+        ------
+        adData : dict
+            Ad dictionnary as returned by `getAds()`, holding source soups (and/or already decoded `-data` dictionnaries).
+        sources : iterable
+            Only extract fields of those sources (e.g. card soups only), all sources if left empty.
+
+        Returns
+        -------
+        values : dict
+            Dictionnary with field names as keys and extracted (or default) values.
+        """
+        values = {}
+        dataID = adData.get("data-id")
+        for sourceKey, source in self.sources.items():
+            if sources is not None and sourceKey not in sources:
+                continue
+            remaining = {}
+            # Values decoded upstream (e.g. from embedded JSON) take precedence over soup walking
+            prefilled = adData.get(self.dataKey(sourceKey))
+            for spec in source["fields"]:
+                if prefilled is not None and spec["name"] in prefilled:
+                    values[spec["name"]] = prefilled[spec["name"]]
+                else:
+                    remaining[spec["name"]] = spec
+            if not remaining:
+                continue
+            soup = adData.get(sourceKey)
+            if soup is None:
+                logger.warning(f"ad['{sourceKey}'] is equal to None ! Couldn't extract {list(remaining)} from item ID {dataID}")
+                for name, spec in remaining.items():
+                    values[name] = self._default(spec)
+                continue
+            # Fields read on source tag itself
+            for spec in source["rootFields"]:
+                if spec["name"] in remaining:
+                    values[spec["name"]] = self._convert(spec, soup, dataID)
+                    del remaining[spec["name"]]
+            # Single walk over descendants, first tag matching a selector wins (same as `find()`)
+            classIndex = source["classIndex"]
+            tagIndex = source["tagIndex"]
+            tagCounts = {}
+            for tag in soup.descendants:
+                if not remaining:
+                    break
+                if tag.name is None:
+                    continue
+                if tag.name in tagIndex:
+                    position = tagCounts.get(tag.name, 0)
+                    tagCounts[tag.name] = position + 1
+                    for spec in tagIndex[tag.name]:
+                        if spec["nth"] == position and spec["name"] in remaining:
+                            values[spec["name"]] = self._convert(spec, tag, dataID)
+                            del remaining[spec["name"]]
+                classes = tag.get("class")
+                if not classes:
+                    continue
+                for className in classes:
+                    for spec in classIndex.get(className, ()):
+                        if spec["name"] in remaining:
+                            values[spec["name"]] = self._convert(spec, tag, dataID)
+                            del remaining[spec["name"]]
+            for name, spec in remaining.items():
+                logger.warning(f"Couldn't find '{spec['tag'] or spec['selector']}' for field '{name}' in item ID {dataID}")
+                values[name] = self._default(spec)
+        return values
+
+    # === HELPER FUNCTIONS === #
+    @staticmethod
+    def _default(spec):
+        """
+        Return a fresh copy of default value (avoid sharing mutable defaults between ads).
+        """
+        default = spec.get("default")
+        return default.copy() if isinstance(default, (dict, list)) else default
+
+    def _convert(self, spec, tag, dataID):
+        """
+        Convert matched tag into field value.
+        """
+        if spec["collect"]:
+            childName, keyAttr, valueAttr = spec["collect"]
+            collected = {}
+            for child in tag.find_all(childName):
+                key = child.get(keyAttr)
+                value = child.get(valueAttr)
+                if key is not None and value is not None:
+                    collected[key] = value
+            logger.debug(f"Extracted {spec['name']} for item with ID {dataID}. Items found : {len(collected)}")
+            return collected
+        raw = tag.get(spec["attr"]) if spec["attr"] else tag.get_text()
+        if raw is None:
+            logger.warning(f"Couldn't extract {spec['name']} from item ID {dataID}")
+            return self._default(spec)
+        if spec["strip"] is not None:
+            raw = raw.translate(spec["strip"])
+        if spec["regex"] is not None:
+            match = spec["regex"].search(raw)
+            if match is None:
+                logger.warning(f"Couldn't extract {spec['name']} from item ID {dataID}")
+                return self._default(spec)
+            raw = match.group()
+        try:
+            value = spec["type"](raw)
+        except ValueError:
+            logger.warning(f"Couldn't convert {spec['name']} of item ID {dataID} : '{raw}'")
+            return self._default(spec)
+        logger.debug(f"Extracted {spec['name']} for item with ID {dataID}. Item {spec['name']} : {value}")
+        return value
+
+
+def cleanText(text):
+    """
+    Collapse whitespace of extracted text (usable as a spec `type`).
+    """
+    return " ".join(text.split())
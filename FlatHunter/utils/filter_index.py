@@ -0,0 +1,185 @@
+import bisect
+import math
+from FlatHunter.utils.geo_index import AREA_KEYS, hasArea, matchesArea
+from FlatHunter.utils.logging_utils import logger
+
+# Ranged fields of filters : filter keys are "min<Field>" and "max<Field>" (e.g. "minRent"), missing bounds are open
+FILTER_FIELDS = ("rent", "rooms", "size")
+
+
+class IntervalNode:
+    __slots__ = ("center", "lows", "lowKeys", "highs", "highKeys", "left", "right")
+
+    def __init__(self, center, intervals, left, right):
+        """
+        Node of centered interval tree, holding intervals containing its center sorted by low and by high bound.
+        """
+        self.center = center
+        byLow = sorted(intervals, key=lambda interval: interval[0])
+        byHigh = sorted(intervals, key=lambda interval: interval[1])
+        self.lows = [interval[0] for interval in byLow]
+        self.lowKeys = [interval[2] for interval in byLow]
+        self.highs = [interval[1] for interval in byHigh]
+        self.highKeys = [interval[2] for interval in byHigh]
+        self.left = left
+        self.right = right
+
+
+class IntervalTree:
+    def __init__(self, intervals):
+        """
+        Static centered interval tree : `stab(x)` returns keys of all intervals containing x in O(log n + k).
+
+        Params
+        ------
+        intervals : list
+            (low, high, key) tuples, bounds included.
+        """
+        self.root = self._build(intervals)
+        # Sorted bounds of all intervals, to count intervals containing a value in O(log n)
+        self.lows = sorted(interval[0] for interval in intervals)
+        self.highs = sorted(interval[1] for interval in intervals)
+
+    def stab(self, x):
+        """
+        Return keys of intervals containing x.
+        """
+        keys = []
+        node = self.root
+        while node is not None:
+            if x < node.center:
+                # Node's intervals contain center, so they contain x if they start before it
+                keys.extend(node.lowKeys[:bisect.bisect_right(node.lows, x)])
+                node = node.left
+            elif x > node.center:
+                keys.extend(node.highKeys[bisect.bisect_left(node.highs, x):])
+                node = node.right
+            else:
+                keys.extend(node.lowKeys)
+                break
+        return keys
+
+    def count(self, x):
+        """
+        Return number of intervals containing x (intervals ending before x also start before it).
+        """
+        return bisect.bisect_right(self.lows, x) - bisect.bisect_left(self.highs, x)
+
+    # === HELPER FUNCTIONS === #
+    @classmethod
+    def _build(cls, intervals):
+        if not intervals:
+            return None
+        endpoints = sorted(bound for interval in intervals for bound in interval[:2] if math.isfinite(bound))
+        center = endpoints[len(endpoints) // 2] if endpoints else 0
+        left, right, overlapping = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                overlapping.append(interval)
+        return IntervalNode(center, overlapping, cls._build(left), cls._build(right))
+
+
+class FilterIndex:
+    def __init__(self):
+        """
+        Index of many subscribers' filters (dictionnaries of `getItems()`), matching an ad against all of them at once.
+        Each ranged field has an interval tree of filters' ranges : an ad is looked up in the tree of its most selective
+        field (fewest containing ranges, counted in O(log n)) and only those candidates are checked on other fields.
+        Index is rebuilt lazily after filters are added or removed.
+        """
+        # subscriberID -> bounds {field: (low, high)}
+        self.filters = {}
+        # subscriberID -> geographic keys of filter (only for filters having some), checked after ranges
+        self.areas = {}
+        self.trees = None
+
+    def __len__(self):
+        return len(self.filters)
+
+    def add(self, subscriberID, filter):
+        """
+        Register (or replace) filter of subscriber.
+        """
+        self.filters[subscriberID] = {
+            field: (
+                filter.get(f"min{field.capitalize()}", -math.inf),
+                filter.get(f"max{field.capitalize()}", math.inf),
+            )
+            for field in FILTER_FIELDS
+        }
+        if hasArea(filter):
+            self.areas[subscriberID] = {key: filter[key] for key in AREA_KEYS if key in filter}
+        else:
+            self.areas.pop(subscriberID, None)
+        self.trees = None
+
+    def remove(self, subscriberID):
+        """
+        Unregister filter of subscriber.
+        """
+        del self.filters[subscriberID]
+        self.areas.pop(subscriberID, None)
+        self.trees = None
+
+    def match(self, ad):
+        """
+        Return IDs of subscribers whose filter matches ad.
+
+        Params
+        ------
+        ad : dict
+            Ad (or card record) with rent, rooms and size keys (and latlng one for filters with geographic keys).
+        """
+        if self.trees is None:
+            self._build()
+        if not self.filters:
+            return []
+        rent, rooms, size = ad["rent"], ad["rooms"], ad["size"]
+        count, bestField = min((self.trees[field].count(ad[field]), field) for field in FILTER_FIELDS)
+        if count == 0:
+            return []
+        # Candidates are (subscriberID, rent bounds, rooms bounds, size bounds) rows, checked on all fields at once
+        matches = [
+            row[0]
+            for row in self.trees[bestField].stab(ad[bestField])
+            if row[1] <= rent <= row[2] and row[3] <= rooms <= row[4] and row[5] <= size <= row[6]
+        ]
+        if self.areas:
+            latlng = ad.get("latlng")
+            areas = self.areas
+            matches = [
+                subscriberID
+                for subscriberID in matches
+                if subscriberID not in areas or matchesArea(latlng, areas[subscriberID])
+            ]
+        return matches
+
+    def matchAll(self, ads):
+        """
+        Match ads against all filters.
+
+        Returns
+        -------
+        results : dict
+            Subscriber ID as key and list of its matching ads as value (every subscriber is a key).
+        """
+        results = {subscriberID: [] for subscriberID in self.filters}
+        for ad in ads:
+            for subscriberID in self.match(ad):
+                results[subscriberID].append(ad)
+        return results
+
+    # === HELPER FUNCTIONS === #
+    def _build(self):
+        rows = [
+            (subscriberID, *bounds["rent"], *bounds["rooms"], *bounds["size"]) for subscriberID, bounds in self.filters.items()
+        ]
+        self.trees = {
+            field: IntervalTree([(row[1 + 2 * position], row[2 + 2 * position], row) for row in rows])
+            for position, field in enumerate(FILTER_FIELDS)
+        }
+        logger.debug(f"Built filter index of {len(self.filters)} filters")
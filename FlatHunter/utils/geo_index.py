@@ -0,0 +1,239 @@
+import math
+from FlatHunter.utils.logging_utils import logger
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+# Geographic filter keys, see `matchesArea()`
+AREA_KEYS = ("radius", "bbox", "polygon")
+
+
+def parseLatLng(text):
+    """
+    Parse "lat,lng" text (e.g. `data-latlng` attribute) into [lat, lng] floats.
+    """
+    lat, lng = text.split(",")
+    return [float(lat), float(lng)]
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """
+    Return great-circle distance (km) between two points.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def inPolygon(lat, lng, polygon):
+    """
+    Ray casting test of point in polygon ([[lat, lng], ...], implicitly closed).
+    """
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        latI, lngI = polygon[i]
+        latJ, lngJ = polygon[j]
+        if (latI > lat) != (latJ > lat) and lng < (lngJ - lngI) * (lat - latI) / (latJ - latI) + lngI:
+            inside = not inside
+        j = i
+    return inside
+
+
+def hasArea(filter):
+    """
+    True if filter has a geographic key.
+    """
+    return any(key in filter for key in AREA_KEYS)
+
+
+def matchesArea(latlng, filter):
+    """
+    Check ad's coordinates against geographic keys of filter dict (all given keys must match) :
+        <radius> dict : {"center": [lat, lng], "km": float}, ads within `km` of center
+        <bbox> list : [minLat, minLng, maxLat, maxLng]
+        <polygon> list : [[lat, lng], ...] vertices of area
+    Ads without coordinates only match filters without geographic key.
+    """
+    if not hasArea(filter):
+        return True
+    if not latlng:
+        return False
+    lat, lng = latlng
+    if "radius" in filter:
+        center = filter["radius"]["center"]
+        if haversine(lat, lng, center[0], center[1]) > filter["radius"]["km"]:
+            return False
+    if "bbox" in filter:
+        minLat, minLng, maxLat, maxLng = filter["bbox"]
+        if not (minLat <= lat <= maxLat and minLng <= lng <= maxLng):
+            return False
+    if "polygon" in filter and not inPolygon(lat, lng, filter["polygon"]):
+        return False
+    return True
+
+
+class GeoIndex:
+    def __init__(self, cellDegrees=0.01):
+        """
+        Grid index of ads' coordinates, updated incrementally (ads are added, moved or removed one by one). Queries only
+        visit grid cells overlapping queried area, then check exact geometry on their points.
+
+        Params
+        ------
+        cellDegrees : float
+            Size of grid cells in degrees (0.01 is about 1.1 km of latitude).
+        """
+        self.cellDegrees = cellDegrees
+        # (row, column) -> {dataID: (lat, lng)}
+        self.cells = {}
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, dataID):
+        return dataID in self.positions
+
+    def add(self, dataID, lat, lng):
+        """
+        Add ad, or move it if it's already indexed.
+        """
+        if dataID in self.positions:
+            if self.positions[dataID] == (lat, lng):
+                return
+            self.remove(dataID)
+        self.positions[dataID] = (lat, lng)
+        self.cells.setdefault(self._cell(lat, lng), {})[dataID] = (lat, lng)
+
+    def remove(self, dataID):
+        """
+        Remove ad (ignored if it's not indexed).
+        """
+        position = self.positions.pop(dataID, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        del self.cells[cell][dataID]
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def retain(self, dataIDs):
+        """
+        Remove ads whose data-id isn't in `dataIDs` (e.g. ads no longer listed), return number of ads removed.
+        """
+        removed = [dataID for dataID in self.positions if dataID not in dataIDs]
+        for dataID in removed:
+            self.remove(dataID)
+        return len(removed)
+
+    def addRecords(self, records):
+        """
+        Index ad records with `data-id` and `latlng` keys (records without coordinates are skipped).
+
+        Returns
+        -------
+        added : int
+            Number of records indexed.
+        """
+        added = 0
+        for record in records:
+            latlng = record.get("latlng")
+            if latlng:
+                self.add(record["data-id"], latlng[0], latlng[1])
+                added += 1
+        return added
+
+    def radius(self, lat, lng, km):
+        """
+        Return data-id of ads within `km` of point, closest first.
+        """
+        deltaLat = km / KM_PER_DEGREE
+        deltaLng = km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        found = []
+        for dataID, (pointLat, pointLng) in self._candidates(lat - deltaLat, lng - deltaLng, lat + deltaLat, lng + deltaLng):
+            distance = haversine(lat, lng, pointLat, pointLng)
+            if distance <= km:
+                found.append((distance, dataID))
+        found.sort(key=lambda item: item[0])
+        return [dataID for _, dataID in found]
+
+    def bbox(self, minLat, minLng, maxLat, maxLng):
+        """
+        Return data-id of ads inside bounding box.
+        """
+        return [
+            dataID
+            for dataID, (lat, lng) in self._candidates(minLat, minLng, maxLat, maxLng)
+            if minLat <= lat <= maxLat and minLng <= lng <= maxLng
+        ]
+
+    def polygon(self, vertices):
+        """
+        Return data-id of ads inside polygon ([[lat, lng], ...]).
+        """
+        lats = [vertex[0] for vertex in vertices]
+        lngs = [vertex[1] for vertex in vertices]
+        return [
+            dataID
+            for dataID, (lat, lng) in self._candidates(min(lats), min(lngs), max(lats), max(lngs))
+            if inPolygon(lat, lng, vertices)
+        ]
+
+    def query(self, filter):
+        """
+        Return data-id of ads matching all geographic keys of filter dict (see `matchesArea()`), None if filter has none.
+        """
+        if not hasArea(filter):
+            return None
+        if "radius" in filter:
+            center = filter["radius"]["center"]
+            found = self.radius(center[0], center[1], filter["radius"]["km"])
+        elif "bbox" in filter:
+            found = self.bbox(*filter["bbox"])
+        else:
+            found = self.polygon(filter["polygon"])
+        # Most selective key gave candidates, other keys are checked on them
+        return [dataID for dataID in found if matchesArea(self.positions[dataID], filter)]
+
+    # === HELPER FUNCTIONS === #
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cellDegrees), math.floor(lng / self.cellDegrees))
+
+    def _candidates(self, minLat, minLng, maxLat, maxLng):
+        """
+        Yield (dataID, (lat, lng)) of cells overlapping box. Occupied cells are scanned instead when box covers more cells
+        than there are occupied ones.
+        """
+        minRow, minColumn = self._cell(minLat, minLng)
+        maxRow, maxColumn = self._cell(maxLat, maxLng)
+        if (maxRow - minRow + 1) * (maxColumn - minColumn + 1) > len(self.cells):
+            cells = (
+                points
+                for (row, column), points in self.cells.items()
+                if minRow <= row <= maxRow and minColumn <= column <= maxColumn
+            )
+        else:
+            cells = (
+                self.cells[(row, column)]
+                for row in range(minRow, maxRow + 1)
+                for column in range(minColumn, maxColumn + 1)
+                if (row, column) in self.cells
+            )
+        for points in cells:
+            yield from points.items()
+
+    def __repr__(self):
+        return f"GeoIndex({len(self.positions)} ads in {len(self.cells)} cells)"
+
+
+def loadGeoIndex(store, cellDegrees=0.01):
+    """
+    Build GeoIndex of ads of latest finished run of a ResultStore (ads listed by search, as `ResultStore.finishRun()`
+    keeps it), empty if no run finished yet.
+    """
+    index = GeoIndex(cellDegrees)
+    run = store.getLatestRun()
+    if run is not None:
+        index.addRecords(store.getRecords(run["runID"]))
+    logger.info(f"Loaded {index} from result store '{store.path}'")
+    return index
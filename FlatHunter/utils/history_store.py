@@ -0,0 +1,338 @@
+import bisect
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from FlatHunter.utils.logging_utils import logger
+
+# Header of each run block : magic, crawl time (float64), number of events, payload length
+BLOCK_HEADER = struct.Struct("<4sdII")
+BLOCK_MAGIC = b"HST1"
+# Optional header of file naming search it records (see `scope`) : magic, scope length
+SCOPE_HEADER = struct.Struct("<4sI")
+SCOPE_MAGIC = b"HSS1"
+# Event kinds
+DISAPPEARED = 0
+SEEN = 1
+
+
+class ListingHistory:
+    __slots__ = ("runs", "rents", "seen")
+
+    def __init__(self):
+        """
+        Column arrays of one listing's history, one entry per change (first seen, rent change, disappearance,
+        reappearance) : run index, rent at that point and availability.
+        """
+        self.runs = array("l")
+        self.rents = array("l")
+        self.seen = bytearray()
+
+
+class HistoryStore:
+    def __init__(self, path, fsync=False, scope=None):
+        """
+        Append-only history of listings by data-id : rent and availability (seen / disappeared) over crawls. Each crawl
+        appends one block holding only changes since previous crawl, sorted by data-id, with data-ids and rents
+        delta-encoded as varints (a few bytes per change, nothing for unchanged listings). Blocks are replayed in memory
+        into per-listing column arrays when store is opened, so point lookups and range scans don't touch disk.
+
+        Params
+        ------
+        path : str
+            Path of history file, created if needed. A block torn by a crash at end of file is ignored (and overwritten),
+            ValueError is raised if an invalid block is followed by valid ones.
+        fsync : bool
+            If True, each crawl's block is fsynced.
+        scope : str
+            Search recorded by history (e.g. "immoch/flat/geneve"), saved in header of a new file. Disappearances only
+            make sense within one search, so ValueError is raised if file records another scope.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.scope = scope
+        self.lock = threading.Lock()
+        # Crawl time of each run (run index -> timestamp)
+        self.runTimes = array("d")
+        # data-id -> ListingHistory
+        self.listings = {}
+        self.sortedIDs = None
+        validLength = self._load()
+        self.file = open(self.path, "r+b" if self.path.exists() else "w+b")
+        if validLength < self.file.seek(0, os.SEEK_END):
+            logger.warning(f"Dropped torn block at end of history file '{self.path}'")
+            self.file.truncate(validLength)
+        self.file.seek(validLength)
+        if validLength == 0 and scope is not None:
+            encodedScope = scope.encode()
+            self.file.write(SCOPE_HEADER.pack(SCOPE_MAGIC, len(encodedScope)) + encodedScope)
+            self.file.flush()
+
+    def __len__(self):
+        return len(self.listings)
+
+    def __contains__(self, dataID):
+        return dataID in self.listings
+
+    def update(self, ads, crawledAt=None, complete=True):
+        """
+        Record a crawl (should be called once, at its end).
+
+        Params
+        ------
+        ads : iterable
+            Ads found by crawl (dictionnaries with `data-id` and `rent` keys).
+        crawledAt : float
+            Crawl timestamp, defaults to now. Crawls must be recorded in chronological order.
+        complete : bool
+            If True, crawl covered whole search : listings that were available and weren't found are marked as
+            disappeared. Partial crawls only record what they saw.
+
+        Returns
+        -------
+        counts : dict
+            Number of "added", "rentChanged", "disappeared" and "reappeared" listings.
+        """
+        crawledAt = time.time() if crawledAt is None else crawledAt
+        if self.runTimes and crawledAt < self.runTimes[-1]:
+            raise ValueError(f"Crawl at {crawledAt} is older than last recorded crawl ({self.runTimes[-1]})")
+        counts = {"added": 0, "rentChanged": 0, "disappeared": 0, "reappeared": 0}
+        events = {}
+        found = set()
+        for ad in ads:
+            dataID = ad.get("data-id")
+            if dataID is None or dataID in found:
+                continue
+            found.add(dataID)
+            rent = ad.get("rent") or 0
+            listing = self.listings.get(dataID)
+            if listing is None:
+                counts["added"] += 1
+            elif not listing.seen[-1]:
+                counts["reappeared"] += 1
+            elif listing.rents[-1] != rent:
+                counts["rentChanged"] += 1
+            else:
+                continue
+            events[dataID] = (SEEN, rent)
+        if complete:
+            for dataID, listing in self.listings.items():
+                if listing.seen[-1] and dataID not in found:
+                    events[dataID] = (DISAPPEARED, listing.rents[-1])
+                    counts["disappeared"] += 1
+        with self.lock:
+            self._append(crawledAt, sorted(events.items()))
+        logger.info(f"Recorded crawl in history '{self.path}' : {counts}")
+        return counts
+
+    def history(self, dataID):
+        """
+        Return changes of a listing, oldest first, as dictionnaries with `crawledAt`, `rent` and `seen` keys (empty list
+        if listing was never seen).
+        """
+        listing = self.listings.get(dataID)
+        if listing is None:
+            return []
+        return [
+            {"crawledAt": self.runTimes[run], "rent": rent, "seen": bool(seen)}
+            for run, rent, seen in zip(listing.runs, listing.rents, listing.seen)
+        ]
+
+    def stateAt(self, dataID, when):
+        """
+        Return state (`crawledAt` of last change, `rent`, `seen`) of listing at given time, None if it wasn't seen yet.
+        """
+        listing = self.listings.get(dataID)
+        if listing is None:
+            return None
+        # Last run recorded at or before `when`, then last change of listing at or before that run
+        run = bisect.bisect_right(self.runTimes, when) - 1
+        position = bisect.bisect_right(listing.runs, run) - 1
+        if position < 0:
+            return None
+        return {"crawledAt": self.runTimes[listing.runs[position]], "rent": listing.rents[position], "seen": bool(listing.seen[position])}
+
+    def scan(self, minID=None, maxID=None, since=None, until=None):
+        """
+        Yield (data-id, changes) of listings with `minID <= data-id <= maxID`, in data-id order. With `since` / `until`,
+        only changes recorded in that time range are given (listings without any are skipped).
+        """
+        if self.sortedIDs is None:
+            self.sortedIDs = sorted(self.listings)
+        start = 0 if minID is None else bisect.bisect_left(self.sortedIDs, minID)
+        end = len(self.sortedIDs) if maxID is None else bisect.bisect_right(self.sortedIDs, maxID)
+        firstRun = 0 if since is None else bisect.bisect_left(self.runTimes, since)
+        lastRun = len(self.runTimes) if until is None else bisect.bisect_right(self.runTimes, until)
+        for dataID in self.sortedIDs[start:end]:
+            listing = self.listings[dataID]
+            low = bisect.bisect_left(listing.runs, firstRun)
+            high = bisect.bisect_left(listing.runs, lastRun)
+            if low < high:
+                yield dataID, [
+                    {"crawledAt": self.runTimes[listing.runs[position]], "rent": listing.rents[position], "seen": bool(listing.seen[position])}
+                    for position in range(low, high)
+                ]
+
+    def importSnapshots(self, filenames):
+        """
+        Record pickled crawl results saved by `saveObject()` (dictionnaries with `timeStamp` and `object` keys), in
+        chronological order. Return number of snapshots imported.
+        """
+        snapshots = []
+        for filename in filenames:
+            with open(filename, "rb") as f:
+                saved = pickle.load(f)
+            snapshots.append((saved["timeStamp"].timestamp(), saved["object"]))
+        for crawledAt, ads in sorted(snapshots, key=lambda snapshot: snapshot[0]):
+            self.update(ads, crawledAt)
+        return len(snapshots)
+
+    def close(self):
+        self.file.close()
+
+    # === HELPER FUNCTIONS === #
+    def _append(self, crawledAt, events):
+        """
+        Write block of run's events (sorted by data-id) and apply it.
+        """
+        payload = bytearray()
+        previousID = 0
+        for dataID, (kind, rent) in events:
+            listing = self.listings.get(dataID)
+            previousRent = listing.rents[-1] if listing is not None else 0
+            _writeVarint(payload, dataID - previousID)
+            _writeVarint(payload, kind)
+            _writeVarint(payload, _zigzag(rent - previousRent))
+            previousID = dataID
+        header = BLOCK_HEADER.pack(BLOCK_MAGIC, crawledAt, len(events), len(payload))
+        self.file.write(header + payload + struct.pack("<I", zlib.crc32(payload)))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self._apply(crawledAt, events)
+
+    def _apply(self, crawledAt, events):
+        run = len(self.runTimes)
+        self.runTimes.append(crawledAt)
+        for dataID, (kind, rent) in events:
+            listing = self.listings.get(dataID)
+            if listing is None:
+                listing = self.listings[dataID] = ListingHistory()
+                self.sortedIDs = None
+            listing.runs.append(run)
+            listing.rents.append(rent)
+            listing.seen.append(kind)
+
+    def _load(self):
+        """
+        Replay blocks of history file, return length of its valid part.
+        """
+        if not self.path.exists():
+            return 0
+        data = self.path.read_bytes()
+        offset = self._loadScope(data)
+        if offset == 0 and data.startswith(SCOPE_MAGIC):
+            # Header torn by a crash while file was created
+            return 0
+        while offset < len(data):
+            end = _blockEnd(data, offset)
+            if end is None:
+                # Only last block can be torn by a crash, an invalid block followed by valid ones is corruption
+                if _hasBlockAfter(data, offset):
+                    raise ValueError(f"Corrupted block at offset {offset} of history file '{self.path}'")
+                break
+            _, crawledAt, numberOfEvents, length = BLOCK_HEADER.unpack_from(data, offset)
+            payload = data[offset + BLOCK_HEADER.size:offset + BLOCK_HEADER.size + length]
+            events = []
+            position = 0
+            dataID = 0
+            for _ in range(numberOfEvents):
+                delta, position = _readVarint(payload, position)
+                kind, position = _readVarint(payload, position)
+                rentDelta, position = _readVarint(payload, position)
+                dataID += delta
+                listing = self.listings.get(dataID)
+                previousRent = listing.rents[-1] if listing is not None else 0
+                events.append((dataID, (kind, previousRent + _unzigzag(rentDelta))))
+            self._apply(crawledAt, events)
+            offset = end
+        logger.info(f"Loaded history of {len(self.listings)} listings over {len(self.runTimes)} crawls from '{self.path}'")
+        return offset
+
+    def _loadScope(self, data):
+        """
+        Check scope header of history file against `self.scope` (adopting it if none was given), return its length.
+        """
+        if not data.startswith(SCOPE_MAGIC) or len(data) < SCOPE_HEADER.size:
+            if data.startswith(BLOCK_MAGIC) and self.scope is not None:
+                logger.warning(f"History file '{self.path}' has no scope, it can't be checked against '{self.scope}'")
+            return 0
+        _, length = SCOPE_HEADER.unpack_from(data)
+        if SCOPE_HEADER.size + length > len(data):
+            return 0
+        fileScope = data[SCOPE_HEADER.size:SCOPE_HEADER.size + length].decode()
+        if self.scope is not None and fileScope != self.scope:
+            raise ValueError(f"History file '{self.path}' records '{fileScope}', not '{self.scope}'")
+        self.scope = fileScope
+        return SCOPE_HEADER.size + length
+
+
+# === HELPER FUNCTIONS === #
+def _blockEnd(data, offset):
+    """
+    Return offset following block starting at offset (header, payload and CRC), None if it isn't a valid block.
+    """
+    if offset + BLOCK_HEADER.size > len(data):
+        return None
+    magic, _, _, length = BLOCK_HEADER.unpack_from(data, offset)
+    start = offset + BLOCK_HEADER.size
+    end = start + length
+    if magic != BLOCK_MAGIC or end + 4 > len(data):
+        return None
+    if struct.unpack_from("<I", data, end)[0] != zlib.crc32(data[start:end]):
+        return None
+    return end + 4
+
+
+def _hasBlockAfter(data, offset):
+    """
+    Return True if a valid block starts after offset.
+    """
+    position = data.find(BLOCK_MAGIC, offset + 1)
+    while position != -1:
+        if _blockEnd(data, position) is not None:
+            return True
+        position = data.find(BLOCK_MAGIC, position + 1)
+    return False
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def _writeVarint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _readVarint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
@@ -0,0 +1,247 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.sqlite_utils import ProcessLocalSQLite
+
+# Pillow is only needed for thumbnails
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    fetchedAt REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS adImages (
+    dataID INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (dataID, position)
+);
+CREATE INDEX IF NOT EXISTS adImagesByHash ON adImages (hash);
+"""
+
+
+class ImageStore(ProcessLocalSQLite):
+    def __init__(self, folder, thumbnailSize=None):
+        """
+        Content-addressed store of ad images : each image is saved once under its content hash, whatever number of URLs
+        or listings (re-posts, agencies reusing photos) it's found at. An SQLite index maps URLs and ads (data-id) to
+        hashes, so known URLs are never downloaded again. Safe to use from several threads and worker processes of one
+        machine (see ProcessLocalSQLite).
+
+        Params
+        ------
+        folder : str
+            Store folder (images in `objects/`, thumbnails in `thumbnails/`, index in `index.sqlite`), created if needed.
+        thumbnailSize : int
+            If set, a JPEG thumbnail fitting in a square of this size (px) is saved along with each image (requires
+            `Pillow`).
+        """
+        if thumbnailSize is not None and Image is None:
+            raise ImportError("'Pillow' package is needed to make thumbnails")
+        self.folder = Path(folder)
+        (self.folder / "objects").mkdir(parents=True, exist_ok=True)
+        self.thumbnailSize = thumbnailSize
+        if thumbnailSize is not None:
+            (self.folder / "thumbnails").mkdir(exist_ok=True)
+        # `path()` gives paths of images, so database path is given explicitly
+        self._initConnection(self.folder / "index.sqlite")
+        with self.lock:
+            self._getConnection().executescript(SCHEMA)
+        # Counters since store was opened (URL hits, downloads, deduplicated images, bytes...)
+        self.stats = Counter()
+
+    @staticmethod
+    def contentHash(content):
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def path(self, imageHash):
+        """
+        Path of image file of hash (two levels of folders keep folders small).
+        """
+        return self.folder / "objects" / imageHash[:2] / imageHash[2:]
+
+    def thumbnailPath(self, imageHash):
+        """
+        Path of thumbnail of image, None if there's none.
+        """
+        path = self.folder / "thumbnails" / f"{imageHash}.jpg"
+        return path if path.exists() else None
+
+    def get(self, imageHash):
+        """
+        Return content of image, None if it's not stored.
+        """
+        try:
+            return self.path(imageHash).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def lookup(self, url):
+        """
+        Return hash of image already fetched from URL, None if URL is unknown.
+        """
+        with self.lock:
+            row = self._getConnection().execute("SELECT hash FROM urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, content, url=None):
+        """
+        Store image content (once per hash) and map URL to it, return its hash.
+        """
+        imageHash = self.contentHash(content)
+        path = self.path(imageHash)
+        if not path.exists():
+            # Same content always gives same file, so two threads racing on a new image is harmless
+            self._writeFile(path, content)
+            if self.thumbnailSize is not None:
+                self._writeThumbnail(imageHash, content)
+        with self.lock, self._getConnection():
+            stored = self._getConnection().execute("INSERT OR IGNORE INTO blobs VALUES (?, ?)", (imageHash, len(content))).rowcount
+            if url is not None:
+                self._getConnection().execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?)", (url, imageHash, time.time()))
+            if stored:
+                self.stats["stored"] += 1
+                self.stats["bytesStored"] += len(content)
+            else:
+                self.stats["deduplicated"] += 1
+                self.stats["bytesDeduplicated"] += len(content)
+        return imageHash
+
+    def setAdImages(self, dataID, hashes):
+        """
+        Record hashes of ad's images (in ad's order), replacing previous ones.
+        """
+        with self.lock, self._getConnection():
+            self._getConnection().execute("DELETE FROM adImages WHERE dataID = ?", (dataID,))
+            self._getConnection().executemany(
+                "INSERT INTO adImages VALUES (?, ?, ?)", [(dataID, position, imageHash) for position, imageHash in enumerate(hashes)]
+            )
+
+    def hashesOf(self, dataID):
+        """
+        Return hashes of ad's images, in ad's order.
+        """
+        with self.lock:
+            rows = self._getConnection().execute("SELECT hash FROM adImages WHERE dataID = ? ORDER BY position", (dataID,)).fetchall()
+        return [row[0] for row in rows]
+
+    def adsWith(self, imageHash):
+        """
+        Return data-id of ads showing image (e.g. re-posts of a listing).
+        """
+        with self.lock:
+            rows = self._getConnection().execute("SELECT DISTINCT dataID FROM adImages WHERE hash = ? ORDER BY dataID", (imageHash,)).fetchall()
+        return [row[0] for row in rows]
+
+    def report(self):
+        """
+        Log and return counters since store was opened, with URL hit rate and deduplication rate.
+        """
+        report = dict(self.stats)
+        lookups = self.stats["urlHits"] + self.stats["downloads"]
+        if lookups:
+            report["urlHitRate"] = round(self.stats["urlHits"] / lookups, 3)
+        if self.stats["downloads"]:
+            report["deduplicationRate"] = round(self.stats["deduplicated"] / self.stats["downloads"], 3)
+        logger.info(f"Image store stats : {report}")
+        return report
+
+
+    # === HELPER FUNCTIONS === #
+    @staticmethod
+    def _writeFile(path, content):
+        """
+        Write file atomically (temporary file renamed), so a stored hash always has its whole content.
+        """
+        path.parent.mkdir(exist_ok=True)
+        fd, tempPath = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tempPath, path)
+
+    def _writeThumbnail(self, imageHash, content):
+        try:
+            image = Image.open(io.BytesIO(content))
+            image.thumbnail((self.thumbnailSize, self.thumbnailSize))
+            output = io.BytesIO()
+            image.convert("RGB").save(output, "JPEG", quality=80)
+        except Exception as e:
+            logger.warning(f"Couldn't make thumbnail of image {imageHash} : {e}")
+            return
+        self._writeFile(self.folder / "thumbnails" / f"{imageHash}.jpg", output.getvalue())
+
+
+def fetchImages(site, ads, store, workers=8):
+    """
+    Image stage : fetch images of ads concurrently (through site's session and rate limiter), store them in image
+    store and add `imageHashes` key (hashes in ad's images order, failed images left out) to each ad. URLs already in
+    store aren't downloaded again, and a URL shared by several ads is downloaded once.
+
+    Params
+    ------
+    site : FlatHunterBase
+        Crawler whose `fetchAsset()` is used (its run counters get image stage counters).
+    ads : list
+        Ads with `images` key (dictionnary of image URLs as values).
+    store : ImageStore
+        Image store.
+    workers : int
+        Number of fetching threads.
+
+    Returns
+    -------
+    counters : dict
+        Counters of call : "urlHits", "downloads", "deduplicated", "failures".
+    """
+    counters = Counter()
+    # Dictionnary keys keep URLs in order of first appearance
+    urls = {url: None for ad in ads for url in (ad.get("images") or {}).values() if url}
+    hashes = {}
+    missing = []
+    for url in urls:
+        imageHash = store.lookup(url)
+        if imageHash is not None:
+            hashes[url] = imageHash
+        else:
+            missing.append(url)
+    counters["urlHits"] = len(urls) - len(missing)
+
+    def download(url):
+        content = site.fetchAsset(url)
+        return url, None if content is None else store.put(content, url)
+
+    if missing:
+        deduplicated = store.stats["deduplicated"]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for url, imageHash in pool.map(download, missing):
+                if imageHash is None:
+                    counters["failures"] += 1
+                else:
+                    hashes[url] = imageHash
+                    counters["downloads"] += 1
+        counters["deduplicated"] = store.stats["deduplicated"] - deduplicated
+    for ad in ads:
+        ad["imageHashes"] = [hashes[url] for url in (ad.get("images") or {}).values() if url in hashes]
+        if ad.get("data-id") is not None:
+            store.setAdImages(ad["data-id"], ad["imageHashes"])
+    with store.lock:
+        store.stats.update({key: counters[key] for key in ("urlHits", "downloads", "failures")})
+    for key in ("urlHits", "downloads", "deduplicated", "failures"):
+        site.stats[f"image{key[0].upper()}{key[1:]}"] += counters[key]
+    logger.info(f"Image stage : {dict(counters)} for {len(ads)} ads")
+    return dict(counters)
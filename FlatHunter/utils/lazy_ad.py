@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from FlatHunter.utils.logging_utils import logger
+
+
+class LazyAd(dict):
+    def __init__(self, fields, loader, detailKeys, keyOrder=None):
+        """
+        Ad dictionnary whose item's page fields (detail keys) are loaded on first access and then memoised. Card fields are
+        available right away.
+
+        Params
+        ------
+        fields : dict
+            Fields known without item's page (data-id, link, rent...).
+        loader : callable
+            Function returning dictionnary of detail fields, called once.
+        detailKeys : iterable
+            Keys only known once item's page is loaded (e.g. images).
+        keyOrder : list
+            Order of keys once detail fields are loaded (same order as eager ads), keys of `fields` order if left empty.
+
+        Note : accessing a detail key (`ad["images"]`, `ad.get("images")`, `"images" in ad`) loads it, while iterating
+        over a non loaded ad (`keys()`, `items()`, `json.dumps()`) only gives card fields. Call `load()` first to get all
+        fields.
+        """
+        super().__init__(fields)
+        self.loader = loader
+        self.detailKeys = frozenset(detailKeys)
+        self.keyOrder = keyOrder
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Load detail fields (once) and return ad.
+        """
+        with self.lock:
+            if not self.loaded:
+                details = self.loader()
+                fields = {**self, **details}
+                if self.keyOrder is not None:
+                    fields = {key: fields[key] for key in self.keyOrder if key in fields}
+                super().clear()
+                super().update(fields)
+                self.loaded = True
+                # Loader may hold a crawler, it's not needed anymore
+                self.loader = None
+        return self
+
+    def __getitem__(self, key):
+        if key in self.detailKeys and not self.loaded:
+            self.load()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if key in self.detailKeys and not self.loaded:
+            self.load()
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        if key in self.detailKeys and not self.loaded:
+            self.load()
+        return super().__contains__(key)
+
+    def __reduce__(self):
+        # Pickled (e.g. sent to another process) as a plain dictionnary with all fields
+        return (dict, (dict(self.load()),))
+
+    def __repr__(self):
+        return f"LazyAd({super().__repr__()}, loaded={self.loaded})"
+
+
+def prefetchDetails(ads, workers=4):
+    """
+    Load detail fields of lazy ads concurrently (plain dictionnaries and already loaded ads are skipped).
+
+    Params
+    ------
+    ads : iterable
+        Ads returned by `getItems()`.
+    workers : int
+        Number of threads fetching item's pages.
+
+    Returns
+    -------
+    loaded : int
+        Number of ads loaded.
+    """
+    pending = [ad for ad in ads if isinstance(ad, LazyAd) and not ad.loaded]
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(LazyAd.load, pending))
+        logger.info(f"Prefetched item's pages of {len(pending)} ads")
+    return len(pending)
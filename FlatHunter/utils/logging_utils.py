@@ -9,8 +9,8 @@ logger = logging.getLogger(__name__)
 # === 2. Créer un ou plusieurs handler === #
 # Diriger les logs vers "standard output"
 #stream_handler = logging.StreamHandler(sys.stdout)
-# Diriger les logs vers un fichier
-file_handler = logging.FileHandler(f'{ROOT_PATH}/logs/FlatHunter.log', mode="w")
+# Diriger les logs vers un fichier (ouvert au premier log seulement, pas à l'import)
+file_handler = logging.FileHandler(f'{ROOT_PATH}/logs/FlatHunter.log', mode="w", delay=True)
 
 # === 3. Ajouter les handlers au logger === #
 #logger.addHandler(stream_handler)
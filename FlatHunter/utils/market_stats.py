@@ -0,0 +1,369 @@
+import json
+import math
+import random
+from pathlib import Path
+from FlatHunter.utils.logging_utils import logger
+
+# Width (m2) of size bands of buckets
+SIZE_BAND = 20
+# Fields of bucket keys, in order
+BUCKET_FIELDS = ("category", "region", "rooms", "sizeBand")
+
+
+class KLLSketch:
+    def __init__(self, k=200, seed=1):
+        """
+        KLL quantile sketch : a stream of numbers is summarised by a hierarchy of compactors holding O(k) items whatever
+        stream length. When a compactor is full, it's sorted and every other item (random offset) moves to next level,
+        with twice the weight. Rank error is about 1.7/k (k=200 : ~1%). Sketches of same k are mergeable.
+
+        Params
+        ------
+        k : int
+            Capacity of top compactor (accuracy vs memory).
+        seed : int
+            Seed of compaction offsets, so that a sketch is reproducible.
+        """
+        self.k = k
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.compactors = [[]]
+        self.count = 0
+        self.size = 0
+        self.maxSize = self._capacity(0)
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def update(self, value):
+        """
+        Add value to sketch.
+        """
+        self.compactors[0].append(value)
+        self.count += 1
+        self.size += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.size >= self.maxSize:
+            self._compress()
+
+    def merge(self, other):
+        """
+        Add items of another sketch (same k) to this one, sketch of both streams is kept in place and returned.
+        """
+        if other.k != self.k:
+            raise ValueError(f"Can't merge sketches of different k ({self.k} and {other.k})")
+        if not other.count:
+            return self
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, compactor in enumerate(other.compactors):
+            self.compactors[height].extend(compactor)
+        self.count += other.count
+        self.size = sum(len(compactor) for compactor in self.compactors)
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        while self.size >= self.maxSize:
+            self._compress()
+        return self
+
+    def quantile(self, q):
+        """
+        Return estimated q-quantile (0 <= q <= 1) of stream, None if sketch is empty. Exact while no compaction happened.
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """
+        Return estimated quantiles of several q at once (items of sketch are sorted once).
+        """
+        if not self.count:
+            return [None for _ in qs]
+        weighted = sorted((value, 1 << height) for height, compactor in enumerate(self.compactors) for value in compactor)
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            result = self.max
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= q * total:
+                    result = value
+                    break
+            results.append(result if q < 1 else self.max)
+        return results
+
+    def rank(self, value):
+        """
+        Return estimated share of stream lower than or equal to value.
+        """
+        if not self.count:
+            return 0.0
+        below = sum((1 << height) for height, compactor in enumerate(self.compactors) for item in compactor if item <= value)
+        total = sum((1 << height) * len(compactor) for height, compactor in enumerate(self.compactors))
+        return below / total
+
+    def toDict(self):
+        """
+        Return JSON-serialisable state of sketch (see `fromDict()`).
+        """
+        return {"k": self.k, "seed": self.seed, "count": self.count, "min": self.min, "max": self.max, "compactors": self.compactors}
+
+    @classmethod
+    def fromDict(cls, state):
+        sketch = cls(state["k"], state["seed"])
+        sketch.compactors = [list(compactor) for compactor in state["compactors"]] or [[]]
+        sketch.count = state["count"]
+        sketch.min = state["min"]
+        sketch.max = state["max"]
+        sketch.size = sum(len(compactor) for compactor in sketch.compactors)
+        sketch.maxSize = sum(sketch._capacity(height) for height in range(len(sketch.compactors)))
+        # Compaction offsets of restored sketch shouldn't replay those of original one
+        sketch.rng = random.Random(state["seed"] * 1000003 + state["count"])
+        return sketch
+
+    # === HELPER FUNCTIONS === #
+    def _capacity(self, height):
+        """
+        Capacity of compactor at height : top compactor holds k items, each lower one 2/3 of the one above (at least 2).
+        """
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self.maxSize = sum(self._capacity(height) for height in range(len(self.compactors)))
+
+    def _compress(self):
+        for height in range(len(self.compactors)):
+            compactor = self.compactors[height]
+            if len(compactor) >= self._capacity(height):
+                if height + 1 >= len(self.compactors):
+                    self._grow()
+                compactor.sort()
+                offset = self.rng.random() < 0.5
+                self.compactors[height + 1].extend(compactor[offset::2])
+                self.compactors[height] = []
+                self.size = sum(len(compactor) for compactor in self.compactors)
+                if self.size < self.maxSize:
+                    break
+
+
+class BucketStats:
+    def __init__(self, k=200):
+        """
+        Statistics of ads of one bucket : count, sums (means) and quantile sketches of rent and rent per m2.
+        """
+        self.count = 0
+        self.rentSum = 0
+        self.sizeSum = 0
+        self.sized = 0
+        self.rent = KLLSketch(k)
+        self.rentPerM2 = KLLSketch(k)
+
+    def add(self, rent, size):
+        self.count += 1
+        self.rentSum += rent
+        self.rent.update(rent)
+        if size:
+            self.sized += 1
+            self.sizeSum += size
+            self.rentPerM2.update(rent / size)
+
+    def merge(self, other):
+        self.count += other.count
+        self.rentSum += other.rentSum
+        self.sizeSum += other.sizeSum
+        self.sized += other.sized
+        self.rent.merge(other.rent)
+        self.rentPerM2.merge(other.rentPerM2)
+        return self
+
+    def toDict(self):
+        return {
+            "count": self.count,
+            "rentSum": self.rentSum,
+            "sizeSum": self.sizeSum,
+            "sized": self.sized,
+            "rent": self.rent.toDict(),
+            "rentPerM2": self.rentPerM2.toDict(),
+        }
+
+    @classmethod
+    def fromDict(cls, state):
+        stats = cls()
+        stats.count = state["count"]
+        stats.rentSum = state["rentSum"]
+        stats.sizeSum = state["sizeSum"]
+        stats.sized = state["sized"]
+        stats.rent = KLLSketch.fromDict(state["rent"])
+        stats.rentPerM2 = KLLSketch.fromDict(state["rentPerM2"])
+        return stats
+
+
+class MarketStats:
+    def __init__(self, category=None, region=None, k=200):
+        """
+        Streaming market statistics : ads update per bucket statistics (see BucketStats) as they're crawled, buckets
+        being (category, region, rooms, size band). Statistics of runs, jobs or workers are merged with `merge()`, and
+        `summary()` answers from buckets only (no raw results). Can be used as a `getItems()` sink.
+
+        Params
+        ------
+        category : str
+            Category of ads written with `write()` (e.g. "flat").
+        region : str
+            Region of ads written with `write()` (e.g. "geneve").
+        k : int
+            Accuracy of quantile sketches (see KLLSketch).
+        """
+        self.category = category
+        self.region = region
+        self.k = k
+        # Bucket key (see BUCKET_FIELDS) -> BucketStats
+        self.buckets = {}
+
+    def __len__(self):
+        return sum(bucket.count for bucket in self.buckets.values())
+
+    def add(self, ad, category=None, region=None):
+        """
+        Add ad to its bucket, ads without rent are skipped.
+
+        Params
+        ------
+        ad : dict
+            Ad with rent, rooms and size keys (formatted as `getItems()` ones).
+        category : str
+            Category of ad, defaults to ad's `category` key, then to stats' category.
+        region : str
+            Region of ad, defaults to ad's `region` key, then to stats' region.
+        """
+        rent = ad.get("rent")
+        if not rent:
+            return
+        size = ad.get("size") or 0
+        key = (
+            category or ad.get("category") or self.category,
+            region or ad.get("region") or self.region,
+            ad.get("rooms"),
+            size // SIZE_BAND * SIZE_BAND if size else None,
+        )
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = BucketStats(self.k)
+        bucket.add(rent, size)
+
+    def write(self, ad):
+        """
+        Sink interface (see `getItems()`), same as `add()`.
+        """
+        self.add(ad)
+
+    def merge(self, other):
+        """
+        Merge statistics of another MarketStats (e.g. another run or worker) into this one and return it.
+        """
+        for key, bucket in other.buckets.items():
+            # Buckets of other stats are copied, they must not change along with this one
+            self.mergeBucket(key, BucketStats.fromDict(bucket.toDict()) if key not in self.buckets else bucket)
+        return self
+
+    def mergeBucket(self, key, bucket):
+        """
+        Merge BucketStats into bucket of key (see BUCKET_FIELDS), bucket is kept as is if key is new.
+        """
+        if key in self.buckets:
+            self.buckets[key].merge(bucket)
+        else:
+            self.buckets[key] = bucket
+
+    def summary(self, groupBy=("category", "region", "rooms"), quantiles=(0.5, 0.9), **where):
+        """
+        Summarise buckets, merging those of same group.
+
+        Params
+        ------
+        groupBy : tuple
+            Bucket fields (see BUCKET_FIELDS) defining groups, e.g. ("region",) for one row per region.
+        quantiles : tuple
+            Quantiles of rent and rent per m2 given for each group.
+        where :
+            Bucket fields values to keep only some buckets, e.g. `region="geneve"`.
+
+        Returns
+        -------
+        rows : list
+            Dictionnaries sorted by group, with groupBy fields and following keys :
+                <count> int : Number of ads.
+                <meanRent> float : Mean rent.
+                <meanSize> float : Mean size of ads with a size (None if none).
+                <rent> dict : Quantile as key and estimated rent as value.
+                <rentPerM2> dict : Quantile as key and estimated rent per m2 as value.
+        """
+        for field in (*groupBy, *where):
+            if field not in BUCKET_FIELDS:
+                raise ValueError(f"Unknown bucket field '{field}', fields are {', '.join(BUCKET_FIELDS)}")
+        positions = [BUCKET_FIELDS.index(field) for field in groupBy]
+        filters = [(BUCKET_FIELDS.index(field), value) for field, value in where.items()]
+        groups = {}
+        for key, bucket in self.buckets.items():
+            if any(key[position] != value for position, value in filters):
+                continue
+            groupKey = tuple(key[position] for position in positions)
+            if groupKey not in groups:
+                groups[groupKey] = BucketStats(self.k)
+            groups[groupKey].merge(bucket)
+        rows = []
+        for groupKey in sorted(groups, key=lambda key: tuple((value is None, value) for value in key)):
+            stats = groups[groupKey]
+            rows.append(
+                {
+                    **dict(zip(groupBy, groupKey)),
+                    "count": stats.count,
+                    "meanRent": stats.rentSum / stats.count,
+                    "meanSize": stats.sizeSum / stats.sized if stats.sized else None,
+                    "rent": dict(zip(quantiles, stats.rent.quantiles(quantiles))),
+                    "rentPerM2": dict(zip(quantiles, stats.rentPerM2.quantiles(quantiles))),
+                }
+            )
+        return rows
+
+    def toDict(self):
+        """
+        Return JSON-serialisable state (see `fromDict()`).
+        """
+        return {
+            "category": self.category,
+            "region": self.region,
+            "k": self.k,
+            "buckets": [{**dict(zip(BUCKET_FIELDS, key)), **bucket.toDict()} for key, bucket in self.buckets.items()],
+        }
+
+    @classmethod
+    def fromDict(cls, state):
+        stats = cls(state.get("category"), state.get("region"), state.get("k", 200))
+        for bucket in state["buckets"]:
+            stats.buckets[tuple(bucket[field] for field in BUCKET_FIELDS)] = BucketStats.fromDict(bucket)
+        return stats
+
+    def save(self, path):
+        """
+        Save statistics as JSON.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(self.toDict(), fp, separators=(",", ":"))
+        logger.info(f"Saved market statistics of {len(self)} ads ({len(self.buckets)} buckets) to '{path}'")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as fp:
+            return cls.fromDict(json.load(fp))
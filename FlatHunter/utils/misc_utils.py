@@ -1,4 +1,5 @@
 from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
 
 def getPath(param):
     """
@@ -22,4 +23,27 @@ def getPath(param):
     elif param == "root":
         return rootPath
     else:
-        raise ValueError("Param must be either 'project' or 'root'")
\ No newline at end of file
+        raise ValueError("Param must be either 'project' or 'root'")
+
+def canonicalURL(url):
+    """
+    Canonicalise URL so that equivalent URLs give the same key (lowercase scheme and host, no default port, no fragment,
+    sorted query parameters).
+
+    Parameters
+    ----------
+    url : string
+        URL to canonicalise.
+
+    Returns
+    -------
+    string
+        Canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "https" and netloc.endswith(":443")) or (scheme == "http" and netloc.endswith(":80")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from FlatHunter.modules import SITES, getSite
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.near_duplicates import collapseDuplicates
+
+
+def crawlSite(name, itemCategory, filter, pagesToSearch=None, siteOptions=None):
+    """
+    Crawl one registered site and return its report (see `runSites()`), its ads get a `site` key.
+    """
+    start = time.perf_counter()
+    report = {"site": name, "items": [], "stats": {}, "error": None}
+    try:
+        site = getSite(name)(itemCategory, **(siteOptions or {}))
+        report["items"] = [{**ad, "site": name} for ad in site.getItems(filter, pagesToSearch=pagesToSearch)]
+        report["stats"] = dict(site.stats)
+    except Exception as e:
+        logger.error(f"Crawl of site '{name}' failed : {e}")
+        report["error"] = repr(e)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def runSites(filter, itemCategory="flat", sites=None, pagesToSearch=None, siteOptions=None, dedup=True, **dedupOptions):
+    """
+    Crawl several registered sites concurrently (one thread per site, sites are different hosts) and merge their ads,
+    collapsing the same listing found on several sites (see `collapseDuplicates()`).
+
+    Params
+    ------
+    filter : dict
+        Filter of `getItems()`.
+    itemCategory : str
+        Item category of search.
+    sites : list
+        Names of sites (see `FlatHunter.modules`), all registered sites if left empty. Earlier sites are preferred when
+        duplicates are collapsed.
+    pagesToSearch : int
+        Number of pages searched on each site.
+    siteOptions : dict
+        Site name as key and dictionnary of site class keyword arguments (region, fastPath...) as value.
+    dedup : bool
+        If False, ads of all sites are returned as is.
+    dedupOptions :
+        Options of `collapseDuplicates()` (threshold, crossSiteOnly...).
+
+    Returns
+    -------
+    result : dict
+        Dictionnary with following keys :
+            <items> list : Merged ads, each one with a `site` key (and `duplicates` one if it was found on other sites).
+            <sites> list : Per site report (site, number of items, seconds, stats and error).
+            <seconds> float : Total wall time.
+    """
+    names = list(sites or SITES)
+    siteOptions = siteOptions or {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = [
+            pool.submit(crawlSite, name, itemCategory, filter, pagesToSearch, siteOptions.get(name)) for name in names
+        ]
+        reports = [future.result() for future in futures]
+    items = [ad for report in reports for ad in report["items"]]
+    if dedup:
+        items = collapseDuplicates(items, **dedupOptions)
+    for report in reports:
+        report["items"] = len(report["items"])
+    seconds = time.perf_counter() - start
+    logger.info(f"Crawled {len(names)} sites in {seconds:.1f}s : {len(items)} items")
+    return {"items": items, "sites": reports, "seconds": seconds}
@@ -0,0 +1,279 @@
+import hashlib
+import random
+import re
+import unicodedata
+from FlatHunter.utils.logging_utils import logger
+
+# Mersenne prime used by MinHash permutations (a * x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+# Bucket sizes of numeric values : near-duplicates have rents (sizes) in same or neighbour buckets
+RENT_BUCKET = 100
+SIZE_BUCKET = 5
+# Words ignored in addresses (street types and filler words written differently across portals)
+ADDRESS_STOPWORDS = {"rue", "r", "avenue", "av", "ave", "chemin", "ch", "route", "rte", "boulevard", "bd", "place", "pl",
+                     "quai", "de", "du", "des", "la", "le", "les", "l", "d"}
+
+
+def normaliseAddress(text):
+    """
+    Normalise address for comparison : lowercase, no accents nor punctuation, no street type nor filler words.
+    """
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    words = re.findall(r"[a-z0-9]+", text)
+    return " ".join(word for word in words if word not in ADDRESS_STOPWORDS)
+
+
+def adFeatures(ad):
+    """
+    Return set of tokens identifying an ad : character trigrams of words of normalised address (portals order address
+    parts differently) and image hashes (`imageHashes` key, e.g. content hashes from an image store) when known. Rent,
+    size and rooms aren't tokens (a handful of coarse values shared by many ads), they only confirm a match (see
+    `numbersAgree()`).
+    """
+    features = set()
+    for word in normaliseAddress(ad.get("address")).split():
+        word = f" {word} "
+        for position in range(len(word) - 2):
+            features.add(word[position:position + 3])
+    for imageHash in ad.get("imageHashes") or ():
+        features.add(f"image:{imageHash}")
+    return features
+
+
+def adNumbers(ad):
+    """
+    Return (rent, size, rooms) of an ad, None for unknown values.
+    """
+    return tuple(ad.get(name) or None for name in ("rent", "size", "rooms"))
+
+
+def numbersAgree(numbers1, numbers2):
+    """
+    Return (agree, closeness) for numbers of two ads (see `adNumbers()`) : they agree if rents and sizes known on both
+    sides are in same or neighbour buckets and rooms are equal. Closeness is number of equal values (breaks ties between
+    equally similar candidates, e.g. two flats of one building).
+    """
+    closeness = 0
+    for value1, value2, bucket in zip(numbers1, numbers2, (RENT_BUCKET, SIZE_BUCKET, None)):
+        if value1 is None or value2 is None:
+            continue
+        if value1 == value2:
+            closeness += 1
+        elif bucket is None or abs(value1 // bucket - value2 // bucket) > 1:
+            return False, 0
+    return True, closeness
+
+
+class MinHasher:
+    def __init__(self, numPerm=32, seed=1):
+        """
+        MinHash signatures of token sets : share of equal signature slots of two sets estimates their Jaccard similarity.
+
+        Params
+        ------
+        numPerm : int
+            Number of hash permutations (signature length).
+        seed : int
+            Seed of permutations, signatures are only comparable with same seed and numPerm.
+        """
+        rng = random.Random(seed)
+        self.numPerm = numPerm
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(numPerm)
+        ]
+
+    def signature(self, features):
+        """
+        Return MinHash signature (tuple of numPerm ints) of token set.
+        """
+        if not features:
+            return (MERSENNE_PRIME,) * self.numPerm
+        hashes = [int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little") for feature in features]
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations)
+
+    @staticmethod
+    def similarity(signature1, signature2):
+        """
+        Estimated Jaccard similarity of two signatures.
+        """
+        return sum(1 for slot1, slot2 in zip(signature1, signature2) if slot1 == slot2) / len(signature1)
+
+
+class NearDuplicateIndex:
+    def __init__(self, numPerm=32, bands=8, threshold=0.6, seed=1, groupOf=None):
+        """
+        Locality sensitive hashing index of ads : signatures (of address and images, see `adFeatures()`) are cut into
+        bands and only ads sharing a band are compared, so finding duplicates of an ad doesn't depend on number of indexed
+        ads (sub-quadratic dedup). Pairs with an estimated similarity of at least `threshold` whose rent, size and rooms
+        agree (see `numbersAgree()`) are near-duplicates. With 32 permutations in 8 bands, pairs are likely candidates
+        from a similarity of about 0.6.
+
+        Params
+        ------
+        numPerm : int
+            Signature length, must be a multiple of bands.
+        bands : int
+            Number of bands.
+        threshold : float
+            Minimal estimated similarity of near-duplicates.
+        seed : int
+            Seed of MinHash permutations.
+        groupOf : callable
+            Function of ad's key giving its group (e.g. its site) : ads of same group are never near-duplicates.
+        """
+        if numPerm % bands:
+            raise ValueError(f"numPerm ({numPerm}) must be a multiple of bands ({bands})")
+        self.hasher = MinHasher(numPerm, seed)
+        self.bands = bands
+        self.rows = numPerm // bands
+        self.threshold = threshold
+        self.groupOf = groupOf
+        self.signatures = {}
+        # Key -> (rent, size, rooms)
+        self.numbers = {}
+        # (band, band values) -> keys of ads
+        self.buckets = {}
+        # Near-duplicate pairs (similarity, closeness, position, key1, key2)
+        self.edges = []
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def add(self, key, ad):
+        """
+        Index ad and return keys of already indexed near-duplicates (most similar first). Ads without address nor image
+        hashes don't carry enough evidence (only a few coarse numbers), they're neither indexed nor matched.
+
+        Params
+        ------
+        key : hashable
+            Unique key of ad (e.g. (site, data-id)).
+        ad : dict
+            Ad with address, rent, size, rooms (and optionally imageHashes) keys.
+        """
+        features = adFeatures(ad)
+        if not features:
+            return []
+        signature = self.hasher.signature(features)
+        candidates = set()
+        for band in range(self.bands):
+            bucket = self.buckets.setdefault((band, signature[band * self.rows:(band + 1) * self.rows]), [])
+            candidates.update(bucket)
+            bucket.append(key)
+        self.signatures[key] = signature
+        numbers = self.numbers[key] = adNumbers(ad)
+        if self.groupOf is not None:
+            group = self.groupOf(key)
+            candidates = [candidate for candidate in candidates if self.groupOf(candidate) != group]
+        scored = []
+        for candidate in candidates:
+            similarity = MinHasher.similarity(signature, self.signatures[candidate])
+            if similarity < self.threshold or candidate == key:
+                continue
+            agree, closeness = numbersAgree(numbers, self.numbers[candidate])
+            if agree:
+                scored.append((similarity, closeness, candidate))
+        scored.sort(key=lambda item: item[:2], reverse=True)
+        for similarity, closeness, candidate in scored:
+            self.edges.append((similarity, closeness, len(self.edges), candidate, key))
+        return [candidate for _, _, candidate in scored]
+
+    def clusters(self):
+        """
+        Return groups (lists of keys, in indexing order) of near-duplicate ads, ads without duplicate are left out.
+        Pairs are merged from the most similar one, so with groups an ad ends up with its closest near-duplicate of
+        each other group whatever the indexing order.
+        """
+        # Union-find parents of ads with near-duplicates, and groups of each cluster (by root)
+        self.parents = {}
+        self.clusterGroups = {}
+        for _, _, _, key1, key2 in sorted(self.edges, key=lambda edge: (-edge[0], -edge[1], edge[2])):
+            self._union(key1, key2)
+        groups = {}
+        for key in self.signatures:
+            if key in self.parents:
+                groups.setdefault(self._find(key), []).append(key)
+        return [group for group in groups.values() if len(group) > 1]
+
+    # === HELPER FUNCTIONS === #
+    def _find(self, key):
+        root = key
+        while self.parents.get(root, root) != root:
+            root = self.parents[root]
+        while key != root:
+            self.parents[key], key = root, self.parents[key]
+        return root
+
+    def _union(self, key1, key2):
+        """
+        Merge clusters of keys, return False if they can't be merged (clusters hold ads of same group).
+        """
+        root1 = self._find(key1)
+        root2 = self._find(key2)
+        if root1 == root2:
+            return True
+        if self.groupOf is not None:
+            groups1 = self.clusterGroups.get(root1) or {self.groupOf(root1)}
+            groups2 = self.clusterGroups.get(root2) or {self.groupOf(root2)}
+            if groups1 & groups2:
+                return False
+            self.clusterGroups[root1] = groups1 | groups2
+            self.clusterGroups.pop(root2, None)
+        self.parents.setdefault(root1, root1)
+        self.parents[root2] = root1
+        return True
+
+
+def collapseDuplicates(ads, keyFunction=None, crossSiteOnly=True, **indexOptions):
+    """
+    Collapse near-duplicate ads : first ad of each group is kept with a `duplicates` key listing the others (their site,
+    data-id and link).
+
+    Params
+    ------
+    ads : list
+        Ads, in order of preference.
+    keyFunction : callable
+        Unique key of ad, defaults to (site, data-id).
+    crossSiteOnly : bool
+        If True, ads of same site are never collapsed (only same listing on several portals is).
+    indexOptions :
+        Options of NearDuplicateIndex (numPerm, bands, threshold).
+
+    Returns
+    -------
+    collapsed : list
+        Kept ads, in original order.
+    """
+    keyFunction = keyFunction or (lambda ad: (ad.get("site"), ad.get("data-id")))
+    if crossSiteOnly:
+        siteOf = {}
+        indexOptions["groupOf"] = siteOf.__getitem__
+    index = NearDuplicateIndex(**indexOptions)
+    byKey = {}
+    for ad in ads:
+        key = keyFunction(ad)
+        byKey[key] = ad
+        if crossSiteOnly:
+            siteOf[key] = ad.get("site")
+        index.add(key, ad)
+    dropped = set()
+    duplicatesOf = {}
+    for group in index.clusters():
+        duplicatesOf[group[0]] = group[1:]
+        dropped.update(group[1:])
+    collapsed = []
+    for key, ad in byKey.items():
+        if key in dropped:
+            continue
+        if key in duplicatesOf:
+            ad = {
+                **ad,
+                "duplicates": [
+                    {"site": byKey[other].get("site"), "data-id": byKey[other].get("data-id"), "link": byKey[other].get("link")}
+                    for other in duplicatesOf[key]
+                ],
+            }
+        collapsed.append(ad)
+    logger.info(f"Collapsed {len(dropped)} near-duplicates out of {len(byKey)} ads")
+    return collapsed
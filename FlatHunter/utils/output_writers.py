@@ -0,0 +1,324 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from FlatHunter.utils.lazy_ad import LazyAd
+from FlatHunter.utils.logging_utils import logger
+
+# orjson is optional (several times faster encoding), json is used when it's not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow is only needed by ParquetWriter
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Size (bytes) of write buffers, writes reach disk in large chunks
+BUFFER_SIZE = 1024 * 1024
+# Parquet column -> type name of pyarrow, other columns are strings
+PARQUET_TYPES = {"data-id": "int64", "rent": "int64", "size": "int64", "rooms": "float64"}
+# File extension -> output format
+EXTENSIONS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "json", ".csv": "csv", ".parquet": "parquet"}
+
+
+def encodeJSON(obj):
+    """
+    Encode object as compact JSON bytes (no trailing newline).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def decodeJSON(data):
+    """
+    Decode JSON bytes or string (e.g. one NDJSON line).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class AdWriter(ABC):
+    def __init__(self, path, flushEvery=1000, flushInterval=None, fsync=False):
+        """
+        Base class of streaming writers of ads : ads are written one by one as they're matched (`write()`), through a
+        large buffer flushed every `flushEvery` ads or `flushInterval` seconds, so memory doesn't grow with crawl size.
+        Writers can be used as `getItems()` sinks and as context managers.
+
+        Params
+        ------
+        path : str
+            Output file, "-" for standard output (only for text formats).
+        flushEvery : int
+            Number of ads written between two flushes.
+        flushInterval : float
+            If set, buffer is also flushed when this time (s) elapsed since last flush (e.g. in watch mode).
+        fsync : bool
+            If True, every flush is followed by an fsync, so flushed ads survive a crash of the machine.
+        """
+        self.path = path
+        self.flushEvery = flushEvery
+        self.flushInterval = flushInterval
+        self.fsync = fsync
+        self.count = 0
+        self.pending = 0
+        self.lastFlush = time.monotonic()
+        self.closed = False
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, ad):
+        """
+        Write one ad (lazy ads are loaded first).
+        """
+        if isinstance(ad, LazyAd):
+            ad.load()
+        self._writeAd(ad)
+        self.count += 1
+        self.pending += 1
+        if self.pending >= self.flushEvery or (
+            self.flushInterval is not None and time.monotonic() - self.lastFlush >= self.flushInterval
+        ):
+            self.flush()
+
+    def writeMany(self, ads):
+        """
+        Write ads of an iterable, return number of ads written.
+        """
+        count = 0
+        for ad in ads:
+            self.write(ad)
+            count += 1
+        return count
+
+    def flush(self):
+        """
+        Push buffered ads to file (and to disk with fsync).
+        """
+        self._flushBuffer()
+        if self.file is not None:
+            self.file.flush()
+            if self.fsync and self.file is not sys.stdout.buffer:
+                os.fsync(self.file.fileno())
+        self.pending = 0
+        self.lastFlush = time.monotonic()
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self._closeFile()
+        self.closed = True
+        logger.info(f"Wrote {self.count} ads to '{self.path}'")
+
+    # === HELPER FUNCTIONS === #
+    def _openBinary(self):
+        if self.path == "-":
+            return sys.stdout.buffer
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        return open(self.path, "wb", buffering=BUFFER_SIZE)
+
+    @abstractmethod
+    def _writeAd(self, ad):
+        """
+        Write one ad to file or to writer's buffer.
+        """
+        pass
+
+    def _flushBuffer(self):
+        """
+        Write ads kept in memory by writer itself (row groups), if any.
+        """
+        pass
+
+    def _closeFile(self):
+        if self.file is not None and self.file is not sys.stdout.buffer:
+            self.file.close()
+
+
+class NDJSONWriter(AdWriter):
+    def __init__(self, path, **options):
+        """
+        Write ads as newline-delimited compact JSON (one ad per line), encoded with orjson when installed.
+        See AdWriter for options.
+        """
+        super().__init__(path, **options)
+        self.file = self._openBinary()
+
+    def _writeAd(self, ad):
+        self.file.write(encodeJSON(ad) + b"\n")
+
+
+class JSONWriter(AdWriter):
+    def __init__(self, path, **options):
+        """
+        Write ads as a single JSON array (one compact ad per line), for tools loading whole `.json` files. Array is only
+        closed when writer is closed, use NDJSONWriter for files read while they're written. See AdWriter for options.
+        """
+        super().__init__(path, **options)
+        self.file = self._openBinary()
+        self.file.write(b"[")
+
+    def _writeAd(self, ad):
+        self.file.write((b"\n" if self.count == 0 else b",\n") + encodeJSON(ad))
+
+    def _closeFile(self):
+        self.file.write(b"\n]\n")
+        super()._closeFile()
+
+
+class CSVWriter(AdWriter):
+    def __init__(self, path, columns=None, **options):
+        """
+        Write ads as CSV rows. Nested values (images, latlng, duplicates...) are JSON-encoded in their cell.
+
+        Params
+        ------
+        columns : list
+            Columns of file, keys of first ad if left empty (other keys of later ads are ignored).
+        options :
+            See AdWriter.
+        """
+        super().__init__(path, **options)
+        self.columns = columns
+        self.file = self._openBinary()
+        self.text = io.TextIOWrapper(self.file, encoding="utf-8", newline="", write_through=True)
+        self.writer = None
+
+    def _writeAd(self, ad):
+        if self.writer is None:
+            self.columns = list(self.columns or ad)
+            self.writer = csv.writer(self.text)
+            self.writer.writerow(self.columns)
+        self.writer.writerow([_cell(ad.get(column)) for column in self.columns])
+
+    def _closeFile(self):
+        # Detach so that standard output isn't closed along with wrapper
+        self.text.detach()
+        super()._closeFile()
+
+
+class ParquetWriter(AdWriter):
+    def __init__(self, path, rowGroupSize=50000, columns=None, types=None, **options):
+        """
+        Write ads as a Parquet file (requires `pyarrow`), `rowGroupSize` ads are kept in memory and written as one row
+        group. Schema is declared up front (see `PARQUET_TYPES`, every other column is a string column), so it doesn't
+        depend on ads of first row group (e.g. a column empty in every one of them). Nested values (images, latlng,
+        duplicates...) are JSON-encoded strings.
+
+        Params
+        ------
+        rowGroupSize : int
+            Number of ads per row group.
+        columns : list
+            Columns of file, keys of first ad if left empty (other keys of later ads are ignored).
+        types : dict
+            Column -> pyarrow type name, overrides `PARQUET_TYPES` (e.g. {"score": "float64"}).
+        options :
+            See AdWriter (flushes write pending rows as a smaller row group, fsync isn't available).
+        """
+        if pyarrow is None:
+            raise ImportError("'pyarrow' package is needed to write Parquet files")
+        if path == "-":
+            raise ValueError("Parquet can't be written to standard output")
+        options.setdefault("flushEvery", rowGroupSize)
+        super().__init__(path, **options)
+        self.rowGroupSize = rowGroupSize
+        self.columns = columns
+        self.types = {**PARQUET_TYPES, **(types or {})}
+        self.rows = []
+        self.schema = None
+        self.writer = None
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    def _writeAd(self, ad):
+        if self.schema is None:
+            self.columns = list(self.columns or ad)
+            self.schema = pyarrow.schema(
+                [(column, pyarrow.type_for_alias(self.types.get(column, "string"))) for column in self.columns]
+            )
+        self.rows.append([_column(ad.get(column), column not in self.types) for column in self.columns])
+        if len(self.rows) >= self.rowGroupSize:
+            self._flushBuffer()
+
+    def _flushBuffer(self):
+        if not self.rows:
+            return
+        table = pyarrow.Table.from_pylist([dict(zip(self.columns, row)) for row in self.rows], schema=self.schema)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def _closeFile(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Format -> writer class
+WRITERS = {"ndjson": NDJSONWriter, "json": JSONWriter, "csv": CSVWriter, "parquet": ParquetWriter}
+
+
+def openWriter(path, format=None, **options):
+    """
+    Open streaming writer of ads.
+
+    Params
+    ------
+    path : str
+        Output file, "-" for standard output.
+    format : str
+        Either "ndjson", "json", "csv" or "parquet". If left empty, it's guessed from file extension (NDJSON by default).
+    options :
+        Options of writer class (flushEvery, fsync, rowGroupSize...).
+
+    Returns
+    -------
+    writer : AdWriter
+        Writer, to be closed once crawl is done.
+    """
+    if format is None:
+        format = EXTENSIONS.get(Path(path).suffix.lower(), "ndjson")
+    try:
+        writerClass = WRITERS[format]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{format}', available formats : {', '.join(WRITERS)}")
+    return writerClass(path, **options)
+
+
+# === HELPER FUNCTIONS === #
+def _cell(value):
+    """
+    CSV cell of value : scalars as is, None as empty cell, nested values as JSON.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list, tuple)):
+        return encodeJSON(value).decode()
+    return value
+
+
+def _column(value, isString):
+    """
+    Parquet value : None and values of typed columns as is, nested values as JSON strings, other scalars as strings.
+    """
+    if value is None or not isString:
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return encodeJSON(value).decode()
+    return str(value)
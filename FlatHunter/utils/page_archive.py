@@ -0,0 +1,308 @@
+import bisect
+import mmap
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from FlatHunter.utils.logging_utils import logger
+
+# fcntl is only available on POSIX systems, elsewhere archive must have a single writing process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# zstd is optional, zlib (with preset dictionary) is used when it's not installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_FILENAME = "index.tsv"
+LOCK_FILENAME = "archive.lock"
+SEGMENT_FILENAME = "segment-{:05d}.seg"
+DICTIONARY_FILENAME = "dictionary-{}.{}"
+# zlib window size, longer preset dictionaries are useless
+ZLIB_DICTIONARY_SIZE = 32768
+
+
+class ArchiveEntry:
+    __slots__ = ("url", "fetchTime", "kind", "segment", "offset", "length", "codec", "dictID")
+
+    def __init__(self, url, fetchTime, kind, segment, offset, length, codec, dictID):
+        """
+        Location of one archived page in segment files.
+        """
+        self.url = url
+        self.fetchTime = fetchTime
+        self.kind = kind
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.codec = codec
+        self.dictID = dictID
+
+    def toLine(self):
+        return f"{self.url}\t{self.fetchTime!r}\t{self.kind}\t{self.segment}\t{self.offset}\t{self.length}\t{self.codec}\t{self.dictID}\n"
+
+    @classmethod
+    def fromLine(cls, line):
+        url, fetchTime, kind, segment, offset, length, codec, dictID = line.rstrip("\n").split("\t")
+        return cls(url, float(fetchTime), kind, int(segment), int(offset), int(length), codec, int(dictID))
+
+
+class PageArchive:
+    def __init__(self, folder, segmentSize=64 * 1024 * 1024):
+        """
+        Append-only archive of raw pages. Each page is compressed on its own (zstd if installed, zlib otherwise) with a shared
+        dictionary trained on site's pages, and appended to segment files. An index keyed by URL and fetch time gives each
+        page's location, so any page is read back in O(1) through mmap without loading whole segments.
+        An archive can be shared by threads, and by processes writing to same folder on POSIX systems (appends are
+        serialised by a file lock, pages archived by other processes are seen once archive is reopened). Elsewhere, only
+        one process should write to an archive.
+
+        Params
+        ------
+        folder : str
+            Archive folder, created if needed. Existing index is loaded.
+        segmentSize : int
+            Size (bytes) after which a new segment file is started.
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.segmentSize = segmentSize
+        self.lock = threading.Lock()
+        # URL -> entries sorted by fetch time
+        self.index = {}
+        self.dictionaries = {}
+        self.currentDictID = 0
+        self.maps = {}
+        self._loadDictionaries()
+        self._loadIndex()
+        segments = sorted(self.folder.glob("segment-*.seg"))
+        self.segment = int(segments[-1].stem.split("-")[1]) if segments else 0
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.index.values())
+
+    def train(self, samples, size=ZLIB_DICTIONARY_SIZE):
+        """
+        Train a shared dictionary on sample pages, used to compress all pages added afterwards (already archived pages keep
+        their dictionary).
+
+        Params
+        ------
+        samples : list
+            Raw contents (bytes) of typical pages (search and item's pages).
+        size : int
+            Dictionary size in bytes.
+
+        Returns
+        -------
+        dictID : int
+            ID of new dictionary.
+        """
+        codec = "zstd" if zstandard is not None else "zlib"
+        if codec == "zstd":
+            dictionary = zstandard.train_dictionary(size, list(samples)).as_bytes()
+        else:
+            dictionary = self._trainZlibDictionary(samples, min(size, ZLIB_DICTIONARY_SIZE))
+        with self.lock:
+            dictID = max(self.dictionaries, default=0) + 1
+            with open(self.folder / DICTIONARY_FILENAME.format(dictID, codec), "wb") as f:
+                f.write(dictionary)
+            self.dictionaries[dictID] = (codec, dictionary)
+            self.currentDictID = dictID
+        logger.info(f"Trained {codec} dictionary {dictID} ({len(dictionary)} bytes) on {len(samples)} pages")
+        return dictID
+
+    def put(self, url, content, kind="page", fetchTime=None):
+        """
+        Compress and append page to current segment.
+
+        Params
+        ------
+        url : str
+            URL of page.
+        content : bytes
+            Raw page content.
+        kind : str
+            Kind of page (e.g. "search" or "item").
+        fetchTime : float
+            Timestamp of fetch, defaults to now.
+
+        Returns
+        -------
+        entry : ArchiveEntry
+        """
+        fetchTime = time.time() if fetchTime is None else fetchTime
+        codec, compressed = self._compress(content, self.currentDictID)
+        with self.lock, self._fileLock():
+            # Other processes may have started new segments
+            while (self.folder / SEGMENT_FILENAME.format(self.segment + 1)).exists():
+                self.segment += 1
+            segmentPath = self.folder / SEGMENT_FILENAME.format(self.segment)
+            if segmentPath.exists() and segmentPath.stat().st_size + len(compressed) > self.segmentSize:
+                self.segment += 1
+                segmentPath = self.folder / SEGMENT_FILENAME.format(self.segment)
+            with open(segmentPath, "ab") as f:
+                offset = f.tell()
+                f.write(compressed)
+            entry = ArchiveEntry(url, fetchTime, kind, self.segment, offset, len(compressed), codec, self.currentDictID)
+            with open(self.folder / INDEX_FILENAME, "a") as f:
+                f.write(entry.toLine())
+            self._addToIndex(entry)
+        logger.debug(f"Archived {url} ({len(content)} -> {len(compressed)} bytes)")
+        return entry
+
+    def get(self, url, fetchTime=None):
+        """
+        Return raw content of page, None if it's not archived.
+
+        Params
+        ------
+        url : str
+            URL of page.
+        fetchTime : float
+            Return latest version fetched at or before this time, latest version if left empty.
+        """
+        entry = self.getEntry(url, fetchTime)
+        return self.read(entry) if entry is not None else None
+
+    def getEntry(self, url, fetchTime=None):
+        """
+        Return index entry of page (see `get()`), None if it's not archived.
+        """
+        entries = self.index.get(url)
+        if not entries:
+            return None
+        if fetchTime is None:
+            return entries[-1]
+        position = bisect.bisect_right([entry.fetchTime for entry in entries], fetchTime)
+        return entries[position - 1] if position > 0 else None
+
+    def entries(self, kind=None):
+        """
+        Iterate over all index entries (optionally of given kind only) ordered by fetch time.
+        """
+        allEntries = [entry for entries in self.index.values() for entry in entries if kind is None or entry.kind == kind]
+        return iter(sorted(allEntries, key=lambda entry: entry.fetchTime))
+
+    def read(self, entry):
+        """
+        Read and decompress archived page from its index entry.
+        """
+        # Map can be replaced (and closed) by another thread when segment grew, bytes are copied out under lock
+        with self.lock:
+            segmentMap = self._getMap(entry.segment, entry.offset + entry.length)
+            compressed = segmentMap[entry.offset:entry.offset + entry.length]
+        return self._decompress(compressed, entry.codec, entry.dictID)
+
+    def close(self):
+        """
+        Close memory maps of segments.
+        """
+        with self.lock:
+            for segmentMap in self.maps.values():
+                segmentMap.close()
+            self.maps = {}
+
+    # === HELPER FUNCTIONS === #
+    def _loadIndex(self):
+        indexPath = self.folder / INDEX_FILENAME
+        if not indexPath.exists():
+            return
+        with open(indexPath) as f:
+            for line in f:
+                if line.strip():
+                    self._addToIndex(ArchiveEntry.fromLine(line))
+
+    def _loadDictionaries(self):
+        for path in self.folder.glob("dictionary-*.*"):
+            dictID = int(path.stem.split("-")[1])
+            self.dictionaries[dictID] = (path.suffix[1:], path.read_bytes())
+        self.currentDictID = max(self.dictionaries, default=0)
+
+    def _addToIndex(self, entry):
+        entries = self.index.setdefault(entry.url, [])
+        if entries and entries[-1].fetchTime > entry.fetchTime:
+            bisect.insort(entries, entry, key=lambda e: e.fetchTime)
+        else:
+            entries.append(entry)
+
+    @contextmanager
+    def _fileLock(self):
+        """
+        Hold exclusive lock of archive shared with other processes (no-op without fcntl).
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self.folder / LOCK_FILENAME, "a") as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    def _getMap(self, segment, end):
+        """
+        Return memory map of segment, remapped if segment grew since it was mapped (should be called with `self.lock`
+        held).
+        """
+        segmentMap = self.maps.get(segment)
+        if segmentMap is None or len(segmentMap) < end:
+            if segmentMap is not None:
+                segmentMap.close()
+            with open(self.folder / SEGMENT_FILENAME.format(segment), "rb") as f:
+                segmentMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = segmentMap
+        return segmentMap
+
+    def _compress(self, content, dictID):
+        if dictID == 0:
+            if zstandard is not None:
+                return "zstd", zstandard.ZstdCompressor(level=10).compress(content)
+            return "zlib", zlib.compress(content, 9)
+        codec, dictionary = self.dictionaries[dictID]
+        if codec == "zstd":
+            compressor = zstandard.ZstdCompressor(level=10, dict_data=zstandard.ZstdCompressionDict(dictionary))
+            return codec, compressor.compress(content)
+        compressor = zlib.compressobj(9, zdict=dictionary)
+        return codec, compressor.compress(content) + compressor.flush()
+
+    def _decompress(self, compressed, codec, dictID):
+        if codec == "zstd":
+            if zstandard is None:
+                raise ImportError("Page was archived with zstd, 'zstandard' package is needed to read it")
+            if dictID == 0:
+                return zstandard.ZstdDecompressor().decompress(compressed)
+            dictionary = zstandard.ZstdCompressionDict(self.dictionaries[dictID][1])
+            return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(compressed)
+        if dictID == 0:
+            return zlib.decompress(compressed)
+        decompressor = zlib.decompressobj(zdict=self.dictionaries[dictID][1])
+        return decompressor.decompress(compressed) + decompressor.flush()
+
+    @staticmethod
+    def _trainZlibDictionary(samples, size):
+        """
+        Build zlib preset dictionary from lines shared by most samples (page boilerplate), most valuable lines last
+        since zlib favours closest matches.
+        """
+        counts = Counter()
+        for sample in samples:
+            counts.update(set(line.strip() for line in sample.splitlines() if len(line.strip()) > 8))
+        threshold = max(2, len(samples) // 2) if len(samples) > 1 else 1
+        shared = [line for line, count in counts.items() if count >= threshold]
+        shared.sort(key=lambda line: counts[line] * len(line), reverse=True)
+        selected = []
+        total = 0
+        for line in shared:
+            if total + len(line) + 1 > size:
+                continue
+            selected.append(line)
+            total += len(line) + 1
+        return b"\n".join(reversed(selected))
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from FlatHunter.utils.logging_utils import logger
+
+
+class ParsePool:
+    def __init__(self, parseWorkers=None, fetchWorkers=4):
+        """
+        Two stages pipeline : fetching threads (I/O bound) hand raw page content to a pool of parsing processes (CPU bound),
+        so that HTML parsing is not limited to one core by the GIL. Use it as a context manager.
+
+        Params
+        ------
+        parseWorkers : int
+            Number of parsing processes, defaults to number of CPUs.
+        fetchWorkers : int
+            Number of fetching threads.
+        """
+        self.parseWorkers = parseWorkers or os.cpu_count()
+        self.fetchWorkers = fetchWorkers
+        self.parsers = None
+        self.fetchers = None
+
+    def __enter__(self):
+        self.parsers = ProcessPoolExecutor(max_workers=self.parseWorkers)
+        self.fetchers = ThreadPoolExecutor(max_workers=self.fetchWorkers)
+        logger.debug(f"Started parse pool with {self.parseWorkers} processes and {self.fetchWorkers} fetching threads")
+        return self
+
+    def __exit__(self, *exc):
+        self.fetchers.shutdown()
+        self.parsers.shutdown()
+
+    def fetchAndParse(self, fetch, urls, parser, **kwargs):
+        """
+        Fetch URLs concurrently and parse each page content in pool as soon as it arrives : up to `parseWorkers` pages
+        are parsed at once, while fetching threads go on with next URLs.
+
+        Params
+        ------
+        fetch : callable
+            Function taking an URL and returning page content (bytes), or None if request failed.
+        urls : list
+            URLs to fetch.
+        parser : callable
+            Module level function (must be picklable) called as `parser(content, **kwargs)` in a worker process.
+            It should return compact data (never soups, they're expensive to send back to parent process).
+
+        Returns
+        -------
+        results : list
+            Parser results in same order as `urls`, None for pages that couldn't be fetched or parsed.
+        """
+        def fetchThenSubmit(url):
+            # Fetching thread only hands content to pool, it doesn't wait for parse : parses aren't limited by fetchWorkers
+            content = fetch(url)
+            if content is None:
+                return None
+            return self.parsers.submit(parser, content, **kwargs)
+
+        results = []
+        for url, parse in zip(urls, [self.fetchers.submit(fetchThenSubmit, url) for url in urls]):
+            parse = parse.result()
+            try:
+                results.append(parse.result() if parse is not None else None)
+            except Exception as e:
+                logger.error(f"Couldn't parse page '{url}' : {e}")
+                results.append(None)
+        return results
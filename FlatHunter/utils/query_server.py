@@ -0,0 +1,256 @@
+"""
+Local HTTP API answering filter queries from a result store (filled by scheduled crawls, see `scheduler.py --store`),
+instead of crawling website on each request. Query results are kept in an LRU cache, dropped as soon as a new run is
+finished, and responses carry an ETag so clients get `304 Not Modified` for pages they already have.
+Usage : python -m FlatHunter.utils.query_server <store> [--host HOST] [--port PORT] [--cache-size N]
+
+Endpoints :
+    GET /ads?minRent=1000&maxRent=2500&minRooms=3&page=2&pageSize=50 : matching ads of latest run (filter keys of
+        `getItems()`, all optional, plus `page`, `pageSize` and `runID` to query an older run).
+    GET /runs : runs of store, latest first.
+    GET /stats : cache counters.
+"""
+
+import argparse
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.output_writers import encodeJSON
+from FlatHunter.utils.result_store import FILTER_COLUMNS, ResultStore
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class QueryCache:
+    def __init__(self, maxSize=1024):
+        """
+        Thread-safe LRU cache of query results. Entries belong to a generation (latest finished run when they were
+        computed), a new generation drops every entry.
+
+        Params
+        ------
+        maxSize : int
+            Number of entries kept, 0 disables cache.
+        """
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.generation = None
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def setGeneration(self, generation):
+        """
+        Drop every entry if generation changed.
+        """
+        with self.lock:
+            if generation != self.generation:
+                if self.entries:
+                    self.stats["invalidations"] += 1
+                self.entries.clear()
+                self.generation = generation
+
+    def get(self, key):
+        """
+        Return cached value of key, None if it isn't cached.
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            if self.maxSize <= 0:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+
+class QueryAPI:
+    def __init__(self, store, cacheSize=1024):
+        """
+        Answer API requests from result store (HTTP independent, see `QueryHandler` for HTTP layer).
+
+        Params
+        ------
+        store : ResultStore
+            Store queried, it may be written by other processes meanwhile.
+        cacheSize : int
+            Number of query results (pages and counts) kept in LRU cache.
+        """
+        self.store = store
+        self.cache = QueryCache(cacheSize)
+
+    def handle(self, target, ifNoneMatch=None):
+        """
+        Answer a GET request.
+
+        Params
+        ------
+        target : str
+            Request path with its query string (e.g. "/ads?maxRent=2000&page=2").
+        ifNoneMatch : str
+            Value of `If-None-Match` header, if any.
+
+        Returns
+        -------
+        response : tuple
+            (status, headers, body) with body as JSON bytes (empty for 304).
+        """
+        url = urlsplit(target)
+        try:
+            params = dict(parse_qsl(url.query, strict_parsing=bool(url.query)))
+        except ValueError:
+            return self._error(400, "Malformed query string")
+        if url.path == "/ads":
+            return self._ads(params, ifNoneMatch)
+        if url.path == "/runs":
+            return 200, {}, encodeJSON(self.store.getRuns())
+        if url.path == "/stats":
+            return 200, {}, encodeJSON({**self.cache.stats, "entries": len(self.cache), "generation": self.cache.generation})
+        return self._error(404, f"Unknown path '{url.path}'")
+
+    # === HELPER FUNCTIONS === #
+    def _ads(self, params, ifNoneMatch):
+        """
+        Answer `/ads` query : one page of matching ads of latest finished run (or of `runID`).
+        """
+        try:
+            query = self._parseQuery(params)
+        except ValueError as e:
+            return self._error(400, str(e))
+        latest = self.store.getLatestRun()
+        self.cache.setGeneration(latest["runID"] if latest else None)
+        runID = query.pop("runID", None)
+        if runID is None:
+            if latest is None:
+                return self._error(404, "No finished run in store")
+            runID = latest["runID"]
+        elif latest is None or runID != latest["runID"]:
+            run = self.store.getRun(runID)
+            if run is None or run["finishedAt"] is None:
+                return self._error(404, f"No finished run {runID} in store")
+        page, pageSize = query.pop("page"), query.pop("pageSize")
+        filterKey = tuple(sorted(query.items()))
+        # Runs are never rewritten once finished : a query of a run always gives same response
+        etag = f'"{runID}-{hashlib.blake2b(repr((filterKey, page, pageSize)).encode(), digest_size=8).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if ifNoneMatch is not None and (ifNoneMatch.strip() == "*" or etag in [tag.strip() for tag in ifNoneMatch.split(",")]):
+            self.cache.stats["notModified"] += 1
+            return 304, headers, b""
+        body = self.cache.get(("page", runID, filterKey, page, pageSize))
+        if body is None:
+            total = self.cache.get(("count", runID, filterKey))
+            if total is None:
+                total = self.store.countRecords(runID, query)
+                self.cache.put(("count", runID, filterKey), total)
+            items = self.store.queryRecords(runID, query, pageSize, (page - 1) * pageSize)
+            body = encodeJSON({"runID": runID, "total": total, "page": page, "pageSize": pageSize, "items": items})
+            self.cache.put(("page", runID, filterKey, page, pageSize), body)
+        return 200, headers, body
+
+    @staticmethod
+    def _parseQuery(params):
+        """
+        Check and convert `/ads` query parameters, raise ValueError if one is invalid.
+        """
+        query = {"page": 1, "pageSize": DEFAULT_PAGE_SIZE}
+        for key, value in params.items():
+            if key in FILTER_COLUMNS:
+                try:
+                    query[key] = float(value)
+                except ValueError:
+                    raise ValueError(f"Parameter '{key}' must be a number") from None
+            elif key in ("page", "pageSize", "runID"):
+                try:
+                    query[key] = int(value)
+                except ValueError:
+                    raise ValueError(f"Parameter '{key}' must be an integer") from None
+                if query[key] < 1:
+                    raise ValueError(f"Parameter '{key}' must be positive")
+            else:
+                raise ValueError(f"Unknown parameter '{key}' (expected {', '.join([*FILTER_COLUMNS, 'page', 'pageSize', 'runID'])})")
+        query["pageSize"] = min(query["pageSize"], MAX_PAGE_SIZE)
+        return query
+
+    @staticmethod
+    def _error(status, message):
+        return status, {}, encodeJSON({"error": message})
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    HTTP layer of QueryAPI (`self.server.api`). Connections are kept alive between requests.
+    """
+    protocol_version = "HTTP/1.1"
+    # Headers and body are sent separately : without it, Nagle's algorithm holds body until client acknowledges headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        status, headers, body = self.server.api.handle(self.path, self.headers.get("If-None-Match"))
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Query API : {format % args}")
+
+
+def makeServer(store, host="127.0.0.1", port=8000, cacheSize=1024):
+    """
+    Build query API server (call `serve_forever()` to run it, port 0 picks a free port).
+
+    Params
+    ------
+    store : ResultStore
+        Store queried.
+    host : str
+        Interface listened on.
+    port : int
+        Port listened on.
+    cacheSize : int
+        Number of query results kept in LRU cache.
+    """
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.api = QueryAPI(store, cacheSize)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve filter queries over a result store.")
+    parser.add_argument("store", help="Path of result store (SQLite)")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface listened on")
+    parser.add_argument("--port", type=int, default=8000, help="Port listened on")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Number of query results kept in cache")
+    args = parser.parse_args()
+    resultStore = ResultStore(args.store)
+    server = makeServer(resultStore, args.host, args.port, args.cache_size)
+    logger.info(f"Query API listening on http://{args.host}:{server.server_address[1]}")
+    print(f"Query API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        resultStore.close()
@@ -0,0 +1,76 @@
+import heapq
+from FlatHunter.utils.crawl_budget import getPriority
+
+
+class TopK:
+    def __init__(self, k, score="rentPerM2"):
+        """
+        Bounded heap keeping the k ads with lowest score among a stream, in O(k) memory and O(log k) per ad. Ties are
+        won by earliest ad. Can be used as a `getItems()` sink.
+
+        Params
+        ------
+        k : int
+            Number of ads kept.
+        score : str or callable
+            Name of `DETAIL_PRIORITIES` (rentPerM2, rentPerRoom, rent, size, recency) or function of ad (lowest is best).
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        self.score = getPriority(score)
+        # Max-heap on (score, position) through negated keys : root is worst kept ad
+        self.heap = []
+        self.seen = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    @property
+    def full(self):
+        return len(self.heap) >= self.k
+
+    def push(self, ad):
+        """
+        Offer ad to ranking, return True if it's kept (for now).
+        """
+        score = self.score(ad)
+        position = self.seen
+        self.seen += 1
+        if not self.full:
+            heapq.heappush(self.heap, (-score, -position, ad))
+            return True
+        if score < -self.heap[0][0]:
+            heapq.heapreplace(self.heap, (-score, -position, ad))
+            return True
+        return False
+
+    def write(self, ad):
+        """
+        Sink interface (see `getItems()`), same as `push()`.
+        """
+        self.push(ad)
+
+    def threshold(self):
+        """
+        Score an ad must beat to enter ranking (infinite while ranking isn't full).
+        """
+        return -self.heap[0][0] if self.full else float("inf")
+
+    def canChange(self, lowerBound):
+        """
+        False if no ad scoring at least `lowerBound` can enter ranking anymore.
+        """
+        return lowerBound < self.threshold()
+
+    def items(self):
+        """
+        Return kept ads, best first.
+        """
+        return [ad for _, ad in self.scored()]
+
+    def scored(self):
+        """
+        Return kept (score, ad) pairs, best first.
+        """
+        return [(-negScore, ad) for negScore, _, ad in sorted(self.heap, key=lambda entry: (-entry[0], -entry[1]))]
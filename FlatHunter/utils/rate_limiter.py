@@ -0,0 +1,142 @@
+import threading
+import time
+from urllib.parse import urlsplit
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.redis_utils import ProcessLocalRedis
+from FlatHunter.utils.sqlite_utils import ProcessLocalSQLite
+
+# Book next slot of host (KEYS[1]) on server's clock, ARGV : interval. Returns wait (s) as a string (Lua numbers are
+# truncated to integers in replies). Key expires once its slot is long past.
+BOOK_SLOT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local slot = math.max(now, tonumber(redis.call('GET', KEYS[1]) or 0))
+redis.call('SET', KEYS[1], tostring(slot + tonumber(ARGV[1])), 'PX', math.ceil((slot - now + tonumber(ARGV[1])) * 1000) + 60000)
+return tostring(slot - now)
+"""
+
+
+class RateLimiter:
+    def __init__(self, requestsPerSecond=2.0, manager=None):
+        """
+        Per-host request budget : requests to a host are spaced by at least `1 / requestsPerSecond` seconds, whoever makes
+        them. Each call to `wait()` books the next free slot of host and sleeps until it.
+
+        Params
+        ------
+        requestsPerSecond : float
+            Budget per host.
+        manager : multiprocessing.managers.SyncManager
+            If given, slots and lock live in manager's process, so the limiter (pickled along with jobs) is shared by worker
+            processes. Otherwise, it's only shared by threads of current process.
+        """
+        self.interval = 1.0 / requestsPerSecond
+        if manager is not None:
+            self.lock = manager.Lock()
+            self.nextSlots = manager.dict()
+        else:
+            self.lock = threading.Lock()
+            self.nextSlots = {}
+
+    def wait(self, url):
+        """
+        Block until a request to URL's host fits in budget.
+
+        Returns
+        -------
+        waited : float
+            Time slept (s).
+        """
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            # Wall clock is shared by processes, monotonic clocks aren't guaranteed to be
+            now = time.time()
+            slot = max(now, self.nextSlots.get(host, 0.0))
+            self.nextSlots[host] = slot + self.interval
+        waited = slot - now
+        if waited > 0:
+            logger.debug(f"Rate limit : waiting {waited:.2f}s before requesting {host}")
+            time.sleep(waited)
+        return max(waited, 0.0)
+
+
+class SQLiteRateLimiter(ProcessLocalSQLite):
+    # Transactions are explicit
+    isolationLevel = None
+
+    def __init__(self, path, requestsPerSecond=2.0):
+        """
+        RateLimiter whose slots live in a SQLite database, so one per-host budget is shared by every process of machine
+        opening it (e.g. distributed workers sharing a work queue's folder). Same interface as `RateLimiter`, see
+        RedisRateLimiter for several machines.
+
+        Params
+        ------
+        path : str
+            Path of SQLite database, created if needed.
+        requestsPerSecond : float
+            Budget per host.
+        """
+        self.path = str(path)
+        self.interval = 1.0 / requestsPerSecond
+        self._initConnection()
+        with self.lock:
+            self._getConnection().execute("CREATE TABLE IF NOT EXISTS slots (host TEXT PRIMARY KEY, nextSlot REAL NOT NULL)")
+
+    def wait(self, url):
+        """
+        Block until a request to URL's host fits in budget, return time slept (s).
+        """
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            connection = self._getConnection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = connection.execute("SELECT nextSlot FROM slots WHERE host = ?", (host,)).fetchone()
+                slot = max(now, row[0] if row is not None else 0.0)
+                connection.execute("INSERT OR REPLACE INTO slots VALUES (?, ?)", (host, slot + self.interval))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        waited = slot - now
+        if waited > 0:
+            logger.debug(f"Rate limit : waiting {waited:.2f}s before requesting {host}")
+            time.sleep(waited)
+        return max(waited, 0.0)
+
+
+class RedisRateLimiter(ProcessLocalRedis):
+    scripts = {"book": BOOK_SLOT}
+
+    def __init__(self, url, requestsPerSecond=2.0, prefix="flathunter:rate"):
+        """
+        RateLimiter whose slots live on a Redis server (requires `redis` package), so one per-host budget is shared by
+        workers of several machines. Slots are booked on server's clock, machines' clocks don't need to agree. Same
+        interface as `RateLimiter`.
+
+        Params
+        ------
+        url : str
+            URL of Redis server (e.g. "redis://queue-host:6379/0").
+        requestsPerSecond : float
+            Budget per host.
+        prefix : str
+            Prefix of keys of slots.
+        """
+        self.url = url
+        self.prefix = prefix
+        self.interval = 1.0 / requestsPerSecond
+        self._initClient()
+
+    def wait(self, url):
+        """
+        Block until a request to URL's host fits in budget, return time slept (s).
+        """
+        host = urlsplit(url).netloc.lower()
+        waited = float(self._runScript("book", keys=(self._key(host),), args=(self.interval,)))
+        if waited > 0:
+            logger.debug(f"Rate limit : waiting {waited:.2f}s before requesting {host}")
+            time.sleep(waited)
+        return max(waited, 0.0)
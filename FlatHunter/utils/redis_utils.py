@@ -0,0 +1,64 @@
+import os
+
+# redis is only needed by Redis-backed components (work queue and rate limiter shared by several machines)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def isRedisURL(location):
+    """
+    True if location is a Redis URL (redis://, rediss:// or unix://) rather than a local path.
+    """
+    return str(location).startswith(("redis://", "rediss://", "unix://"))
+
+
+class ProcessLocalRedis:
+    """
+    Mixin of Redis-backed components shared by processes of any number of machines : each process opens its own client
+    to server `self.url` (with Lua scripts of `self.scripts` registered on it), and pickled copies get a new client.
+    Keys are prefixed by `self.prefix`, so several queues can share one server. Scripts touch keys built from prefix, so
+    server must be a single Redis-compatible instance (not a cluster).
+    """
+    # Script name -> Lua source
+    scripts = {}
+
+    def _initClient(self):
+        """
+        Should be called by constructor, once `self.url` and `self.prefix` are set.
+        """
+        if redis is None:
+            raise ImportError("'redis' package is needed to use a Redis server")
+        self.client = None
+        self.pid = None
+        self.registeredScripts = None
+
+    def _getClient(self):
+        """
+        Return client of current process (clients are thread-safe).
+        """
+        if self.client is None or self.pid != os.getpid():
+            self.client = redis.Redis.from_url(self.url, decode_responses=True)
+            self.registeredScripts = {name: self.client.register_script(source) for name, source in self.scripts.items()}
+            self.pid = os.getpid()
+        return self.client
+
+    def _runScript(self, name, keys=(), args=()):
+        self._getClient()
+        return self.registeredScripts[name](keys=list(keys), args=list(args))
+
+    def _key(self, *parts):
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def __getstate__(self):
+        # Client is recreated in other processes
+        state = self.__dict__.copy()
+        state["client"] = None
+        state["registeredScripts"] = None
+        return state
@@ -0,0 +1,130 @@
+"""
+Re-run extraction over archived pages (search and item's pages) on all cores, without network access, and write fresh
+records to result store.
+Usage : python -m FlatHunter.utils.reextract <archiveFolder> <storePath> [--category flat] [--workers N]
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from FlatHunter.modules.ImmoCH import ImmoCH, extractItemPage, extractSearchPage, fieldDefaults
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.page_archive import PageArchive
+from FlatHunter.utils.result_store import ResultStore
+
+# Item's page version used for a search page is the latest one fetched within this delay (s) of it : an older one may
+# describe a previous listing of same URL, record then keeps card fields only (as if item's page wasn't archived)
+ITEM_PAGE_WINDOW = 3600
+
+# Archive opened once per worker process
+_workerArchive = None
+
+
+def _initWorker(archiveFolder):
+    global _workerArchive
+    _workerArchive = PageArchive(archiveFolder)
+
+
+def reextractSearchPage(entry, itemCategory, fastPath=False):
+    """
+    Worker function : extract all records of an archived search page, joined with their archived item's page.
+
+    Params
+    ------
+    entry : ArchiveEntry
+        Index entry of search page.
+
+    Returns
+    -------
+    result : tuple
+        (records, numberOfPagesRead)
+    """
+    records = []
+    pagesRead = 1
+    try:
+        searchPage = extractSearchPage(_workerArchive.read(entry), itemCategory=itemCategory)
+    except Exception as e:
+        logger.error(f"Couldn't re-extract search page '{entry.url}' ({entry.fetchTime}) : {e}")
+        return records, pagesRead
+    defaults = fieldDefaults(itemCategory)
+    for record in searchPage["ads"]:
+        record["crawledAt"] = entry.fetchTime
+        # Item's page fields default like in a crawl (see `ImmoCH._addItemFields()`), archived item's page overrides them
+        record.update({key: value for key, value in defaults.items() if key not in record})
+        itemEntry = None
+        if record["link"] != None:
+            itemEntry = _workerArchive.getEntry(record["link"], entry.fetchTime + ITEM_PAGE_WINDOW)
+            if itemEntry is not None and itemEntry.fetchTime < entry.fetchTime - ITEM_PAGE_WINDOW:
+                itemEntry = None
+        if itemEntry is not None:
+            record.update(extractItemPage(_workerArchive.read(itemEntry), itemCategory=itemCategory, fastPath=fastPath))
+            pagesRead += 1
+        records.append(record)
+    return records, pagesRead
+
+
+def reextractArchive(archiveFolder, store, itemCategory="flat", workers=None, fastPath=False):
+    """
+    Re-extract every archived search page in a process pool and write records to result store as a new run.
+
+    Params
+    ------
+    archiveFolder : str
+        Folder of PageArchive.
+    store : ResultStore
+        Store where records are written.
+    itemCategory : str
+        Item category of archived searches.
+    workers : int
+        Number of processes, defaults to number of CPUs.
+    fastPath : bool
+        Decode item's pages from embedded payloads (see `ImmoCH.getDetailData()`).
+
+    Returns
+    -------
+    stats : dict
+        Dictionnary with `runID`, `pages`, `records`, `seconds` and `pagesPerSecond` keys.
+    """
+    archive = PageArchive(archiveFolder)
+    searchEntries = list(archive.entries(kind="search"))
+    archive.close()
+    runID = store.startRun("reextract", ImmoCH.extractorVersion)
+    start = time.perf_counter()
+    pages = 0
+    records = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(str(archiveFolder),)) as pool:
+        results = pool.map(
+            reextractSearchPage,
+            searchEntries,
+            [itemCategory] * len(searchEntries),
+            [fastPath] * len(searchEntries),
+            chunksize=4,
+        )
+        for pageRecords, pagesRead in results:
+            records += store.putRecords(runID, pageRecords)
+            pages += pagesRead
+    store.finishRun(runID)
+    seconds = time.perf_counter() - start
+    stats = {
+        "runID": runID,
+        "pages": pages,
+        "records": records,
+        "seconds": seconds,
+        "pagesPerSecond": pages / seconds if seconds > 0 else 0.0,
+    }
+    logger.info(f"Re-extracted {pages} pages ({records} records) in {seconds:.1f}s : {stats['pagesPerSecond']:.1f} pages/s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run extraction over archived pages.")
+    parser.add_argument("archive", help="Folder of page archive")
+    parser.add_argument("store", help="Path of result store (SQLite)")
+    parser.add_argument("--category", default="flat", choices=["flat", "industrial", "commercial"])
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (defaults to number of CPUs)")
+    parser.add_argument("--fast-path", action="store_true", help="Decode item's pages from embedded payloads")
+    args = parser.parse_args()
+    resultStore = ResultStore(args.store)
+    stats = reextractArchive(args.archive, resultStore, args.category, args.workers, args.fast_path)
+    resultStore.close()
+    print(f"Run {stats['runID']} : {stats['pages']} pages, {stats['records']} records, {stats['pagesPerSecond']:.1f} pages/s")
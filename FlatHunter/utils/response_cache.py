@@ -0,0 +1,98 @@
+import time
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.misc_utils import canonicalURL
+from FlatHunter.utils.sqlite_utils import ProcessLocalSQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    storedAt REAL NOT NULL,
+    lastAccess REAL NOT NULL,
+    size INTEGER NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responsesByAccess ON responses (lastAccess);
+"""
+
+# Default time to live (s) of responses per kind of page
+DEFAULT_TTLS = {"search": 300, "item": 86400, "page": 3600}
+
+
+class ResponseCache(ProcessLocalSQLite):
+    def __init__(self, path, maxBytes=512 * 1024 * 1024, ttls=None):
+        """
+        On-disk cache of page contents keyed by canonical URL, with a time to live per kind of page and a total size bounded
+        by evicting least recently used responses. Backed by SQLite (WAL mode), so it can be shared by threads and by
+        concurrent worker processes of one machine.
+
+        Params
+        ------
+        path : str
+            Path of SQLite database, created if needed.
+        maxBytes : int
+            Maximum total size of cached contents.
+        ttls : dict
+            Time to live (s) per kind of page (see `FlatHunterBase.getPageKind()`), merged with `DEFAULT_TTLS`.
+        """
+        self.path = str(path)
+        self.maxBytes = maxBytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._initConnection()
+        with self.lock:
+            self._getConnection().executescript(SCHEMA)
+
+    def get(self, url, kind="page"):
+        """
+        Return cached content of URL, None if it's not cached or expired.
+        """
+        key = canonicalURL(url)
+        now = time.time()
+        with self.lock:
+            connection = self._getConnection()
+            row = connection.execute("SELECT storedAt, content FROM responses WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.ttls.get(kind, self.ttls["page"]):
+                with connection:
+                    connection.execute("DELETE FROM responses WHERE url = ?", (key,))
+                return None
+            with connection:
+                connection.execute("UPDATE responses SET lastAccess = ? WHERE url = ?", (now, key))
+        return bytes(row[1])
+
+    def put(self, url, content, kind="page"):
+        """
+        Cache content of URL, then evict least recently used responses while total size is over `maxBytes`.
+        """
+        key = canonicalURL(url)
+        now = time.time()
+        with self.lock:
+            connection = self._getConnection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", (key, kind, now, now, len(content), content)
+                )
+                self._evict(connection)
+
+    def totalBytes(self):
+        """
+        Return total size of cached contents.
+        """
+        with self.lock:
+            return self._getConnection().execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    # === HELPER FUNCTIONS === #
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.maxBytes:
+            return
+        evicted = 0
+        for url, size in connection.execute("SELECT url, size FROM responses ORDER BY lastAccess").fetchall():
+            if total <= self.maxBytes:
+                break
+            connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} responses from cache, total size is now {total} bytes")
+
@@ -0,0 +1,258 @@
+import json
+import time
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.market_stats import BUCKET_FIELDS, BucketStats, MarketStats
+from FlatHunter.utils.sqlite_utils import ProcessLocalSQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    runID INTEGER PRIMARY KEY AUTOINCREMENT,
+    startedAt REAL NOT NULL,
+    finishedAt REAL,
+    source TEXT NOT NULL,
+    extractorVersion TEXT,
+    records INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ads (
+    dataID INTEGER NOT NULL,
+    runID INTEGER NOT NULL,
+    crawledAt REAL NOT NULL,
+    link TEXT,
+    rent INTEGER,
+    rooms REAL,
+    size INTEGER,
+    record TEXT NOT NULL,
+    PRIMARY KEY (dataID, runID, crawledAt)
+);
+CREATE INDEX IF NOT EXISTS adsByRun ON ads (runID);
+-- Covers filter queries : matching records are counted and sorted without reading them
+CREATE INDEX IF NOT EXISTS adsByRunFilter ON ads (runID, rent, rooms, size, dataID, crawledAt);
+CREATE TABLE IF NOT EXISTS marketStats (
+    runID INTEGER NOT NULL,
+    category TEXT,
+    region TEXT,
+    rooms REAL,
+    sizeBand INTEGER,
+    stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS marketStatsByRun ON marketStats (runID);
+"""
+
+# Filter keys -> (column, comparison)
+FILTER_COLUMNS = {
+    "minRent": ("rent", ">="),
+    "maxRent": ("rent", "<="),
+    "minRooms": ("rooms", ">="),
+    "maxRooms": ("rooms", "<="),
+    "minSize": ("size", ">="),
+    "maxSize": ("size", "<="),
+}
+
+
+class ResultStore(ProcessLocalSQLite):
+    def __init__(self, path, geoIndex=None):
+        """
+        SQLite store of extracted ads. Each crawl (live or re-extraction) is a run and its records are kept per run, so
+        history is never overwritten. Safe to use from several threads and worker processes of one machine (see
+        ProcessLocalSQLite).
+
+        Params
+        ------
+        path : str
+            Path of SQLite database, created if needed.
+        geoIndex : GeoIndex
+            Spatial index of listed ads : coordinates of records put in store are added, and ads missing from a finished
+            run are removed (see `finishRun()`). Use `loadGeoIndex()` to fill it from existing records.
+        """
+        self.path = str(path)
+        self.geoIndex = geoIndex
+        self._initConnection()
+        with self.lock:
+            self._getConnection().executescript(SCHEMA)
+
+    def startRun(self, source, extractorVersion=None):
+        """
+        Register a new run and return its ID.
+
+        Params
+        ------
+        source : str
+            What produced records (e.g. "crawl" or "reextract").
+        extractorVersion : str
+            Version of extraction code.
+        """
+        with self.lock, self._getConnection():
+            cursor = self._getConnection().execute(
+                "INSERT INTO runs (startedAt, source, extractorVersion) VALUES (?, ?, ?)", (time.time(), source, extractorVersion)
+            )
+        return cursor.lastrowid
+
+    def putRecords(self, runID, records, crawledAt=None):
+        """
+        Add records of run (records with same data-id and crawl time replace each other).
+
+        Params
+        ------
+        runID : int
+            ID returned by `startRun()`.
+        records : iterable
+            Ad dictionnaries with at least a `data-id` key.
+        crawledAt : float
+            Crawl timestamp used for records without `crawledAt` key, defaults to now.
+        """
+        crawledAt = time.time() if crawledAt is None else crawledAt
+        records = list(records)
+        rows = [
+            (
+                record["data-id"],
+                runID,
+                record.get("crawledAt", crawledAt),
+                record.get("link"),
+                record.get("rent"),
+                record.get("rooms"),
+                record.get("size"),
+                json.dumps(record, separators=(",", ":"), ensure_ascii=False),
+            )
+            for record in records
+        ]
+        with self.lock, self._getConnection():
+            self._getConnection().executemany("INSERT OR REPLACE INTO ads VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._getConnection().execute("UPDATE runs SET records = records + ? WHERE runID = ?", (len(rows), runID))
+            if self.geoIndex is not None:
+                self.geoIndex.addRecords(records)
+        return len(rows)
+
+    def finishRun(self, runID):
+        """
+        Mark run as finished, its records become the latest ones. Ads it didn't find are removed from geoIndex.
+        """
+        with self.lock, self._getConnection():
+            self._getConnection().execute("UPDATE runs SET finishedAt = ? WHERE runID = ?", (time.time(), runID))
+            if self.geoIndex is not None:
+                listed = {row[0] for row in self._getConnection().execute("SELECT DISTINCT dataID FROM ads WHERE runID = ?", (runID,))}
+                removed = self.geoIndex.retain(listed)
+                logger.info(f"Removed {removed} ads no longer listed from geo index")
+        logger.info(f"Finished run {runID} in result store '{self.path}'")
+
+    def getRecords(self, runID):
+        """
+        Return all records of a run.
+        """
+        with self.lock:
+            rows = self._getConnection().execute("SELECT record FROM ads WHERE runID = ? ORDER BY crawledAt, dataID", (runID,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def getHistory(self, dataID):
+        """
+        Return all records of an ad (every run), ordered by crawl time.
+        """
+        with self.lock:
+            rows = self._getConnection().execute("SELECT record FROM ads WHERE dataID = ? ORDER BY crawledAt", (dataID,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def putMarketStats(self, runID, stats):
+        """
+        Add market statistics (see MarketStats) of run, one row per bucket. Statistics put several times for a run (e.g.
+        by several workers) are merged when read.
+        """
+        rows = [
+            (runID, *key, json.dumps(bucket.toDict(), separators=(",", ":")))
+            for key, bucket in stats.buckets.items()
+        ]
+        with self.lock, self._getConnection():
+            self._getConnection().executemany("INSERT INTO marketStats VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def getMarketStats(self, runIDs=None):
+        """
+        Return MarketStats merging statistics of given runs (all runs if left empty), without reading any record.
+        """
+        query = f"SELECT {', '.join(BUCKET_FIELDS)}, stats FROM marketStats"
+        params = ()
+        if runIDs is not None:
+            runIDs = list(runIDs)
+            query += f" WHERE runID IN ({', '.join('?' for _ in runIDs)})"
+            params = runIDs
+        with self.lock:
+            rows = self._getConnection().execute(query, params).fetchall()
+        stats = MarketStats()
+        for *key, bucket in rows:
+            stats.mergeBucket(tuple(key), BucketStats.fromDict(json.loads(bucket)))
+        return stats
+
+    def queryRecords(self, runID, filter=None, limit=None, offset=0):
+        """
+        Return records of a run matching filter, ordered by data-id.
+
+        Params
+        ------
+        runID : int
+            Run queried.
+        filter : dict
+            Optional "minRent", "maxRent", "minSize", "maxSize", "minRooms" and "maxRooms" keys (bounds included, as in
+            `getItems()`), missing keys don't restrict.
+        limit : int
+            Maximum number of records returned, all if left empty.
+        offset : int
+            Number of matching records skipped.
+        """
+        where, params = _filterClause(filter)
+        # Page is selected from index alone, then only its records are read
+        query = (
+            f"SELECT record FROM ads WHERE rowid IN (SELECT rowid FROM ads WHERE runID = ?{where} "
+            "ORDER BY dataID, crawledAt LIMIT ? OFFSET ?) ORDER BY dataID, crawledAt"
+        )
+        with self.lock:
+            rows = self._getConnection().execute(query, (runID, *params, -1 if limit is None else limit, offset)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def countRecords(self, runID, filter=None):
+        """
+        Return number of records of a run matching filter (see `queryRecords()`).
+        """
+        where, params = _filterClause(filter)
+        with self.lock:
+            return self._getConnection().execute(f"SELECT COUNT(*) FROM ads WHERE runID = ?{where}", (runID, *params)).fetchone()[0]
+
+    def getRun(self, runID):
+        """
+        Return run as dictionnary, None if it doesn't exist.
+        """
+        with self.lock:
+            cursor = self._getConnection().execute("SELECT * FROM runs WHERE runID = ?", (runID,))
+            row = cursor.fetchone()
+            return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def getLatestRun(self):
+        """
+        Return latest finished run as dictionnary, None if no run finished yet.
+        """
+        with self.lock:
+            cursor = self._getConnection().execute("SELECT * FROM runs WHERE finishedAt IS NOT NULL ORDER BY runID DESC LIMIT 1")
+            row = cursor.fetchone()
+            return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def getRuns(self):
+        """
+        Return runs as dictionnaries, latest first.
+        """
+        with self.lock:
+            cursor = self._getConnection().execute("SELECT * FROM runs ORDER BY runID DESC")
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+
+# === HELPER FUNCTIONS === #
+def _filterClause(filter):
+    """
+    Build SQL condition (starting with " AND ") and its parameters from filter keys.
+    """
+    conditions = []
+    params = []
+    for key, value in (filter or {}).items():
+        if key in FILTER_COLUMNS and value is not None:
+            column, comparison = FILTER_COLUMNS[key]
+            conditions.append(f" AND {column} {comparison} ?")
+            params.append(value)
+    return "".join(conditions), params
@@ -0,0 +1,188 @@
+"""
+Run several (region, category, filter) crawl jobs in parallel worker processes, within a global per-host rate budget, and
+merge their outputs into one result set.
+Usage : python -m FlatHunter.utils.scheduler <jobsFile> [--workers N] [--rate R] [--store STORE]
+where jobsFile is a JSON list of jobs, e.g. [{"region": "vaud", "category": "flat", "filter": {...}, "pagesToSearch": 2}]
+and STORE a result store where merged items are committed as a new run (e.g. served by `query_server.py`).
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from FlatHunter.modules.ImmoCH import ImmoCH
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.market_stats import MarketStats
+from FlatHunter.utils.rate_limiter import RateLimiter
+from FlatHunter.utils.result_store import ResultStore
+
+
+def runJob(job, rateLimiter=None, siteClass=ImmoCH, siteOptions=None):
+    """
+    Worker function : crawl one job and return its items with timing.
+
+    Params
+    ------
+    job : dict
+        Dictionnary with following keys :
+            <region> str : Region slug (see `ImmoCH`).
+            <category> str : Item category.
+            <filter> dict : Filter passed to `getItems()`.
+            <pagesToSearch> int : Optional number of pages to search.
+    rateLimiter : RateLimiter
+        Limiter shared by all jobs.
+    siteClass : type
+        Site class crawled.
+    siteOptions : dict
+        Extra keyword arguments of site class (fastPath, responseCache...).
+
+    Returns
+    -------
+    result : dict
+        Dictionnary with `items`, `seconds`, `stats`, `market` (MarketStats of items) and `error` keys (error is None if
+        job succeeded).
+    """
+    start = time.perf_counter()
+    result = {"items": [], "stats": {}, "market": MarketStats(job["category"], job["region"]), "error": None}
+    try:
+        site = siteClass(job["category"], region=job["region"], rateLimiter=rateLimiter, **(siteOptions or {}))
+        # Market statistics are a sink : they're updated as ads are matched
+        result["items"] = site.getItems(job["filter"], pagesToSearch=job.get("pagesToSearch"), sinks=[result["market"]])
+        result["stats"] = dict(site.stats)
+    except Exception as e:
+        logger.error(f"Job {job['region']}/{job['category']} failed : {e}")
+        result["error"] = repr(e)
+        # Ads matched before failure aren't returned, neither are their statistics
+        result["market"] = MarketStats(job["category"], job["region"])
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class CrawlScheduler:
+    def __init__(self, jobs, workers=None, requestsPerSecond=2.0, siteClass=ImmoCH, siteOptions=None):
+        """
+        Crawl jobs in a process pool. All workers share one per-host rate budget (held by a manager process), so adding
+        workers speeds up parsing and waiting on slow responses but never raises request rate above budget.
+
+        Params
+        ------
+        jobs : list
+            Jobs dictionnaries (see `runJob()`).
+        workers : int
+            Number of processes, defaults to number of jobs (capped to number of CPUs).
+        requestsPerSecond : float
+            Budget per host, for all workers together.
+        siteClass : type
+            Site class crawled (must be importable by workers).
+        siteOptions : dict
+            Extra keyword arguments of site class, they must be picklable.
+        """
+        self.jobs = jobs
+        self.workers = workers or min(len(jobs), multiprocessing.cpu_count()) or 1
+        self.requestsPerSecond = requestsPerSecond
+        self.siteClass = siteClass
+        self.siteOptions = siteOptions or {}
+
+    def run(self):
+        """
+        Run all jobs and merge their items. An ad matched by several jobs appears once, with every matching job index.
+
+        Returns
+        -------
+        result : dict
+            Dictionnary with following keys :
+                <items> list : Merged ads, each one with `region`, `category` and `jobs` keys added.
+                <jobs> list : Per job report (job, number of items, seconds, stats and error), in jobs order.
+                <market> MarketStats : Market statistics of all jobs (ads matched by several jobs count once per job).
+                <seconds> float : Total wall time.
+        """
+        start = time.perf_counter()
+        with multiprocessing.Manager() as manager:
+            rateLimiter = RateLimiter(self.requestsPerSecond, manager=manager)
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [
+                    pool.submit(runJob, job, rateLimiter, self.siteClass, self.siteOptions) for job in self.jobs
+                ]
+                results = [future.result() for future in futures]
+        merged = self.mergeResults(self.jobs, results)
+        merged["seconds"] = time.perf_counter() - start
+        logger.info(f"Ran {len(self.jobs)} jobs in {merged['seconds']:.1f}s : {len(merged['items'])} items")
+        return merged
+
+    @staticmethod
+    def mergeResults(jobs, results):
+        """
+        Merge results of `runJob()` (see `run()`).
+        """
+        items = []
+        byID = {}
+        reports = []
+        market = MarketStats()
+        for jobIndex, (job, result) in enumerate(zip(jobs, results)):
+            if result.get("market") is not None:
+                market.merge(result["market"])
+            for item in result["items"]:
+                dataID = item.get("data-id")
+                if dataID is not None and dataID in byID:
+                    byID[dataID]["jobs"].append(jobIndex)
+                    continue
+                item = {**item, "region": job["region"], "category": job["category"], "jobs": [jobIndex]}
+                if dataID is not None:
+                    byID[dataID] = item
+                items.append(item)
+            reports.append(
+                {
+                    "job": job,
+                    "items": len(result["items"]),
+                    "seconds": result["seconds"],
+                    "stats": result["stats"],
+                    "error": result["error"],
+                }
+            )
+        return {"items": items, "jobs": reports, "market": market}
+
+
+def storeResults(store, merged, extractorVersion=None):
+    """
+    Commit merged items and market statistics of `CrawlScheduler.run()` as a new run of result store. The run only
+    becomes the latest one once all its records are written.
+
+    Params
+    ------
+    store : ResultStore
+        Result store.
+    merged : dict
+        Result of `CrawlScheduler.run()` (or `mergeResults()`).
+    extractorVersion : str
+        Version of extraction code of site crawled.
+
+    Returns
+    -------
+    runID : int
+        ID of run.
+    """
+    runID = store.startRun("crawl", extractorVersion)
+    store.putRecords(runID, (item for item in merged["items"] if item.get("data-id") is not None))
+    if merged.get("market") is not None:
+        store.putMarketStats(runID, merged["market"])
+    store.finishRun(runID)
+    return runID
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run crawl jobs in parallel processes.")
+    parser.add_argument("jobs", help="JSON file with list of jobs")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes")
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per second per host, for all workers")
+    parser.add_argument("--store", help="Path of result store (SQLite) where merged items are committed as a new run")
+    args = parser.parse_args()
+    with open(args.jobs) as f:
+        jobList = json.load(f)
+    merged = CrawlScheduler(jobList, args.workers, args.rate).run()
+    if args.store:
+        resultStore = ResultStore(args.store)
+        merged["runID"] = storeResults(resultStore, merged, ImmoCH.extractorVersion)
+        resultStore.close()
+    merged["market"] = merged["market"].summary()
+    print(json.dumps(merged, indent=4, ensure_ascii=False))
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self, memoize=False):
+        """
+        Coalesce concurrent calls sharing a key : only the first caller runs the function, others wait for its result.
+        Results are only held while a call is in flight. If `memoize` is True, results (other than None) are also kept, so
+        later calls with same key reuse them until `reset()` (memory then grows with number of keys).
+        """
+        self.memoize = memoize
+        self.lock = threading.Lock()
+        self.inFlight = {}
+        self.results = {}
+
+    def do(self, key, function):
+        """
+        Run `function()` once per key.
+
+        Returns
+        -------
+        result : tuple
+            (result, sharedFrom) where `sharedFrom` is None if this call ran function, "inFlight" if it waited for a
+            concurrent call and "memo" if result was already known.
+        """
+        with self.lock:
+            if key in self.results:
+                return self.results[key], "memo"
+            future = self.inFlight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inFlight[key] = future
+        if not leader:
+            return future.result(), "inFlight"
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            with self.lock:
+                del self.inFlight[key]
+            raise
+        with self.lock:
+            del self.inFlight[key]
+            if self.memoize and result is not None:
+                self.results[key] = result
+        future.set_result(result)
+        return result, None
+
+    def reset(self):
+        """
+        Forget memoized results (in-flight calls are not affected).
+        """
+        with self.lock:
+            self.results = {}
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import threading
+
+
+class ProcessLocalSQLite:
+    """
+    Mixin of SQLite-backed components shared by threads and by worker processes of one host : each process opens its own
+    connection (SQLite connections can't be shared with forked processes) to its database, in WAL mode, and
+    pickled copies get a new lock and connection.
+
+    WAL mode needs shared memory and working file locks, so database must be on a local filesystem, never on a network
+    mount shared by several machines (see ProcessLocalRedis).
+    """
+    # Isolation level of connections, None is autocommit mode (transactions are explicit)
+    isolationLevel = ""
+
+    def _initConnection(self, path=None):
+        """
+        Should be called by constructor, with path of database (defaults to `self.path`, once it's set).
+        """
+        self.databasePath = str(self.path if path is None else path)
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+
+    def _getConnection(self):
+        """
+        Return connection of current process (should be called with `self.lock` held).
+        """
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.databasePath, timeout=30, check_same_thread=False, isolation_level=self.isolationLevel)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.pid = os.getpid()
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __getstate__(self):
+        # Connection and lock are recreated in other processes
+        state = self.__dict__.copy()
+        state["connection"] = None
+        state["lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -0,0 +1,151 @@
+import codecs
+from html.parser import HTMLParser
+
+# Elements that never have an end tag
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+
+
+class RegionCollector(HTMLParser):
+    def __init__(self, regions):
+        """
+        Incremental (feed-style) parser that keeps raw HTML of some regions of a page only, so that a page can be parsed
+        while it's downloaded and reading can stop as soon as all needed regions are closed.
+
+        Params
+        ------
+        regions : list
+            List of dictionnaries describing regions, with keys :
+                <name> str : Name given to region's fragments
+                <tag> str : Tag name of region's root (optional, any tag if left empty)
+                <class> str : Class of region's root (optional)
+                <id> str : Id of region's root (optional)
+                <last> bool : If True, nothing is needed after this region is closed (optional)
+        """
+        super().__init__(convert_charrefs=False)
+        self.regions = regions
+        self.pendingLast = sum(1 for region in regions if region.get("last"))
+        self.done = False
+        # Closed regions not yet consumed, as (name, html) tuples
+        self.closed = []
+        # Currently open region : region dict, root tag name, nesting depth of root tag and raw HTML parts
+        self.current = None
+        self.rootTag = None
+        self.depth = 0
+        self.parts = []
+
+    def popClosed(self):
+        """
+        Return closed regions since last call, as a list of (name, html) tuples in document order.
+        """
+        closed, self.closed = self.closed, []
+        return closed
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self.current is None:
+            region = self._matchRegion(tag, attrs)
+            if region is None:
+                return
+            self.current = region
+            self.rootTag = tag
+            self.depth = 0
+            self.parts = []
+        self.parts.append(self.get_starttag_text())
+        if tag == self.rootTag and tag not in VOID_ELEMENTS:
+            self.depth += 1
+        elif tag == self.rootTag:
+            self._closeRegion()
+
+    def handle_startendtag(self, tag, attrs):
+        if self.done:
+            return
+        if self.current is None:
+            region = self._matchRegion(tag, attrs)
+            if region is None:
+                return
+            self.current = region
+            self.parts = [self.get_starttag_text()]
+            self._closeRegion()
+            return
+        self.parts.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self.current is None:
+            return
+        self.parts.append(f"</{tag}>")
+        if tag == self.rootTag:
+            self.depth -= 1
+            if self.depth == 0:
+                self._closeRegion()
+
+    def handle_data(self, data):
+        if self.current is not None:
+            self.parts.append(data)
+
+    def handle_entityref(self, name):
+        if self.current is not None:
+            self.parts.append(f"&{name};")
+
+    def handle_charref(self, name):
+        if self.current is not None:
+            self.parts.append(f"&#{name};")
+
+    # === HELPER FUNCTIONS === #
+    def _matchRegion(self, tag, attrs):
+        attrs = dict(attrs)
+        for region in self.regions:
+            if region.get("tag") and region["tag"] != tag:
+                continue
+            if region.get("id") and attrs.get("id") != region["id"]:
+                continue
+            if region.get("class") and region["class"] not in (attrs.get("class") or "").split():
+                continue
+            return region
+        return None
+
+    def _closeRegion(self):
+        self.closed.append((self.current["name"], "".join(self.parts)))
+        if self.current.get("last"):
+            self.pendingLast -= 1
+            if self.pendingLast <= 0:
+                self.done = True
+        self.current = None
+        self.parts = []
+
+
+def streamRegions(response, regions, chunkSize=16384):
+    """
+    Generator feeding a streamed `requests` response to a `RegionCollector` chunk by chunk, yielding regions as soon as they're closed.
+    Response is closed (remaining body is not downloaded) once all regions flagged `last` are closed.
+
+    Params
+    ------
+    response : requests.Response
+        Response of a request made with `stream=True`.
+    regions : list
+        Regions to collect (see `RegionCollector`).
+    chunkSize : int
+        Size of chunks read from response (decompressed).
+
+    Yields
+    ------
+    region : tuple
+        (name, html) of each closed region, in document order.
+    """
+    # requests falls back to ISO-8859-1 when no charset is given, pages are UTF-8
+    contentType = response.headers.get("Content-Type", "")
+    encoding = response.encoding if "charset" in contentType.lower() else "utf-8"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    collector = RegionCollector(regions)
+    try:
+        for chunk in response.iter_content(chunk_size=chunkSize):
+            collector.feed(decoder.decode(chunk))
+            yield from collector.popClosed()
+            if collector.done:
+                return
+        collector.feed(decoder.decode(b"", final=True))
+        collector.close()
+        yield from collector.popClosed()
+    finally:
+        response.close()
@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from FlatHunter.utils.logging_utils import logger
+
+
+class Watcher:
+    def __init__(
+        self,
+        site,
+        filter,
+        pagesToWatch=1,
+        minInterval=15.0,
+        maxInterval=1800.0,
+        initialInterval=120.0,
+        backoff=1.5,
+        emitInitial=True,
+        maxKnown=20000,
+    ):
+        """
+        Long-running watch of a search : first search pages are re-polled on a schedule and only new or changed matching
+        ads are emitted. Crawler (session, caches, extraction plan) stays warm between polls.
+        Polling interval adapts to rate of new ads : it's halved after a poll finding new data-id (busy hours) and multiplied
+        by `backoff` after a poll finding none (quiet hours), within [minInterval, maxInterval].
+
+        Params
+        ------
+        site : FlatHunterBase
+            Crawler instance (e.g. ImmoCH), reused for every poll.
+        filter : dict
+            Filter of `getItems()`.
+        pagesToWatch : int
+            Number of first search pages polled (newest ads come first).
+        minInterval, maxInterval, initialInterval : float
+            Bounds and start value (s) of polling interval.
+        backoff : float
+            Factor applied to interval after a poll without new ad.
+        emitInitial : bool
+            If True, matches found by first poll are emitted, otherwise first poll only seeds known ads.
+        maxKnown : int
+            Number of ads remembered (least recently seen are forgotten first).
+        """
+        self.site = site
+        self.filter = filter
+        self.pagesToWatch = pagesToWatch
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.interval = min(max(initialInterval, minInterval), maxInterval)
+        self.backoff = backoff
+        self.emitInitial = emitInitial
+        self.maxKnown = maxKnown
+        # data-id -> card signature (rent, rooms, size), least recently seen first
+        self.known = OrderedDict()
+        self.polls = 0
+
+    def poll(self):
+        """
+        Poll first search pages once and return new or changed matching ads (formatted as `getItems()` ones). Item's page
+        is only fetched for those ads.
+        """
+        site = self.site
+        site.resetRun()
+        baseURL, params = site.getSearchURL()
+        emitted = []
+        newIDs = 0
+        for pageNb in range(1, self.pagesToWatch + 1):
+            # Search pages are fetched directly : a response cache would hide new ads
+            response = site.fetchPage(f"{baseURL}page-{pageNb}{params}")
+            if response is None:
+                continue
+            for record in site.getCardRecords(site.parsePage(response.content)):
+                dataID = record["data-id"]
+                signature = (record["rent"], record["rooms"], record["size"])
+                previous = self.known.pop(dataID, None)
+                self.known[dataID] = signature
+                if previous is None:
+                    newIDs += 1
+                    site.stats["newAds"] += 1
+                elif previous == signature:
+                    continue
+                else:
+                    site.stats["changedAds"] += 1
+                if self.polls == 0 and not self.emitInitial:
+                    continue
+                if record["link"] != None and site._isMatch(record, self.filter):
+                    emitted.append(self._completeAd(record))
+        while len(self.known) > self.maxKnown:
+            self.known.popitem(last=False)
+        self.polls += 1
+        self._adaptInterval(newIDs)
+        logger.info(f"Poll {self.polls} : {newIDs} new ads, {len(emitted)} emitted, next poll in {self.interval:.0f}s")
+        return emitted
+
+    def run(self, callback, maxPolls=None):
+        """
+        Poll until interrupted (or `maxPolls` polls) and call `callback(ad)` for each emitted ad.
+        """
+        try:
+            while maxPolls is None or self.polls < maxPolls:
+                start = time.monotonic()
+                for ad in self.poll():
+                    callback(ad)
+                if maxPolls is not None and self.polls >= maxPolls:
+                    break
+                time.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+        except KeyboardInterrupt:
+            logger.info(f"Watch stopped after {self.polls} polls")
+
+    # === HELPER FUNCTIONS === #
+    def _adaptInterval(self, newIDs):
+        if self.polls == 1:
+            # First poll finds every listed ad, it says nothing about rate of new ads
+            return
+        if newIDs:
+            self.interval = max(self.minInterval, self.interval / 2)
+        else:
+            self.interval = min(self.maxInterval, self.interval * self.backoff)
+
+    def _completeAd(self, record):
+        """
+        Add item's page fields to card record (page fetched conditionally if site has a change tracker) and format it.
+        """
+        return self.site._formatAd(self.site._addItemFields(record, self.site._fetchItemRecord(record)))
@@ -0,0 +1,420 @@
+import json
+import time
+from FlatHunter.utils.logging_utils import logger
+from FlatHunter.utils.redis_utils import ProcessLocalRedis
+from FlatHunter.utils.sqlite_utils import ProcessLocalSQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    crawlID INTEGER PRIMARY KEY AUTOINCREMENT,
+    startedAt REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    taskID INTEGER PRIMARY KEY AUTOINCREMENT,
+    crawlID INTEGER NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leaseUntil REAL,
+    worker TEXT,
+    error TEXT,
+    UNIQUE (crawlID, kind, url)
+);
+CREATE INDEX IF NOT EXISTS tasksByState ON tasks (state, taskID);
+CREATE TABLE IF NOT EXISTS results (
+    crawlID INTEGER NOT NULL DEFAULT 0,
+    dataID INTEGER NOT NULL,
+    taskID INTEGER,
+    updatedAt REAL NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (crawlID, dataID)
+);
+"""
+
+
+class WorkQueue(ProcessLocalSQLite):
+    # Transactions are explicit
+    isolationLevel = None
+
+    def __init__(self, path, leaseSeconds=60, maxAttempts=3):
+        """
+        Durable work queue backed by SQLite (WAL mode), shared by any number of worker processes of one machine (file
+        must be on a local filesystem, see ProcessLocalSQLite, use RedisWorkQueue for several machines). A worker leases
+        a task for `leaseSeconds` : if it neither completes nor fails it in time (crashed worker), task becomes available
+        again. Failed tasks are retried up to `maxAttempts` times.
+        Tasks and results belong to a crawl (see `startCrawl()`) : a URL is processed once per crawl, and results are
+        stored by crawl and data-id, so a task processed twice (expired lease) doesn't duplicate them.
+
+        Params
+        ------
+        path : str
+            Path of SQLite database, created if needed.
+        leaseSeconds : float
+            Lease duration of a task.
+        maxAttempts : int
+            Number of leases of a task before it's marked as failed.
+        """
+        self.path = str(path)
+        self.leaseSeconds = leaseSeconds
+        self.maxAttempts = maxAttempts
+        self._initConnection()
+        with self.lock:
+            connection = self._getConnection()
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(tasks)").fetchall()]
+            if columns and "crawlID" not in columns:
+                # Queue created before tasks were scoped by crawl : its tasks and results are transient, drop them
+                logger.warning(f"Dropped tasks and results of outdated work queue '{self.path}'")
+                connection.executescript("DROP TABLE tasks; DROP TABLE IF EXISTS results;")
+            connection.executescript(SCHEMA)
+
+    def startCrawl(self):
+        """
+        Register a new crawl and return its ID, tasks and results of previous crawls are left untouched.
+        """
+        with self.lock:
+            cursor = self._getConnection().execute("INSERT INTO crawls (startedAt) VALUES (?)", (time.time(),))
+        return cursor.lastrowid
+
+    def put(self, kind, url, payload=None, crawlID=0):
+        """
+        Enqueue task of crawl, ignored if a task of same kind and URL was already enqueued by this crawl (whatever its
+        state).
+
+        Returns
+        -------
+        added : bool
+            True if task was enqueued.
+        """
+        with self.lock:
+            cursor = self._getConnection().execute(
+                "INSERT OR IGNORE INTO tasks (crawlID, kind, url, payload) VALUES (?, ?, ?, ?)",
+                (crawlID, kind, url, json.dumps(payload or {})),
+            )
+        return cursor.rowcount == 1
+
+    def lease(self, worker):
+        """
+        Lease oldest available task (pending, or leased with an expired lease).
+
+        Params
+        ------
+        worker : str
+            Name of leasing worker.
+
+        Returns
+        -------
+        task : dict
+            Dictionnary with `taskID`, `crawlID`, `kind`, `url`, `payload` and `attempts` keys, None if no task is
+            available.
+        """
+        now = time.time()
+        with self.lock:
+            connection = self._getConnection()
+            # Immediate transaction : only one worker at a time selects and leases a task
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = connection.execute(
+                        "SELECT taskID, crawlID, kind, url, payload, attempts FROM tasks "
+                        "WHERE state = 'pending' OR (state = 'leased' AND leaseUntil < ?) ORDER BY taskID LIMIT 1",
+                        (now,),
+                    ).fetchone()
+                    if row is None:
+                        connection.execute("COMMIT")
+                        return None
+                    taskID, crawlID, kind, url, payload, attempts = row
+                    if attempts < self.maxAttempts:
+                        break
+                    # Lease expired on last attempt
+                    connection.execute("UPDATE tasks SET state = 'failed', error = 'lease expired' WHERE taskID = ?", (taskID,))
+                    logger.warning(f"Task {taskID} ({kind} {url}) failed : lease expired on last attempt")
+                connection.execute(
+                    "UPDATE tasks SET state = 'leased', attempts = attempts + 1, leaseUntil = ?, worker = ? WHERE taskID = ?",
+                    (now + self.leaseSeconds, worker, taskID),
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return {
+            "taskID": taskID,
+            "crawlID": crawlID,
+            "kind": kind,
+            "url": url,
+            "payload": json.loads(payload),
+            "attempts": attempts + 1,
+        }
+
+    def complete(self, taskID, worker):
+        """
+        Mark task as done. Ignored if worker lost task's lease (task was leased by another worker meanwhile).
+
+        Returns
+        -------
+        completed : bool
+        """
+        with self.lock:
+            cursor = self._getConnection().execute(
+                "UPDATE tasks SET state = 'done', leaseUntil = NULL WHERE taskID = ? AND state = 'leased' AND worker = ?",
+                (taskID, worker),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, taskID, worker, error=""):
+        """
+        Release task after a failure : it's available again unless it reached `maxAttempts`.
+
+        Returns
+        -------
+        retried : bool
+            True if task will be retried.
+        """
+        with self.lock:
+            connection = self._getConnection()
+            row = connection.execute(
+                "SELECT attempts FROM tasks WHERE taskID = ? AND state = 'leased' AND worker = ?", (taskID, worker)
+            ).fetchone()
+            if row is None:
+                return False
+            state = "pending" if row[0] < self.maxAttempts else "failed"
+            connection.execute(
+                "UPDATE tasks SET state = ?, leaseUntil = NULL, error = ? WHERE taskID = ?", (state, str(error), taskID)
+            )
+        logger.warning(f"Task {taskID} failed (attempt {row[0]}/{self.maxAttempts}) : {error}")
+        return state == "pending"
+
+    def putResult(self, dataID, record, taskID=None, crawlID=0):
+        """
+        Store result of an ad, replacing previous result of crawl with same data-id.
+        """
+        with self.lock:
+            self._getConnection().execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (crawlID, dataID, taskID, time.time(), json.dumps(record, separators=(",", ":"), ensure_ascii=False)),
+            )
+
+    def getResults(self, crawlID=0):
+        """
+        Return results of crawl, ordered by task then data-id (i.e. roughly in search order).
+        """
+        with self.lock:
+            rows = self._getConnection().execute(
+                "SELECT record FROM results WHERE crawlID = ? ORDER BY taskID, dataID", (crawlID,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def counts(self, crawlID=None):
+        """
+        Return number of tasks per state, of one crawl or of all crawls if left empty.
+        """
+        query = "SELECT state, COUNT(*) FROM tasks"
+        params = ()
+        if crawlID is not None:
+            query += " WHERE crawlID = ?"
+            params = (crawlID,)
+        with self.lock:
+            rows = self._getConnection().execute(query + " GROUP BY state", params).fetchall()
+        return dict(rows)
+
+    def isDrained(self, crawlID=None):
+        """
+        True if no task (of crawl, or of any crawl if left empty) is pending or leased (tasks enqueued by a task are
+        enqueued before it completes).
+        """
+        counts = self.counts(crawlID)
+        return counts.get("pending", 0) + counts.get("leased", 0) == 0
+
+
+
+# Lua helper of RedisWorkQueue scripts : move task to a new state and keep per-state counters (global and per crawl)
+QUEUE_LUA_HELPERS = """
+local prefix = ARGV[1]
+local function setState(id, crawlID, old, new)
+    if old then
+        redis.call('HINCRBY', prefix .. ':counts', old, -1)
+        redis.call('HINCRBY', prefix .. ':counts:' .. crawlID, old, -1)
+    end
+    redis.call('HINCRBY', prefix .. ':counts', new, 1)
+    redis.call('HINCRBY', prefix .. ':counts:' .. crawlID, new, 1)
+    redis.call('HSET', prefix .. ':task:' .. id, 'state', new)
+end
+"""
+# ARGV : prefix, crawlID, kind, url, payload
+QUEUE_PUT = QUEUE_LUA_HELPERS + """
+if redis.call('SADD', prefix .. ':seen:' .. ARGV[2], ARGV[3] .. ' ' .. ARGV[4]) == 0 then
+    return 0
+end
+local id = redis.call('INCR', prefix .. ':taskIDs')
+redis.call('HSET', prefix .. ':task:' .. id, 'crawlID', ARGV[2], 'kind', ARGV[3], 'url', ARGV[4], 'payload', ARGV[5], 'attempts', 0)
+setState(id, ARGV[2], false, 'pending')
+redis.call('ZADD', prefix .. ':pending', id, id)
+return 1
+"""
+# ARGV : prefix, leaseSeconds, worker, maxAttempts. Leases use server's clock, shared by all machines.
+QUEUE_LEASE = QUEUE_LUA_HELPERS + """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local failed = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', prefix .. ':leased', '-inf', '(' .. now)) do
+    local key = prefix .. ':task:' .. id
+    local crawlID = redis.call('HGET', key, 'crawlID')
+    redis.call('ZREM', prefix .. ':leased', id)
+    if tonumber(redis.call('HGET', key, 'attempts')) >= tonumber(ARGV[4]) then
+        setState(id, crawlID, 'leased', 'failed')
+        redis.call('HSET', key, 'error', 'lease expired')
+        table.insert(failed, id)
+    else
+        setState(id, crawlID, 'leased', 'pending')
+        redis.call('ZADD', prefix .. ':pending', id, id)
+    end
+end
+local popped = redis.call('ZPOPMIN', prefix .. ':pending')
+if #popped == 0 then
+    return {failed, {}}
+end
+local id = popped[1]
+local key = prefix .. ':task:' .. id
+local crawlID = redis.call('HGET', key, 'crawlID')
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('HSET', key, 'worker', ARGV[3])
+redis.call('ZADD', prefix .. ':leased', now + tonumber(ARGV[2]), id)
+setState(id, crawlID, 'pending', 'leased')
+return {failed, {id, crawlID, redis.call('HGET', key, 'kind'), redis.call('HGET', key, 'url'), redis.call('HGET', key, 'payload'), attempts}}
+"""
+# ARGV : prefix, taskID, worker
+QUEUE_COMPLETE = QUEUE_LUA_HELPERS + """
+local key = prefix .. ':task:' .. ARGV[2]
+if redis.call('HGET', key, 'state') ~= 'leased' or redis.call('HGET', key, 'worker') ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', prefix .. ':leased', ARGV[2])
+setState(ARGV[2], redis.call('HGET', key, 'crawlID'), 'leased', 'done')
+return 1
+"""
+# ARGV : prefix, taskID, worker, error, maxAttempts
+QUEUE_FAIL = QUEUE_LUA_HELPERS + """
+local key = prefix .. ':task:' .. ARGV[2]
+if redis.call('HGET', key, 'state') ~= 'leased' or redis.call('HGET', key, 'worker') ~= ARGV[3] then
+    return false
+end
+local attempts = tonumber(redis.call('HGET', key, 'attempts'))
+local state = 'failed'
+if attempts < tonumber(ARGV[5]) then
+    state = 'pending'
+    redis.call('ZADD', prefix .. ':pending', ARGV[2], ARGV[2])
+end
+redis.call('ZREM', prefix .. ':leased', ARGV[2])
+redis.call('HSET', key, 'error', ARGV[4])
+setState(ARGV[2], redis.call('HGET', key, 'crawlID'), 'leased', state)
+return {attempts, state}
+"""
+
+
+class RedisWorkQueue(ProcessLocalRedis):
+    scripts = {"put": QUEUE_PUT, "lease": QUEUE_LEASE, "complete": QUEUE_COMPLETE, "fail": QUEUE_FAIL}
+
+    def __init__(self, url, prefix="flathunter:queue", leaseSeconds=60, maxAttempts=3):
+        """
+        WorkQueue backed by a Redis server (requires `redis` package), so workers of several machines can share one
+        crawl. Same interface and semantics as WorkQueue : each state change is one Lua script, atomic on server, and
+        leases are timed by server's clock, so machines' clocks don't need to agree.
+
+        Params
+        ------
+        url : str
+            URL of Redis server (e.g. "redis://queue-host:6379/0").
+        prefix : str
+            Prefix of keys of queue.
+        leaseSeconds : float
+            Lease duration of a task.
+        maxAttempts : int
+            Number of leases of a task before it's marked as failed.
+        """
+        self.url = url
+        self.prefix = prefix
+        self.leaseSeconds = leaseSeconds
+        self.maxAttempts = maxAttempts
+        self._initClient()
+
+    def startCrawl(self):
+        """
+        Register a new crawl and return its ID, tasks and results of previous crawls are left untouched.
+        """
+        return self._getClient().incr(self._key("crawls"))
+
+    def put(self, kind, url, payload=None, crawlID=0):
+        """
+        Enqueue task of crawl, ignored if a task of same kind and URL was already enqueued by this crawl. Returns True if
+        task was enqueued.
+        """
+        return self._runScript("put", args=(self.prefix, crawlID, kind, url, json.dumps(payload or {}))) == 1
+
+    def lease(self, worker):
+        """
+        Lease oldest available task, None if no task is available (see `WorkQueue.lease()`).
+        """
+        failed, task = self._runScript("lease", args=(self.prefix, self.leaseSeconds, worker, self.maxAttempts))
+        for taskID in failed:
+            logger.warning(f"Task {taskID} failed : lease expired on last attempt")
+        if not task:
+            return None
+        taskID, crawlID, kind, url, payload, attempts = task
+        return {
+            "taskID": int(taskID),
+            "crawlID": int(crawlID),
+            "kind": kind,
+            "url": url,
+            "payload": json.loads(payload),
+            "attempts": int(attempts),
+        }
+
+    def complete(self, taskID, worker):
+        """
+        Mark task as done. Ignored if worker lost task's lease.
+        """
+        return self._runScript("complete", args=(self.prefix, taskID, worker)) == 1
+
+    def fail(self, taskID, worker, error=""):
+        """
+        Release task after a failure, return True if it will be retried.
+        """
+        reply = self._runScript("fail", args=(self.prefix, taskID, worker, str(error), self.maxAttempts))
+        if reply is None:
+            return False
+        attempts, state = reply
+        logger.warning(f"Task {taskID} failed (attempt {attempts}/{self.maxAttempts}) : {error}")
+        return state == "pending"
+
+    def putResult(self, dataID, record, taskID=None, crawlID=0):
+        """
+        Store result of an ad, replacing previous result of crawl with same data-id.
+        """
+        self._getClient().hset(
+            self._key("results", crawlID), dataID, json.dumps([taskID, record], separators=(",", ":"), ensure_ascii=False)
+        )
+
+    def getResults(self, crawlID=0):
+        """
+        Return results of crawl, ordered by task then data-id.
+        """
+        results = []
+        for dataID, value in self._getClient().hgetall(self._key("results", crawlID)).items():
+            taskID, record = json.loads(value)
+            results.append((-1 if taskID is None else taskID, int(dataID), record))
+        return [record for _, _, record in sorted(results, key=lambda result: result[:2])]
+
+    def counts(self, crawlID=None):
+        """
+        Return number of tasks per state, of one crawl or of all crawls if left empty.
+        """
+        key = self._key("counts") if crawlID is None else self._key("counts", crawlID)
+        return {state: int(count) for state, count in self._getClient().hgetall(key).items() if int(count)}
+
+    def isDrained(self, crawlID=None):
+        """
+        True if no task (of crawl, or of any crawl if left empty) is pending or leased.
+        """
+        counts = self.counts(crawlID)
+        return counts.get("pending", 0) + counts.get("leased", 0) == 0
@@ -1,5 +1,6 @@
-from FlatHunter.modules.ImmoCH import ImmoCH
-import json 
+import argparse
+import json
+from FlatHunter.modules import SITES, getSite
 
 FILTER = {
     "minRent": 400,
@@ -10,9 +11,114 @@ FILTER = {
     "maxRooms": 8.0,
 }
 
-obj = ImmoCH("flat")
-items = obj.getItems(FILTER, pagesToSearch=1)
 
-for dic in items:
+def printItem(dic):
     print(json.dumps(dic, indent=4))
-    print("\n\n")
\ No newline at end of file
+    print("\n\n")
+
+
+def streamItems(items, sinks, printItems=False):
+    """
+    Write each item to sinks (and print it) as soon as it's found, then pass it on.
+    """
+    for item in items:
+        for sink in sinks:
+            sink.write(item)
+        if printItems:
+            printItem(item)
+        yield item
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Search ads matching FILTER.")
+    parser.add_argument("--site", default="immoch", help=f"Site to search ({', '.join(SITES)} or a site installed as plugin)")
+    parser.add_argument("--category", default="flat", choices=["flat", "industrial", "commercial"])
+    parser.add_argument("--region", default="geneve", help="Region slug of search (e.g. geneve, vaud)")
+    parser.add_argument("--pages", type=int, default=1, help="Number of search pages (polled pages in watch mode)")
+    parser.add_argument("--watch", action="store_true", help="Keep running and print new or changed matching ads")
+    parser.add_argument("--min-interval", type=float, default=15.0, help="Shortest polling interval (s) in watch mode")
+    parser.add_argument("--max-interval", type=float, default=1800.0, help="Longest polling interval (s) in watch mode")
+    parser.add_argument(
+        "--output", help="Stream matching ads to this file ('-' for standard output) instead of printing them"
+    )
+    parser.add_argument(
+        "--format", choices=["ndjson", "json", "csv", "parquet"], help="Format of output file (guessed from its extension by default)"
+    )
+    parser.add_argument(
+        "--complete", action="store_true", help="Search all pages (overrides --pages), so history can mark ads no longer found"
+    )
+    parser.add_argument(
+        "--history",
+        help="Record every ad of search (matching or not) in this history file (with --complete, ads no longer listed are "
+        "marked as disappeared). A history file records a single site, category and region",
+    )
+    parser.add_argument(
+        "--snapshot", help="Write matching ads sorted by data-id to this file (compare two with FlatHunter.utils.change_feed)"
+    )
+    parser.add_argument(
+        "--images", help="Fetch images of matching ads into this image store folder (each distinct image is stored once)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    imageStore = None
+    if args.images:
+        from FlatHunter.utils.image_store import ImageStore
+
+        imageStore = ImageStore(args.images)
+    # Site module (and its dependencies) is only imported once arguments are valid
+    obj = getSite(args.site)(args.category, region=args.region, imageStore=imageStore)
+    writer = None
+    if args.output:
+        from FlatHunter.utils.output_writers import openWriter
+
+        # In watch mode, each ad is flushed as soon as it's found
+        writer = openWriter(args.output, args.format, **({"flushEvery": 1} if args.watch else {}))
+    sinks = [writer] if writer is not None else []
+    snapshot = None
+    if args.snapshot and not args.watch:
+        from FlatHunter.utils.change_feed import SortedSnapshotWriter
+
+        snapshot = SortedSnapshotWriter(args.snapshot)
+        sinks.append(snapshot)
+    try:
+        if args.watch:
+            from FlatHunter.utils.watcher import Watcher
+
+            watcher = Watcher(obj, FILTER, pagesToWatch=args.pages, minInterval=args.min_interval, maxInterval=args.max_interval)
+            watcher.run(writer.write if writer is not None else printItem)
+        else:
+            # Ads are streamed from search to sinks, so memory doesn't grow with number of ads
+            pagesToSearch = None if args.complete else args.pages
+            history = None
+            if args.history:
+                from FlatHunter.utils.history_store import HistoryStore
+
+                # Refuses a file recording another search before crawling
+                history = HistoryStore(args.history, scope=f"{args.site}/{args.category}/{args.region}")
+            # History records whole search (card records), not only matching ads
+            cards = [] if history is not None else None
+            items = streamItems(obj.iterItems(FILTER, pagesToSearch=pagesToSearch, cards=cards), sinks, printItems=writer is None)
+            for _ in items:
+                pass
+            if history is not None:
+                # Only a search of all pages tells which ads disappeared
+                history.update(cards, complete=pagesToSearch is None)
+                history.close()
+    except BaseException:
+        # Previous snapshot is kept when crawl fails (a partial one would show missing ads as removed)
+        if snapshot is not None:
+            snapshot.discard()
+        raise
+    finally:
+        for sink in sinks:
+            sink.close()
+        if imageStore is not None:
+            imageStore.report()
+            imageStore.close()
+
+
+if __name__ == "__main__":
+    main()